@@ -0,0 +1,382 @@
+"""压力基准：无头运行脚本化场景，统计帧时间分位数与内存
+
+用法:
+    python bench.py                          # 运行全部场景
+    python bench.py lanterns_200 -o a.json   # 指定场景并保存结果
+    python bench.py --compare a.json b.json  # 比较两次结果，回归时返回非零
+    python bench.py --startup                # 测量启动到第一帧的耗时
+    python bench.py --threaded explosion_storm  # 比较单线程与模拟/绘制分线程
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pygame
+
+import game
+
+
+# --- 分阶段计时 ---
+class PhaseTimer:
+    """实现 GameState.profiler 接口，累计一帧内各阶段耗时（毫秒）"""
+    def __init__(self):
+        self.times = {}
+        self._phase = None
+        self._start = 0.0
+
+    def begin(self, phase):
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.times[self._phase] = self.times.get(self._phase, 0.0) + (now - self._start) * 1000
+        self._phase = phase
+        self._start = now
+
+    def end(self):
+        self.begin(None)
+
+    def take(self):
+        times = self.times
+        self.times = {}
+        return times
+
+
+# --- 场景 ---
+def add_enemy(state, x, y):
+    e = game.enemy_pool.acquire(rng=state.rng, now=state.time_ms)
+    e.rect.topleft = (x, y)
+    state.enemies.add(e)
+    state.all_sprites.add(e)
+    return e
+
+def keep_alive(state):
+    # 基准场景关注负载而非胜负，锁定玩家血量
+    state.player.hp = state.player.max_hp
+
+def sweep_input(frame, period=120, fire=True, upgrade=1):
+    """左右往返移动并持续开火，升级时总是选择 upgrade"""
+    return game.FrameInput(move_x=1 if (frame // period) % 2 else -1, fire=fire, upgrade=upgrade)
+
+def lanterns_200(state, frame):
+    # 始终保持 200 个灯笼在屏幕内
+    keep_alive(state)
+    while len(state.enemies) < 200:
+        add_enemy(state, state.rng.randint(0, game.WIDTH - 45), state.rng.randint(-60, game.HEIGHT // 2))
+    return sweep_input(frame)
+
+def laser_vs_boss(state, frame):
+    player = state.player
+    if frame == 0:
+        player.is_laser = True
+        player.fire_rate = 120
+        player.level = state.next_boss_milestone  # 下一步即触发 Boss 战
+    keep_alive(state)
+    for boss in state.boss_group:
+        boss.hp = max(boss.hp, 1000)  # Boss 不死，持续承受激光
+    return sweep_input(frame, period=60)
+
+def explosion_storm(state, frame):
+    keep_alive(state)
+    for _ in range(8):
+        game.create_explosion(state.rng.randint(0, game.WIDTH), state.rng.randint(0, game.HEIGHT),
+                              game.GOLD if frame % 2 else game.FESTIVE_RED, state.particles, 25, 7, state.rng)
+    return sweep_input(frame, fire=False)
+
+def long_session(state, frame):
+    # 额外经验让长局在可接受的帧数内升到 30 级
+    keep_alive(state)
+    if not state.in_boss_fight and not state.pending_upgrades:
+        if state.player.gain_xp(state.player.xp_next // 40 + 1):
+            state.pending_upgrades += 1
+    return sweep_input(frame, upgrade=frame % 3 + 1)
+
+def reached_level_30(state):
+    return state.player.level >= 30
+
+# 场景名 -> (每帧脚本, 最多帧数, 提前结束条件)
+SCENARIOS = {
+    'lanterns_200': (lanterns_200, 1200, None),
+    'laser_vs_boss': (laser_vs_boss, 1800, None),
+    'explosion_storm': (explosion_storm, 1200, None),
+    'long_session': (long_session, 60000, reached_level_30),
+}
+
+
+# --- 统计 ---
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(values):
+    ordered = sorted(values)
+    return {
+        'mean': sum(ordered) / len(ordered) if ordered else 0.0,
+        'p50': percentile(ordered, 50),
+        'p95': percentile(ordered, 95),
+        'p99': percentile(ordered, 99),
+        'max': ordered[-1] if ordered else 0.0,
+    }
+
+POOLS = ('bullet', 'enemy_bullet', 'particle', 'enemy')
+
+def fresh_pools():
+    """换上新的对象池：池是进程级的，否则峰值与新建数会包含之前运行的场景"""
+    for name in POOLS:
+        pool = getattr(game, f'{name}_pool')
+        setattr(game, f'{name}_pool', game.SpritePool(pool.sprite_class, pool.capacity))
+
+def run_scenario(name, seed=1, render=True, trace_memory=False, pixel_collisions=True):
+    script, max_frames, done = SCENARIOS[name]
+    fresh_pools()
+    state = game.GameState(seed, pixel_collisions=pixel_collisions)
+    timer = PhaseTimer()
+    state.profiler = timer
+    renderer = game.GameRenderer(pygame.display.get_surface()) if render else None
+
+    samples = {'update': [], 'collision': [], 'draw': [], 'total': []}
+    if trace_memory:
+        tracemalloc.start()
+    gc_before = sum(s['collections'] for s in gc.get_stats())
+    blocks_before = sys.getallocatedblocks()
+
+    frames = 0
+    for frame in range(max_frames):
+        inputs = script(state, frame)
+        start = time.perf_counter()
+        state.step(inputs, game.STEP_MS)
+        phases = timer.take()
+        if renderer is not None:
+            draw_start = time.perf_counter()
+            renderer.draw(state)
+            draw_ms = (time.perf_counter() - draw_start) * 1000
+        else:
+            draw_ms = 0.0
+        total = (time.perf_counter() - start) * 1000
+        collision = phases.pop('collision', 0.0)
+        samples['collision'].append(collision)
+        samples['update'].append(sum(phases.values()))
+        samples['draw'].append(draw_ms)
+        samples['total'].append(total)
+        frames += 1
+        if state.game_over or (done is not None and done(state)):
+            break
+
+    result = {
+        'scenario': name,
+        'seed': seed,
+        'frames': frames,
+        'frame_ms': {phase: summarize(values) for phase, values in samples.items()},
+        'gc_collections': sum(s['collections'] for s in gc.get_stats()) - gc_before,
+        'allocated_blocks_delta': sys.getallocatedblocks() - blocks_before,
+        'pools': {name: getattr(game, f'{name}_pool').stats() for name in POOLS},
+        'collisions': {
+            'mask_stage': state.collider.stats() if state.collider is not None else None,
+            'field_mask_tests': state.bullet_field.mask_tests if state.bullet_field is not None else 0,
+            'masks': game.masks.stats(),
+        },
+        'final': {'level': state.player.level, 'score': state.score, 'checksum': state.checksum()},
+    }
+    if trace_memory:
+        result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    # 清理场景，避免池中残留对象影响下一个场景
+    for sprite in list(state.all_sprites):
+        sprite.kill()
+    return result
+
+
+# --- 单线程与分线程对比 ---
+class ScriptedSimulation(game.SimulationThread):
+    """由场景脚本提供输入的模拟线程，记录每步开始时间"""
+    def __init__(self, state, script, max_steps):
+        super().__init__(state, rate=None, max_steps=max_steps)
+        self.script = script
+        self.step_times = []
+
+    def next_input(self):
+        self.step_times.append(time.perf_counter())
+        return self.script(self.state, self.steps)
+
+def run_threaded_comparison(name, seed=1, frames=None):
+    """同一场景分别以单线程（推进+绘制串行）与分线程（模拟线程不限速、主线程持续绘制最新快照）运行"""
+    script, max_frames, _ = SCENARIOS[name]
+    frames = min(frames or max_frames, max_frames)
+    screen = pygame.display.get_surface()
+
+    # 单线程：每步推进后绘制一次
+    state = game.GameState(seed)
+    renderer = game.GameRenderer(screen)
+    step_times = []
+    start = time.perf_counter()
+    for frame in range(frames):
+        step_times.append(time.perf_counter())
+        state.step(script(state, frame), game.STEP_MS)
+        renderer.draw(state, state.alpha)
+    serial_seconds = time.perf_counter() - start
+    serial_checksum = state.checksum()
+    for sprite in list(state.all_sprites):
+        sprite.kill()
+
+    # 分线程：主线程只绘制
+    state = game.GameState(seed)
+    renderer = game.GameRenderer(screen)
+    sim = ScriptedSimulation(state, script, frames)
+    draw_ms, latency_ms = [], []
+    start = time.perf_counter()
+    sim.start()
+    while sim.is_alive():
+        snapshot = sim.buffer.read()
+        draw_start = time.perf_counter()
+        renderer.draw(snapshot, snapshot.alpha)
+        draw_ms.append((time.perf_counter() - draw_start) * 1000)
+        latency_ms.append((draw_start - snapshot.created) * 1000)
+    sim.join()
+    threaded_seconds = time.perf_counter() - start
+    threaded_checksum = state.checksum()
+    for sprite in list(state.all_sprites):
+        sprite.kill()
+
+    def intervals(times):
+        return summarize([(b - a) * 1000 for a, b in zip(times, times[1:])])
+
+    return {
+        'scenario': name,
+        'frames': frames,
+        'serial': {'steps_per_second': frames / serial_seconds, 'step_interval_ms': intervals(step_times),
+                   'checksum': serial_checksum},
+        'threaded': {'steps_per_second': sim.steps / threaded_seconds, 'step_interval_ms': intervals(sim.step_times),
+                     'frames_drawn': len(draw_ms), 'draw_ms': summarize(draw_ms),
+                     'snapshot_ms_mean': sim.snapshot_ms / max(1, sim.steps),
+                     'handoff_latency_ms': summarize(latency_ms), 'checksum': threaded_checksum},
+    }
+
+def print_threaded_comparison(result):
+    serial, threaded = result['serial'], result['threaded']
+    print(f"{result['scenario']}  {result['frames']} 步")
+    print(f"  单线程  {serial['steps_per_second']:8.0f} 步/秒  步间隔 p99 {serial['step_interval_ms']['p99']:.3f} ms")
+    print(f"  分线程  {threaded['steps_per_second']:8.0f} 步/秒  步间隔 p99 {threaded['step_interval_ms']['p99']:.3f} ms  "
+          f"绘制 {threaded['frames_drawn']} 帧 (mean {threaded['draw_ms']['mean']:.3f} ms)  "
+          f"快照 {threaded['snapshot_ms_mean']:.3f} ms/步  交接延迟 p95 {threaded['handoff_latency_ms']['p95']:.3f} ms")
+    if serial['checksum'] != threaded['checksum']:
+        print("  警告：两种模式的最终状态不一致")
+
+
+# --- 比较两次结果 ---
+def compare(old_path, new_path, threshold=0.10):
+    """按场景比较 total 的 p95/p99，超过阈值视为回归"""
+    with open(old_path, encoding='utf-8') as f:
+        old = {r['scenario']: r for r in json.load(f)['results']}
+    with open(new_path, encoding='utf-8') as f:
+        new = {r['scenario']: r for r in json.load(f)['results']}
+
+    regressions = 0
+    for name in sorted(set(old) & set(new)):
+        for key in ('mean', 'p95', 'p99'):
+            a = old[name]['frame_ms']['total'][key]
+            b = new[name]['frame_ms']['total'][key]
+            change = (b - a) / a if a else 0.0
+            flag = ''
+            if change > threshold:
+                flag = '  <-- 回归'
+                regressions += 1
+            print(f"{name:16s} {key:4s} {a:8.3f} -> {b:8.3f} ms ({change:+.1%}){flag}")
+    return regressions
+
+
+# --- 启动耗时 ---
+def startup_child(use_bundle):
+    """在全新进程中测量 pygame.init 到第一帧 flip 的耗时（毫秒）"""
+    start = time.perf_counter()
+    game.init_headless()
+    screen = pygame.display.set_mode((game.WIDTH, game.HEIGHT))
+    if use_bundle:
+        game.assets.use_bundle()
+    state = game.GameState(1)
+    renderer = game.GameRenderer(screen)
+    state.step(game.FrameInput())
+    renderer.draw(state)
+    pygame.display.flip()
+    print(json.dumps({'first_frame_ms': (time.perf_counter() - start) * 1000}))
+
+def measure_startup(runs=7):
+    """分别在使用/不使用资源包时启动子进程，报告首帧耗时中位数"""
+    results = {}
+    for use_bundle in (False, True):
+        first_frame, wall = [], []
+        for _ in range(runs):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--startup-child', str(int(use_bundle))],
+                                 capture_output=True, text=True, check=True).stdout
+            wall.append((time.perf_counter() - start) * 1000)
+            first_frame.append(json.loads(out.strip().splitlines()[-1])['first_frame_ms'])
+        label = 'bundle' if use_bundle else 'png'
+        results[label] = {'first_frame_ms': statistics.median(first_frame),
+                          'process_wall_ms': statistics.median(wall)}
+        print(f"{label:6s} 首帧 {results[label]['first_frame_ms']:.1f} ms  "
+              f"(含解释器与导入的进程总耗时 {results[label]['process_wall_ms']:.0f} ms)")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='飞机大战压力基准')
+    parser.add_argument('scenarios', nargs='*', help=f"场景名，默认全部: {', '.join(SCENARIOS)}")
+    parser.add_argument('-o', '--output', help='结果 JSON 路径')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-render', action='store_true', help='只测模拟，不绘制')
+    parser.add_argument('--rect-collisions', action='store_true', help='只用矩形判定碰撞，不比较像素遮罩')
+    parser.add_argument('--trace-memory', action='store_true', help='用 tracemalloc 统计峰值内存（较慢）')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='比较两个结果 JSON')
+    parser.add_argument('--threshold', type=float, default=0.10, help='回归阈值（比例）')
+    parser.add_argument('--startup', action='store_true', help='测量启动到第一帧的耗时')
+    parser.add_argument('--startup-child', help=argparse.SUPPRESS)
+    parser.add_argument('--threaded', action='store_true', help='比较单线程与模拟/绘制分线程')
+    parser.add_argument('--frames', type=int, help='--threaded 时每个场景的步数上限')
+    args = parser.parse_args(argv)
+
+    if args.startup_child is not None:
+        startup_child(args.startup_child == '1')
+        return 0
+    if args.startup:
+        results = measure_startup()
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'startup': results}, f, indent=2)
+        return 0
+    if args.compare:
+        return 1 if compare(*args.compare, threshold=args.threshold) else 0
+
+    game.init_headless()
+    pygame.display.set_mode((game.WIDTH, game.HEIGHT))
+    names = args.scenarios or list(SCENARIOS)
+    results = []
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error(f"未知场景: {name}")
+        if args.threaded:
+            result = run_threaded_comparison(name, args.seed, args.frames)
+            print_threaded_comparison(result)
+            results.append(result)
+            continue
+        result = run_scenario(name, args.seed, not args.no_render, args.trace_memory,
+                              not args.rect_collisions)
+        total = result['frame_ms']['total']
+        print(f"{name:16s} {result['frames']:6d} 帧  mean {total['mean']:.3f}  p50 {total['p50']:.3f}  "
+              f"p95 {total['p95']:.3f}  p99 {total['p99']:.3f} ms")
+        results.append(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            # 分线程对比的结果结构不同，单独存放，--compare 只读取 results
+            json.dump({'python': sys.version.split()[0], 'pygame': pygame.version.ver,
+                       'threaded' if args.threaded else 'results': results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""离线打包：把游戏用到的图像按游戏内尺寸预缩放，写成一个原始像素资源包
+
+用法:
+    python build_assets.py                 # 生成 assets/assets.bundle
+    python build_assets.py -o other.bundle
+
+运行时 AssetRegistry.use_bundle() 内存映射该文件，直接把像素包装成 Surface，
+跳过 PNG 解码与缩放。源 PNG 更新后对应条目自动失效，重新打包即可。
+"""
+import argparse
+import os
+import sys
+
+import pygame
+
+import game
+
+
+def build(path):
+    game.init_headless()
+    pygame.display.set_mode((1, 1))  # convert_alpha 需要显示模式
+
+    entries = []
+    blobs = []
+    offset = 0
+    for filename, size, alpha in game.BUNDLED_ASSETS:
+        source = game.get_asset_path(filename)
+        image = pygame.image.load(source)
+        image = image.convert_alpha() if alpha else image.convert()
+        image = pygame.transform.smoothscale(image, size)
+        channels = 4 if alpha else 3
+        pixels = pygame.image.tobytes(image, 'RGBA' if alpha else 'RGB')
+        st = os.stat(source)
+        entries.append((filename.encode('utf-8'), size, channels, st.st_mtime_ns, st.st_size, offset))
+        blobs.append(pixels)
+        offset += len(pixels)
+
+    header_size = game.BUNDLE_HEADER.size + sum(game.BUNDLE_ENTRY.size + len(name) for name, *_ in entries)
+    # 像素数据按 16 字节对齐
+    data_start = (header_size + 15) // 16 * 16
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(game.BUNDLE_HEADER.pack(game.BUNDLE_MAGIC, len(entries)))
+        for name, (w, h), channels, mtime_ns, src_size, rel_offset in entries:
+            f.write(game.BUNDLE_ENTRY.pack(len(name), w, h, channels, mtime_ns, src_size, data_start + rel_offset))
+            f.write(name)
+        f.write(b'\0' * (data_start - header_size))
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return len(entries), data_start + offset
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='预缩放并打包游戏资源')
+    parser.add_argument('-o', '--output', default=game.default_bundle_path())
+    args = parser.parse_args(argv)
+    count, size = build(args.output)
+    print(f"已写入 {args.output}: {count} 张图像，{size / 1024:.0f} KiB")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""游戏画面录制：主循环只做一次整屏内存拷贝，编码交给后台线程池
+
+每帧 present 之后 grab(screen) 把屏幕像素经 memoryview 拷进预分配的缓冲池（不分配内存，
+900x700 约 0.3 ms），再把缓冲编号交给编码线程；编码完成后缓冲回到池中。
+缓冲池用尽（编码跟不上）时默认丢弃该帧并计数，block=True 时改为等待空闲缓冲（反压）。
+
+输出格式由路径决定：
+    目录            PNG 序列 frame_000001.png ...，多个线程并行用 zlib 压缩
+    以 .raw 结尾    原始像素流（单线程按顺序写出），旁边的 .json 记录尺寸与像素格式，
+                    可用 ffmpeg -f rawvideo -pixel_format <格式> -video_size <宽>x<高> -framerate 60 -i 文件 转码
+
+用法:
+    python game.py --capture shots
+    python game.py --capture session.raw
+"""
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # 未安装 NumPy 时用 bytearray 切片重排像素
+    np = None
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_IHDR = struct.Struct('>IIBBBBB')
+
+
+def png_chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(data, zlib.crc32(tag)))
+
+def png_rows(pixels, width, height, bytesize, offsets):
+    """把逐行紧密排列的屏幕像素转换为 PNG 扫描行：每行以过滤类型 0 开头，随后是 RGB"""
+    stride = width * 3
+    if np is not None:
+        rows = np.zeros((height, stride + 1), np.uint8)
+        src = np.frombuffer(pixels, np.uint8).reshape(height, width, bytesize)
+        dst = rows[:, 1:].reshape(height, width, 3)
+        for channel, offset in enumerate(offsets):
+            dst[:, :, channel] = src[:, :, offset]
+        return rows
+    rgb = bytearray(width * height * 3)
+    for channel, offset in enumerate(offsets):
+        rgb[channel::3] = pixels[offset::bytesize]
+    rows = bytearray((stride + 1) * height)
+    for y in range(height):
+        start = y * (stride + 1) + 1
+        rows[start:start + stride] = rgb[y * stride:(y + 1) * stride]
+    return rows
+
+def encode_png(rows, width, height, level=1):
+    """rows 为 png_rows() 的结果，整体 zlib 压缩后写成 8 位 RGB 的 PNG"""
+    return b''.join((PNG_SIGNATURE,
+                     png_chunk(b'IHDR', PNG_IHDR.pack(width, height, 8, 2, 0, 0, 0)),
+                     png_chunk(b'IDAT', zlib.compress(rows, level)),
+                     png_chunk(b'IEND', b'')))
+
+
+class FrameCapture:
+    """屏幕录制器：grab() 在主线程调用，编码与写盘在 workers 个后台线程中进行"""
+    def __init__(self, path, size, bytesize, pitch, shifts, workers=None, buffers=None, block=False, level=1):
+        if bytesize not in (3, 4):
+            raise ValueError(f"不支持 {bytesize * 8} 位屏幕录制")
+        self.path = path
+        self.raw = path.endswith('.raw')
+        self.width, self.height = size
+        self.bytesize = bytesize
+        self.pitch = pitch
+        self.block = block
+        self.level = level
+        # 各颜色分量在像素内的字节偏移（小端）
+        self.offsets = tuple(shift // 8 for shift in shifts[:3])
+        if self.raw:
+            workers = 1  # 原始流必须按顺序写出
+            self._file = open(path, 'wb')
+        else:
+            workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+            os.makedirs(path, exist_ok=True)
+            self._file = None
+        buffers = buffers or 2 * workers + 2
+        self._buffers = [bytearray(pitch * self.height) for _ in range(buffers)]
+        self._views = [memoryview(b) for b in self._buffers]
+        self._free = queue.Queue()
+        for index in range(buffers):
+            self._free.put(index)
+        self._jobs = queue.SimpleQueue()
+        self.frames = 0      # 调用 grab() 的次数
+        self.written = 0
+        self.dropped = 0
+        self.grab_ms = 0.0   # grab() 累计耗时
+        self.max_grab_ms = 0.0
+        self.error = None
+        self._lock = threading.Lock()
+        self._workers = [threading.Thread(target=self._work, name=f'capture-{i}', daemon=True) for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    @classmethod
+    def for_surface(cls, path, surface, **kwargs):
+        return cls(path, surface.get_size(), surface.get_bytesize(), surface.get_pitch(),
+                   surface.get_shifts(), **kwargs)
+
+    def grab(self, surface):
+        """拷贝当前画面；没有空闲缓冲时丢帧（block=True 时等待），返回是否已拷贝"""
+        start = time.perf_counter()
+        self.frames += 1
+        try:
+            index = self._free.get(self.block)
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        self._views[index][:] = surface.get_buffer()
+        self._jobs.put((index, self.frames))
+        elapsed = (time.perf_counter() - start) * 1000
+        self.grab_ms += elapsed
+        self.max_grab_ms = max(self.max_grab_ms, elapsed)
+        return True
+
+    def _packed(self, buffer):
+        """去掉行尾填充，返回逐行紧密排列的像素"""
+        row = self.width * self.bytesize
+        if self.pitch == row:
+            return buffer
+        return b''.join(buffer[y * self.pitch:y * self.pitch + row] for y in range(self.height))
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            index, frame = job
+            try:
+                pixels = self._packed(self._buffers[index])
+                if self.raw:
+                    self._file.write(pixels)
+                else:
+                    rows = png_rows(pixels, self.width, self.height, self.bytesize, self.offsets)
+                    data = encode_png(rows, self.width, self.height, self.level)
+                    with open(os.path.join(self.path, f'frame_{frame:06d}.png'), 'wb') as f:
+                        f.write(data)
+                with self._lock:
+                    self.written += 1
+            except Exception as exc:
+                self.error = exc
+            finally:
+                self._free.put(index)
+
+    def pixel_format(self):
+        """原始流的 ffmpeg 像素格式名，如 bgr0 / rgb24"""
+        names = dict(zip(self.offsets, 'rgb'))
+        order = ''.join(names.get(i, '0') for i in range(self.bytesize))
+        return order if self.bytesize == 4 else order + '24'
+
+    def close(self):
+        """等待已拷贝的帧全部写出，返回统计"""
+        if self._workers:
+            for _ in self._workers:
+                self._jobs.put(None)
+            for worker in self._workers:
+                worker.join()
+            self._workers = []
+            if self._file is not None:
+                self._file.close()
+                with open(self.path + '.json', 'w', encoding='utf-8') as f:
+                    json.dump({'width': self.width, 'height': self.height, 'pixel_format': self.pixel_format(),
+                               'frames': self.written, 'dropped': self.dropped}, f, indent=2)
+        if self.error is not None:
+            raise self.error
+        return self.stats()
+
+    def stats(self):
+        copied = self.frames - self.dropped
+        return {'frames': self.frames, 'written': self.written, 'dropped': self.dropped,
+                'mean_grab_ms': round(self.grab_ms / copied, 3) if copied else 0.0,
+                'max_grab_ms': round(self.max_grab_ms, 3)}
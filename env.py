@@ -0,0 +1,330 @@
+"""Gym 风格的训练环境：单实例 GameEnv 与多进程向量化 VectorEnv
+
+动作为 4 个离散分量 (移动x, 移动y, 开火, 升级)，取值范围见 ACTION_NVEC：
+    移动 0/1/2 对应 -1/0/1；开火 0/1；升级 0 表示不选，1/2/3 对应升级界面的三个选项。
+升级界面出现时模拟暂停，直到动作给出升级选项（或设置了 auto_upgrade）。
+
+观测:
+    'state'  定长 float32 向量：玩家属性 + 最近的敌人/敌弹/补给相对坐标
+    'pixels' 渲染后缩小的 RGB 图像 (高, 宽, 3) uint8
+奖励为福分增量与经验增量之和；player.hp <= 0 时 done。
+
+用法:
+    env = GameEnv(seed=0)
+    obs, info = env.reset()
+    obs, reward, done, info = env.step((2, 1, 1, 0))
+
+    venv = VectorEnv(64, num_workers=8)
+    obs = venv.reset()
+    obs, rewards, dones, infos = venv.step(actions)   # actions: (64, 4) 整数数组
+"""
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+import pygame
+
+import game
+
+ACTION_NVEC = (3, 3, 2, 4)
+
+MAX_ENEMIES = 16
+MAX_ENEMY_BULLETS = 32
+MAX_SUPPLIES = 4
+PLAYER_FEATURES = 10
+STATE_SIZE = PLAYER_FEATURES + 2 * (MAX_ENEMIES + MAX_ENEMY_BULLETS + MAX_SUPPLIES)
+
+
+def decode_action(action):
+    """把离散动作 (或 FrameInput) 转换为 FrameInput"""
+    if isinstance(action, game.FrameInput):
+        return action
+    move_x, move_y, fire, upgrade = (int(a) for a in action)
+    return game.FrameInput(move_x - 1, move_y - 1, bool(fire), upgrade)
+
+# _xp_prefix[n]：从 1 级升到 n 级所需的总经验
+_xp_prefix = [0, 0]
+
+def xp_total(player):
+    """累计经验：此前各级升级所需经验之和 + 当前经验"""
+    while len(_xp_prefix) <= player.level:
+        level = len(_xp_prefix) - 1
+        _xp_prefix.append(_xp_prefix[-1] + (50 if level == 1 else int(50 * (level ** 1.5))))
+    return _xp_prefix[player.level] + player.xp
+
+
+class GameEnv:
+    def __init__(self, obs_type='state', obs_size=(84, 84), seed=None, frame_skip=1,
+                 max_steps=None, auto_upgrade=0):
+        if obs_type not in ('state', 'pixels'):
+            raise ValueError(f"未知观测类型: {obs_type}")
+        self.obs_type = obs_type
+        self.obs_size = tuple(obs_size)
+        self.frame_skip = frame_skip
+        self.max_steps = max_steps
+        self.auto_upgrade = auto_upgrade
+        self._seed = seed
+        self._episode = 0
+        self.state = None
+        self._canvas = None
+        self._renderer = None
+        if obs_type == 'state':
+            self.observation_shape = (STATE_SIZE,)
+            self.observation_dtype = np.float32
+        else:
+            self.observation_shape = (self.obs_size[1], self.obs_size[0], 3)
+            self.observation_dtype = np.uint8
+        self._obs = np.zeros(self.observation_shape, self.observation_dtype)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self._seed = seed
+        # 每局使用不同但可复现的种子
+        episode_seed = None if self._seed is None else self._seed * 1000003 + self._episode
+        self._episode += 1
+        if self.state is not None:
+            self._release(self.state)
+        self.state = game.GameState(episode_seed)
+        self.steps = 0
+        self._score = 0
+        self._xp = xp_total(self.state.player)
+        return self.observation(), self._info()
+
+    def step(self, action):
+        state = self.state
+        inputs = decode_action(action)
+        if state.pending_upgrades and not inputs.upgrade and self.auto_upgrade:
+            inputs = inputs._replace(upgrade=self.auto_upgrade)
+        for _ in range(self.frame_skip):
+            state.step(inputs, game.STEP_MS)
+            inputs = inputs._replace(upgrade=0)
+            if state.game_over or state.pending_upgrades:
+                break
+        self.steps += 1
+
+        xp = xp_total(state.player)
+        reward = (state.score - self._score) + (xp - self._xp)
+        self._score, self._xp = state.score, xp
+        done = state.player.hp <= 0
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            done = True
+        return self.observation(), float(reward), done, self._info()
+
+    def _info(self):
+        state = self.state
+        return {'score': state.score, 'level': state.player.level, 'frame': state.frame,
+                'pending_upgrade': bool(state.pending_upgrades)}
+
+    # --- 观测 ---
+    def observation(self):
+        if self.obs_type == 'state':
+            return self._state_observation()
+        return self._pixel_observation()
+
+    def _state_observation(self):
+        state = self.state
+        player = state.player
+        out = self._obs
+        out.fill(0.0)
+        px, py = player.rect.center
+        boss = next(iter(state.boss_group), None)
+        out[:PLAYER_FEATURES] = (
+            px / game.WIDTH, py / game.HEIGHT,
+            player.hp / player.max_hp, player.shield / player.max_shield,
+            player.level / 30, player.bullet_count / 3, player.is_laser,
+            bool(state.pending_upgrades), state.in_boss_fight,
+            max(0, boss.hp) / 3000 if boss is not None else 0.0,
+        )
+        offset = PLAYER_FEATURES
+        for points, limit in ((self._centers(state.enemies), MAX_ENEMIES),
+                              (self._enemy_bullet_centers(state), MAX_ENEMY_BULLETS),
+                              (self._centers(state.supplies), MAX_SUPPLIES)):
+            self._nearest(points, px, py, out[offset:offset + 2 * limit], limit)
+            offset += 2 * limit
+        return out
+
+    @staticmethod
+    def _centers(group):
+        return np.array([s.rect.center for s in group], np.float32).reshape(-1, 2)
+
+    def _enemy_bullet_centers(self, state):
+        centers = self._centers(state.enemy_bullets)
+        if state.bullet_field is not None and len(state.bullet_field):
+            centers = np.concatenate((centers, state.bullet_field.positions().astype(np.float32)))
+        return centers
+
+    @staticmethod
+    def _nearest(points, px, py, out, limit):
+        """写入最近的 limit 个点相对玩家的归一化坐标，按距离升序"""
+        if not len(points):
+            return
+        rel = points - (px, py)
+        rel /= (game.WIDTH, game.HEIGHT)
+        dist = np.einsum('ij,ij->i', rel, rel)
+        if len(rel) > limit:
+            idx = np.argpartition(dist, limit)[:limit]
+            rel, dist = rel[idx], dist[idx]
+        rel = rel[np.argsort(dist)]
+        out[:2 * len(rel)] = rel.ravel()
+
+    def _pixel_observation(self):
+        if self._renderer is None:
+            self._canvas = pygame.Surface((game.WIDTH, game.HEIGHT))
+            self._renderer = game.GameRenderer(self._canvas)
+        self._renderer.draw(self.state)
+        small = pygame.transform.smoothscale(self._canvas, self.obs_size)
+        # surfarray 为 (宽, 高, 3)，转为常见的 (高, 宽, 3)
+        self._obs[:] = pygame.surfarray.pixels3d(small).transpose(1, 0, 2)
+        return self._obs
+
+    @staticmethod
+    def _release(state):
+        # 归还池中对象，避免多局累积
+        for sprite in list(state.all_sprites):
+            sprite.kill()
+
+    def close(self):
+        if self.state is not None:
+            self._release(self.state)
+            self.state = None
+
+
+# --- 多进程向量化 ---
+def _worker(conn, shm_name, obs_shape, obs_dtype, first_index, count, env_kwargs):
+    game.init_headless()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        all_obs = np.ndarray(obs_shape, obs_dtype, buffer=shm.buf)
+        seed = env_kwargs.pop('seed', None)
+        envs = [GameEnv(seed=None if seed is None else seed + first_index + i, **env_kwargs)
+                for i in range(count)]
+        obs = all_obs[first_index:first_index + count]
+        while True:
+            cmd, data = conn.recv()
+            if cmd == 'reset':
+                infos = []
+                for i, env in enumerate(envs):
+                    obs[i], info = env.reset()
+                    infos.append(info)
+                conn.send(infos)
+            elif cmd == 'step':
+                rewards = np.zeros(count, np.float32)
+                dones = np.zeros(count, np.bool_)
+                infos = []
+                for i, env in enumerate(envs):
+                    o, rewards[i], dones[i], info = env.step(data[i])
+                    if dones[i]:
+                        # 自动重置，终局观测放在 info 里
+                        info['terminal_observation'] = o.copy()
+                        o, _ = env.reset()
+                    obs[i] = o
+                    infos.append(info)
+                conn.send((rewards, dones, infos))
+            elif cmd == 'close':
+                for env in envs:
+                    env.close()
+                conn.send(None)
+                break
+    finally:
+        del all_obs, obs
+        shm.close()
+        conn.close()
+
+
+class VectorEnv:
+    """在进程池中运行 num_envs 个 GameEnv；观测写入共享内存，避免跨进程序列化图像/向量。
+
+    step() 返回的观测数组直接映射共享内存，下一次 step/reset 时会被覆盖，需要保留时请 copy()。
+    """
+    def __init__(self, num_envs, num_workers=None, **env_kwargs):
+        self.num_envs = num_envs
+        num_workers = min(num_envs, num_workers or os.cpu_count() or 1)
+        probe = GameEnv(**{k: v for k, v in env_kwargs.items() if k != 'seed'})
+        self.observation_shape = (num_envs,) + probe.observation_shape
+        dtype = np.dtype(probe.observation_dtype)
+        self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.observation_shape)) * dtype.itemsize)
+        self.observations = np.ndarray(self.observation_shape, dtype, buffer=self._shm.buf)
+
+        ctx = mp.get_context('fork' if 'fork' in mp.get_all_start_methods() else 'spawn')
+        self._conns = []
+        self._procs = []
+        self._slices = []
+        base, extra = divmod(num_envs, num_workers)
+        start = 0
+        for w in range(num_workers):
+            count = base + (1 if w < extra else 0)
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_worker, daemon=True,
+                               args=(child, self._shm.name, self.observation_shape, dtype, start, count, dict(env_kwargs)))
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+            self._slices.append(slice(start, start + count))
+            start += count
+
+    def reset(self):
+        for conn in self._conns:
+            conn.send(('reset', None))
+        for conn in self._conns:
+            conn.recv()
+        return self.observations
+
+    def step(self, actions):
+        actions = np.asarray(actions, np.int64)
+        for conn, sl in zip(self._conns, self._slices):
+            conn.send(('step', actions[sl]))
+        rewards = np.empty(self.num_envs, np.float32)
+        dones = np.empty(self.num_envs, np.bool_)
+        infos = []
+        for conn, sl in zip(self._conns, self._slices):
+            r, d, i = conn.recv()
+            rewards[sl] = r
+            dones[sl] = d
+            infos.extend(i)
+        return self.observations, rewards, dones, infos
+
+    def close(self):
+        if self._shm is None:
+            return
+        for conn in self._conns:
+            try:
+                conn.send(('close', None))
+                conn.recv()
+            except (BrokenPipeError, EOFError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+        del self.observations
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    # 简单吞吐量测试：随机动作
+    import time
+    game.init_headless()
+    rng = np.random.default_rng(0)
+    env = GameEnv(seed=0)
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(5000):
+        _, _, done, _ = env.step(rng.integers(0, ACTION_NVEC))
+        if done:
+            env.reset()
+    print(f"GameEnv: {5000 / (time.perf_counter() - start):.0f} 步/秒")
+
+    with VectorEnv(32, seed=0) as venv:
+        venv.reset()
+        start = time.perf_counter()
+        for _ in range(300):
+            venv.step(rng.integers(0, ACTION_NVEC, size=(32, 4)))
+        print(f"VectorEnv(32): {32 * 300 / (time.perf_counter() - start):.0f} 步/秒")
@@ -1,7 +1,28 @@
+import os
+
+# telemetry.py --json 等工具导入本模块后输出机器可读的结果，不打印 pygame 的欢迎信息
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
 import pygame
 import random
 import math
-import os
+import copy
+import csv
+import json
+import mmap
+import struct
+import sys
+import threading
+import time
+import weakref
+import zlib
+from array import array
+from collections import OrderedDict, deque, namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # 未安装 NumPy 时退回逐精灵的粒子
+    np = None
 
 # --- 喜庆色彩配置 ---
 BG_RED = (60, 10, 10)       # 深朱红背景
@@ -15,6 +36,8 @@ GREEN = (50, 205, 50)       # 绿色（补给）
 
 WIDTH, HEIGHT = 900, 700
 FPS = 60
+STEP_MS = 1000 / FPS     # 固定逻辑步长（毫秒），所有速度都以“每步”为单位
+MAX_STEPS_PER_CALL = 5   # 单次 step 最多补算的步数，避免卡顿后的死亡螺旋
 
 # 获取资源路径
 def get_asset_path(filename):
@@ -22,50 +45,693 @@ def get_asset_path(filename):
     current_dir = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(current_dir, 'assets', filename)
 
+# --- 预缩放资源包：由 build_assets.py 离线生成，运行时内存映射，无需解码 PNG ---
+BUNDLE_MAGIC = b'FJDZPAK1'
+BUNDLE_HEADER = struct.Struct('<8sI')
+# 每个条目：名称长度、宽、高、通道数、源文件 mtime_ns、源文件大小、像素偏移，其后紧跟 UTF-8 名称
+BUNDLE_ENTRY = struct.Struct('<HHHBqQQ')
+
+class AssetBundle:
+    """只读打开资源包，把原始像素直接包装成 Surface"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            # ACCESS_COPY 为私有映射：frombuffer 需要可写缓冲，写入也不会落到文件
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, count = BUNDLE_HEADER.unpack_from(self._mmap, 0)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"不是资源包: {path}")
+        self._entries = {}
+        pos = BUNDLE_HEADER.size
+        for _ in range(count):
+            name_len, w, h, channels, mtime_ns, src_size, offset = BUNDLE_ENTRY.unpack_from(self._mmap, pos)
+            pos += BUNDLE_ENTRY.size
+            name = bytes(self._mmap[pos:pos + name_len]).decode('utf-8')
+            pos += name_len
+            self._entries[(name, (w, h))] = (channels, mtime_ns, src_size, offset)
+
+    def surface(self, filename, size):
+        """返回包内的图像；不在包内或源文件已更新时返回 None"""
+        entry = self._entries.get((filename, tuple(size)))
+        if entry is None:
+            return None
+        channels, mtime_ns, src_size, offset = entry
+        try:
+            st = os.stat(get_asset_path(filename))
+            if st.st_mtime_ns != mtime_ns or st.st_size != src_size:
+                return None
+        except OSError:
+            pass  # 只发布资源包、不带源 PNG 时直接使用
+        length = size[0] * size[1] * channels
+        view = memoryview(self._mmap)[offset:offset + length]
+        return pygame.image.frombuffer(view, size, 'RGBA' if channels == 4 else 'RGB')
+
+def default_bundle_path():
+    return get_asset_path('assets.bundle')
+
+# --- 资源缓存：每张图像只解码、转换、缩放一次 ---
+class AssetRegistry:
+    """按 (文件名, 尺寸) 缓存图像，所有实例共享同一个 Surface"""
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._images = OrderedDict()
+        self.bundle = None
+        self.hits = 0
+        self.misses = 0
+        self.bundle_hits = 0
+
+    def use_bundle(self, path=None):
+        """加载预缩放资源包；文件不存在或损坏时返回 False，继续从 PNG 加载"""
+        path = path or default_bundle_path()
+        if not os.path.exists(path):
+            return False
+        try:
+            self.bundle = AssetBundle(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"无法加载资源包: {e}")
+            return False
+        return True
+
+    def image(self, filename, size, fallback=None, alpha=True, label=None):
+        """取得缩放后的图像；加载失败时调用 fallback 绘制一次后备图像并缓存"""
+        key = (filename, size)
+        if key in self._images:
+            self.hits += 1
+            self._images.move_to_end(key)
+            return self._images[key]
+
+        self.misses += 1
+        if self.bundle is not None:
+            surface = self.bundle.surface(filename, size)
+            if surface is not None:
+                self.bundle_hits += 1
+                return self._store(key, to_display_format(surface, alpha))
+        try:
+            original_image = pygame.image.load(get_asset_path(filename))
+            original_image = to_display_format(original_image, alpha)
+            surface = pygame.transform.smoothscale(original_image, size)
+        except Exception as e:
+            print(f"无法加载{label or filename}: {e}")
+            if fallback is None:
+                raise
+            surface = fallback()
+        return self._store(key, surface)
+
+    def _store(self, key, surface):
+        self._images[key] = surface
+        # 超出上限时淘汰最久未使用的图像
+        while len(self._images) > self.max_entries:
+            self._images.popitem(last=False)
+        return surface
+
+    def stats(self):
+        return {'entries': len(self._images), 'hits': self.hits, 'misses': self.misses,
+                'bundle_hits': self.bundle_hits}
+
+    def clear(self):
+        self._images.clear()
+        self.hits = 0
+        self.misses = 0
+        self.bundle_hits = 0
+
+# --- 字体：解析结果跨进程缓存，字体对象进程内复用 ---
+FONT_NAME = "SimHei"
+_fonts = {}
+
+def font_cache_path():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'feijidazhan', 'fonts.json')
+
+def font_dirs():
+    """系统与用户字体目录（不存在的目录也列出）"""
+    home = os.path.expanduser('~')
+    if sys.platform == 'win32':
+        return [os.path.join(os.environ.get('WINDIR', r'C:\Windows'), 'Fonts'),
+                os.path.join(os.environ.get('LOCALAPPDATA', home), 'Microsoft', 'Windows', 'Fonts')]
+    if sys.platform == 'darwin':
+        return ['/System/Library/Fonts', '/Library/Fonts', os.path.join(home, 'Library', 'Fonts')]
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.join(home, '.local', 'share')
+    return ['/usr/share/fonts', '/usr/local/share/fonts', os.path.join(data_home, 'fonts'),
+            os.path.join(home, '.fonts')]
+
+def font_dirs_mtime():
+    """字体目录及其子目录的最新修改时间：安装或删除字体都会改变它"""
+    latest = 0
+    for root in font_dirs():
+        for path, _, _ in os.walk(root):
+            try:
+                latest = max(latest, os.stat(path).st_mtime_ns)
+            except OSError:
+                pass
+    return latest
+
+def resolve_font_path(name=FONT_NAME):
+    """返回字体文件路径（找不到时为 None，使用默认字体）；避免每次启动都扫描系统字体。
+    找不到的结果连同字体目录的修改时间一起缓存，安装新字体后重新查找"""
+    cache_path = font_cache_path()
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cached = cache.get(name)
+    if isinstance(cached, str) and os.path.exists(cached):
+        return cached
+    # 先取修改时间再查找：查找期间安装的字体会在下次启动时被发现
+    dirs_mtime = font_dirs_mtime()
+    if isinstance(cached, dict) and cached.get('missing') == dirs_mtime:
+        return None
+
+    path = pygame.font.match_font(name)
+    cache[name] = path if path is not None else {'missing': dirs_mtime}
+    # 先写临时文件再替换：多个进程（如 VectorEnv 的工作进程）同时写入时不会留下半个文件
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    return path
+
+def get_font(size, name=FONT_NAME):
+    """取得共享的字体对象"""
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = _fonts[key] = pygame.font.Font(resolve_font_path(name), size)
+    return font
+
+def to_display_format(surface, alpha=True):
+    """已创建窗口时转换为显示格式；无窗口（无头模式）时原样返回"""
+    if pygame.display.get_surface() is None:
+        return surface
+    return surface.convert_alpha() if alpha else surface.convert()
+
+# 后备方案：图像缺失时的简单造型
+def draw_player_fallback():
+    image = pygame.Surface((50, 50), pygame.SRCALPHA)
+    pygame.draw.ellipse(image, WHITE, (15, 5, 20, 40))
+    pygame.draw.line(image, GOLD, (25, 5), (15, 0), 3)
+    pygame.draw.line(image, GOLD, (25, 5), (35, 0), 3)
+    return image
+
+def draw_boss_fallback():
+    image = pygame.Surface((160, 100), pygame.SRCALPHA)
+    pygame.draw.ellipse(image, FESTIVE_RED, (10, 10, 140, 80))
+    pygame.draw.rect(image, GOLD, (10, 10, 140, 80), 4)
+    return image
+
+def draw_enemy_fallback():
+    image = pygame.Surface((40, 50), pygame.SRCALPHA)
+    pygame.draw.ellipse(image, FESTIVE_RED, (5, 0, 30, 35))
+    pygame.draw.rect(image, GOLD, (15, 35, 10, 10))
+    return image
+
+def draw_supply_fallback(fill_color, border_color):
+    def draw():
+        image = pygame.Surface((30, 30), pygame.SRCALPHA)
+        pygame.draw.rect(image, fill_color, (0, 0, 30, 30), border_radius=5)
+        pygame.draw.rect(image, border_color, (0, 0, 30, 30), 2, border_radius=5)
+        return image
+    return draw
+
+# 游戏内用到的全部 (图像文件, 尺寸, 是否带透明通道)，由 build_assets.py 预缩放打包
+BUNDLED_ASSETS = (
+    ('longma_player.png', (70, 70), True),
+    ('lantern_boss.png', (180, 140), True),
+    ('lantern_enemy.png', (45, 55), True),
+    ('supply_weapon.png', (40, 40), True),
+    ('supply_heal.png', (40, 40), True),
+    ('supply_shield.png', (40, 40), True),
+    ('background.png', (WIDTH, HEIGHT), False),
+)
+
+# 补给类型 -> (图像文件, 名称, 后备绘制)
+SUPPLY_IMAGES = {
+    'weapon': ('supply_weapon.png', '武器补给图像', draw_supply_fallback(GOLD, WHITE)),
+    'heal': ('supply_heal.png', '治疗补给图像', draw_supply_fallback(FESTIVE_RED, GOLD)),
+    'shield': ('supply_shield.png', '护盾补给图像', draw_supply_fallback(CYAN, WHITE)),
+}
+
+assets = AssetRegistry()
+
+# --- 程序绘制的模板：每种 (类型, 颜色, 尺寸) 只绘制一次 ---
+def paint_laser(color, size):
+    """绘制更华丽的激光"""
+    width, height = size
+    image = pygame.Surface(size, pygame.SRCALPHA)
+    for i in range(width):
+        alpha = 255 - i * 10
+        pygame.draw.rect(image, (*color[:3], max(0, alpha)), (i//2, 0, width-i, height))
+    pygame.draw.rect(image, WHITE, (width//2 - 2, 0, 4, height))
+    return image
+
+def paint_bullet(color, size):
+    """金色烟花子弹"""
+    width, height = size
+    image = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.ellipse(image, color, (0, 0, width, height))
+    pygame.draw.ellipse(image, YELLOW, (2, 2, width-4, height-4))
+    return image
+
+def paint_enemy_bullet(color, size):
+    """绘制烟花弹"""
+    radius = size // 2
+    image = pygame.Surface((size, size), pygame.SRCALPHA)
+    pygame.draw.circle(image, color, (radius, radius), radius)
+    pygame.draw.circle(image, GOLD, (radius, radius), radius, 2)
+    pygame.draw.circle(image, WHITE, (radius, radius), radius // 2)
+    return image
+
+def paint_particle(color, size):
+    """绘制发光粒子"""
+    image = pygame.Surface((size, size), pygame.SRCALPHA)
+    pygame.draw.circle(image, color, (size//2, size//2), size//2)
+    # 添加发光效果
+    glow_color = (color[0], color[1], color[2], 128)
+    pygame.draw.circle(image, glow_color, (size//2, size//2), size//2 + 1)
+    return image
+
+class SurfaceTemplates:
+    """缓存程序绘制的共享 Surface，并预生成淡出帧序列"""
+    painters = {
+        'laser': paint_laser,
+        'bullet': paint_bullet,
+        'enemy_bullet': paint_enemy_bullet,
+        'particle': paint_particle,
+    }
+
+    def __init__(self):
+        self._surfaces = {}
+        self._faded = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind, color, size):
+        key = (kind, tuple(color), size)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = to_display_format(self.painters[kind](color, size))
+        self._surfaces[key] = surface
+        return surface
+
+    def faded(self, kind, color, size, steps):
+        """返回 steps+1 帧：下标 i 的透明度为 255 * i / steps"""
+        key = (kind, tuple(color), size, steps)
+        frames = self._faded.get(key)
+        if frames is not None:
+            self.hits += 1
+            return frames
+        base = self.get(kind, color, size)
+        frames = []
+        for i in range(steps + 1):
+            frame = base.copy()
+            frame.set_alpha(int(255 * i / steps))
+            frames.append(frame)
+        # 满寿命帧与原模板一致，不额外叠加整体透明度
+        frames[steps] = base
+        frames = tuple(frames)
+        self._faded[key] = frames
+        return frames
+
+    def stats(self):
+        return {'surfaces': len(self._surfaces), 'faded': len(self._faded),
+                'hits': self.hits, 'misses': self.misses}
+
+templates = SurfaceTemplates()
+
+# --- 对象池：预分配精灵，kill() 后回收复用 ---
+class PooledSprite(pygame.sprite.Sprite):
+    """可被对象池回收的精灵；子类在 reset() 中完成全部初始化"""
+    pool = None  # 直接构造的实例不属于任何池
+
+    def kill(self):
+        super().kill()
+        if self.pool is not None:
+            self.pool.release(self)
+
+class SpritePool:
+    def __init__(self, sprite_class, capacity=0):
+        self.sprite_class = sprite_class
+        self.capacity = capacity  # 预分配数量
+        self._free = []
+        self.in_use = 0
+        self.high_water = 0
+        self.created = 0
+        for _ in range(capacity):
+            self._free.append(self._create())
+
+    def _create(self):
+        # 跳过子类 __init__，空白实例等到 acquire 时再 reset
+        sprite = self.sprite_class.__new__(self.sprite_class)
+        pygame.sprite.Sprite.__init__(sprite)
+        sprite.pool = self
+        sprite.pooled = True
+        sprite.generation = 0  # 每次取出加一，区分同一对象的先后两次使用
+        self.created += 1
+        return sprite
+
+    def acquire(self, *args, **kwargs):
+        sprite = self._free.pop() if self._free else self._create()
+        sprite.reset(*args, **kwargs)
+        sprite.pooled = False
+        sprite.generation += 1
+        self.in_use += 1
+        if self.in_use > self.high_water:
+            self.high_water = self.in_use
+        return sprite
+
+    def release(self, sprite):
+        # 同一帧内可能被 kill() 多次（如普通子弹同时命中多个目标）
+        if sprite.pooled:
+            return
+        sprite.pooled = True
+        self.in_use -= 1
+        self._free.append(sprite)
+
+    def stats(self):
+        return {'in_use': self.in_use, 'free': len(self._free),
+                'high_water': self.high_water, 'created': self.created}
+
 # --- 特效类：粒子系统 ---
-class Particle(pygame.sprite.Sprite):
-    def __init__(self, x, y, color, size=4):
+class Particle(PooledSprite):
+    def __init__(self, x, y, color, size=4, rng=random):
         super().__init__()
-        self.image = pygame.Surface((size, size), pygame.SRCALPHA)
-        # 绘制发光粒子
-        pygame.draw.circle(self.image, color, (size//2, size//2), size//2)
-        # 添加发光效果
-        glow_color = (color[0], color[1], color[2], 128)
-        pygame.draw.circle(self.image, glow_color, (size//2, size//2), size//2 + 1)
-        self.rect = self.image.get_rect(center=(x, y))
-        self.vel_x = random.uniform(-4, 4)
-        self.vel_y = random.uniform(-4, 4)
+        self.reset(x, y, color, size, rng)
+
+    def reset(self, x, y, color, size=4, rng=random):
         self.lifetime = 30
         self.original_lifetime = 30
+        # 共享的淡出帧序列，按剩余寿命取帧
+        self.frames = templates.faded('particle', color, size, self.original_lifetime)
+        self.image = self.frames[self.lifetime]
+        self.rect = self.image.get_rect(center=(x, y))
+        self.vel_x = rng.uniform(-4, 4)
+        self.vel_y = rng.uniform(-4, 4)
 
     def update(self):
         self.rect.x += self.vel_x
         self.rect.y += self.vel_y
         self.lifetime -= 1
         # 粒子淡出效果
-        alpha = int(255 * (self.lifetime / self.original_lifetime))
-        if alpha > 0:
-            self.image.set_alpha(alpha)
-        if self.lifetime <= 0:
+        if self.lifetime > 0:
+            self.image = self.frames[self.lifetime]
+        else:
             self.kill()
 
+class ParticleSystem:
+    """结构数组粒子引擎：位置、速度、寿命和样式存放在预分配的 NumPy 数组中，
+    每帧批量更新一次，并通过一次 Surface.blits 绘制预渲染的淡出帧"""
+    def __init__(self, capacity=65536, lifetime=30, seed=None):
+        self.capacity = capacity
+        self.lifetime = lifetime
+        self.count = 0
+        self.pos = np.zeros((capacity, 2), np.float32)
+        self.vel = np.zeros((capacity, 2), np.float32)
+        self.life = np.zeros(capacity, np.int32)
+        self.style = np.zeros(capacity, np.int32)
+        self.rng = np.random.default_rng(seed)
+        self.dropped = 0
+        self.journal = None  # 为列表时记录 ('explosion', x, y, 颜色, 数量, 尺寸)，联机时同步给客户端
+        # 样式 (颜色, 尺寸) -> 下标；帧表按 样式 * (寿命 + 1) + 剩余寿命 展开
+        self._styles = {}
+        self._frame_table = []
+        self._half_size = np.zeros((0, 2), np.float32)
+
+    def _style_index(self, color, size):
+        key = (tuple(color), size)
+        index = self._styles.get(key)
+        if index is None:
+            index = len(self._styles)
+            self._styles[key] = index
+            self._frame_table.extend(templates.faded('particle', color, size, self.lifetime))
+            self._half_size = np.vstack([self._half_size, [[size // 2, size // 2]]]).astype(np.float32)
+        return index
+
+    def emit(self, x, y, color, count=15, size=5):
+        """在 (x, y) 生成 count 个粒子，尺寸在 3..size 之间随机"""
+        if self.journal is not None:
+            self.journal.append(('explosion', x, y, tuple(color), count, size))
+        n = min(count, self.capacity - self.count)
+        self.dropped += count - n
+        if n <= 0:
+            return
+        styles = np.array([self._style_index(color, s) for s in range(3, max(3, size) + 1)], np.int32)
+        start, end = self.count, self.count + n
+        self.pos[start:end] = (x, y)
+        self.vel[start:end] = self.rng.uniform(-4, 4, (n, 2))
+        self.life[start:end] = self.lifetime
+        self.style[start:end] = styles[self.rng.integers(0, len(styles), n)]
+        self.count = end
+
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+        self.pos[:n] += self.vel[:n]
+        self.life[:n] -= 1
+        alive = self.life[:n] > 0
+        alive_count = int(np.count_nonzero(alive))
+        if alive_count < n:
+            # 原地压缩：存活粒子前移，数组不重新分配
+            for arr in (self.pos, self.vel, self.life, self.style):
+                arr[:alive_count] = arr[:n][alive]
+            self.count = alive_count
+
+    def draw(self, surface, stride=1):
+        """stride > 1 时只绘制每 stride 个粒子中的一个（画质降级），模拟不受影响"""
+        n = self.count
+        if n == 0:
+            return
+        style = self.style[:n:stride]
+        frame_ids = (style * (self.lifetime + 1) + self.life[:n:stride]).tolist()
+        topleft = (self.pos[:n:stride] - self._half_size[style]).astype(np.int32).tolist()
+        table = self._frame_table
+        surface.blits([(table[i], p) for i, p in zip(frame_ids, topleft)], False)
+
+    def dirty_rects(self, tile=64):
+        """按 tile 像素分块返回被粒子占据的区域"""
+        n = self.count
+        if n == 0:
+            return []
+        cells = np.unique((self.pos[:n] // tile).astype(np.int32), axis=0).tolist()
+        pad = 8  # 覆盖粒子半径与发光边缘
+        return [pygame.Rect(cx * tile - pad, cy * tile - pad, tile + 2 * pad, tile + 2 * pad) for cx, cy in cells]
+
+    def snapshot(self):
+        """只读副本：复制存活粒子的位置、寿命与样式，供其他线程绘制"""
+        snap = copy.copy(self)
+        n = self.count
+        snap.pos = self.pos[:n].copy()
+        snap.life = self.life[:n].copy()
+        snap.style = self.style[:n].copy()
+        snap.vel = None
+        snap._frame_table = list(self._frame_table)
+        return snap
+
+    def empty(self):
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+# --- 弹幕引擎 ---
+# 声明式弹幕：kind 为 'fan'（扇形，count=1 即单发）或 'ring'（环形）；
+# speed 初速（像素/步），spread 扇形总角度，spin 每步转向角速度（度），accel 沿初始方向的加速度，
+# rotate 每轮齐射整体旋转的角度（用于螺旋），aim 为 True 时以玩家为中心方向，否则朝正下方
+BulletPattern = namedtuple('BulletPattern', 'kind count speed spread spin accel rotate aim color',
+                           defaults=('fan', 1, 6.0, 0.0, 0.0, 0.0, 0.0, False, FESTIVE_RED))
+
+STRAIGHT_SHOT = BulletPattern()
+
+class BulletField:
+    """敌方弹幕：位置、速度、加速度、角速度存放在连续的 NumPy 数组中，
+    批量推进、批量剔除屏幕外子弹、向量化判定与玩家的碰撞，并从共享模板批量绘制"""
+    def __init__(self, capacity=8192, size=16, margin=64):
+        self.capacity = capacity
+        self.size = size
+        self.margin = margin
+        self.count = 0
+        self.pos = np.zeros((capacity, 2), np.float64)
+        self.vel = np.zeros((capacity, 2), np.float64)
+        self.acc = np.zeros((capacity, 2), np.float64)
+        self.spin = np.zeros((capacity, 2), np.float64)  # 每步旋转角的 (cos, sin)
+        self.style = np.zeros(capacity, np.int32)
+        self.ids = np.zeros(capacity, np.uint32)  # 按发射顺序编号，联机时用于指明被命中的子弹
+        self.next_id = 0
+        self.dropped = 0
+        self.emitted = 0
+        self.mask_tests = 0
+        # 为列表时按顺序记录 ('emit', 弹幕, x, y, 目标, 轮次) / ('hit', 编号列表) / ('update',)，
+        # 另一端按同样顺序重放即可得到逐位相同的弹幕
+        self.journal = None
+        self._colors = []  # 样式下标 -> 颜色
+
+    def emit(self, pattern, x, y, target=None, volley=0):
+        """按弹幕声明在 (x, y) 发射一轮子弹"""
+        if self.journal is not None:
+            self.journal.append(('emit', pattern, x, y, target, volley))
+        n = min(pattern.count, self.capacity - self.count)
+        self.dropped += pattern.count - n
+        if n <= 0:
+            return
+        if pattern.aim and target is not None:
+            base = math.degrees(math.atan2(target[1] - y, target[0] - x))
+        else:
+            base = 90.0  # 正下方
+        base += pattern.rotate * volley
+        if pattern.kind == 'ring':
+            angles = base + np.arange(pattern.count) * (360.0 / pattern.count)
+        elif pattern.count > 1:
+            angles = base + np.linspace(-pattern.spread / 2, pattern.spread / 2, pattern.count)
+        else:
+            angles = np.array([base])
+        rad = np.radians(angles[:n])
+        dirs = np.stack((np.cos(rad), np.sin(rad)), axis=1)
+
+        color = tuple(pattern.color)
+        if color not in self._colors:
+            self._colors.append(color)
+        start, end = self.count, self.count + n
+        self.pos[start:end] = (x, y)
+        self.vel[start:end] = dirs * pattern.speed
+        self.acc[start:end] = dirs * pattern.accel
+        spin = math.radians(pattern.spin)
+        self.spin[start:end] = (math.cos(spin), math.sin(spin))
+        self.style[start:end] = self._colors.index(color)
+        self.ids[start:end] = np.arange(self.next_id, self.next_id + n, dtype=np.int64) & 0xFFFFFFFF
+        self.next_id = (self.next_id + n) & 0xFFFFFFFF
+        self.count = end
+        self.emitted += n
+
+    def update(self):
+        if self.journal is not None:
+            self.journal.append(('update',))
+        n = self.count
+        if n == 0:
+            return
+        vel = self.vel[:n]
+        vel += self.acc[:n]
+        spin = self.spin[:n]
+        vx = vel[:, 0].copy()
+        vel[:, 0] = vx * spin[:, 0] - vel[:, 1] * spin[:, 1]
+        vel[:, 1] = vx * spin[:, 1] + vel[:, 1] * spin[:, 0]
+        pos = self.pos[:n]
+        pos += vel
+        m = self.margin
+        keep = (pos[:, 0] > -m) & (pos[:, 0] < WIDTH + m) & (pos[:, 1] > -m) & (pos[:, 1] < HEIGHT + m)
+        self._compact(keep)
+
+    def _compact(self, keep):
+        n = self.count
+        k = int(np.count_nonzero(keep))
+        if k < n:
+            for arr in (self.pos, self.vel, self.acc, self.spin, self.style, self.ids):
+                arr[:k] = arr[:n][keep]
+            self.count = k
+
+    def collide_rect(self, rect, dokill=True, mask=None):
+        """返回与 rect 相交的子弹数量，dokill 时移除这些子弹。
+
+        给出 mask（rect 处图像的遮罩）时，矩形相交的子弹再逐个与子弹模板的遮罩比较。
+        """
+        n = self.count
+        if n == 0:
+            return 0
+        half = self.size / 2
+        pos = self.pos[:n]
+        # 与 16x16 精灵矩形相交的判定一致
+        hit = ((pos[:, 0] + half > rect.left) & (pos[:, 0] - half < rect.right) &
+               (pos[:, 1] + half > rect.top) & (pos[:, 1] - half < rect.bottom))
+        if mask is not None:
+            candidates = np.flatnonzero(hit)
+            self.mask_tests += len(candidates)
+            if len(candidates):
+                bullet_masks = [masks.get(templates.get('enemy_bullet', color, self.size)) for color in self._colors]
+                topleft = (pos[candidates] - half).astype(np.int32).tolist()
+                for i, (x, y), s in zip(candidates.tolist(), topleft, self.style[candidates].tolist()):
+                    if mask.overlap(bullet_masks[s], (x - rect.x, y - rect.y)) is None:
+                        hit[i] = False
+        hits = int(np.count_nonzero(hit))
+        if hits and dokill:
+            if self.journal is not None:
+                self.journal.append(('hit', self.ids[:n][hit].tolist()))
+            self._compact(~hit)
+        return hits
+
+    def remove_ids(self, ids):
+        """移除指定编号的子弹（重放 'hit' 记录）"""
+        n = self.count
+        if n:
+            self._compact(~np.isin(self.ids[:n], np.asarray(ids, np.uint32)))
+
+    def draw(self, surface):
+        n = self.count
+        if n == 0:
+            return
+        images = [templates.get('enemy_bullet', color, self.size) for color in self._colors]
+        topleft = (self.pos[:n] - self.size / 2).astype(np.int32).tolist()
+        if len(images) == 1:
+            image = images[0]
+            surface.blits([(image, p) for p in topleft], False)
+        else:
+            surface.blits([(images[s], p) for s, p in zip(self.style[:n].tolist(), topleft)], False)
+
+    def dirty_rects(self, tile=64):
+        n = self.count
+        if n == 0:
+            return []
+        cells = np.unique((self.pos[:n] // tile).astype(np.int32), axis=0).tolist()
+        pad = self.size // 2 + 7  # 子弹半径 + 一步位移
+        return [pygame.Rect(cx * tile - pad, cy * tile - pad, tile + 2 * pad, tile + 2 * pad) for cx, cy in cells]
+
+    def positions(self):
+        return self.pos[:self.count]
+
+    def snapshot(self):
+        """只读副本：只保留绘制需要的位置与样式"""
+        snap = copy.copy(self)
+        n = self.count
+        snap.pos = self.pos[:n].copy()
+        snap.style = self.style[:n].copy()
+        snap.vel = snap.acc = snap.spin = None
+        snap._colors = list(self._colors)
+        return snap
+
+    def clear(self):
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+# Boss 弹幕阶段：(剩余血量比例下限, ((间隔毫秒, 弹幕), ...))，按血量从高到低匹配
+BOSS_PHASES = (
+    (0.66, ((700, BulletPattern('fan', 5, 5.0, 50.0, aim=True)),
+            (2100, BulletPattern('ring', 24, 3.5, color=GOLD)))),
+    (0.33, ((90, BulletPattern('ring', 4, 4.0, rotate=11.0)),
+            (1400, BulletPattern('fan', 7, 6.0, 40.0, aim=True)))),
+    (0.0, ((450, BulletPattern('ring', 36, 2.5, spin=0.6, accel=0.02, rotate=5.0, color=GOLD)),
+           (800, BulletPattern('fan', 3, 8.0, 12.0, aim=True)))),
+)
+# 无弹幕引擎时的旧式发射节奏
+LEGACY_SCHEDULE = {False: ((2000, STRAIGHT_SHOT),), True: ((700, STRAIGHT_SHOT),)}
+
 class Player(pygame.sprite.Sprite):
     def __init__(self):
         super().__init__()
-        # 加载龙马图像
-        try:
-            original_image = pygame.image.load(get_asset_path('longma_player.png')).convert_alpha()
-            # 缩放到合适大小
-            self.base_image = pygame.transform.smoothscale(original_image, (70, 70))
-            self.image = self.base_image.copy()
-        except Exception as e:
-            print(f"无法加载龙马图像: {e}")
-            # 后备方案：绘制简单的龙马造型
-            self.image = pygame.Surface((50, 50), pygame.SRCALPHA)
-            pygame.draw.ellipse(self.image, WHITE, (15, 5, 20, 40))
-            pygame.draw.line(self.image, GOLD, (25, 5), (15, 0), 3)
-            pygame.draw.line(self.image, GOLD, (25, 5), (35, 0), 3)
-            self.base_image = self.image.copy()
+        # 加载龙马图像（缩放到合适大小）
+        self.base_image = assets.image('longma_player.png', (70, 70), draw_player_fallback, label='龙马图像')
+        self.image = self.base_image.copy()
         
         self.rect = self.image.get_rect(center=(WIDTH//2, HEIGHT - 100))
         
@@ -83,13 +749,11 @@ class Player(pygame.sprite.Sprite):
         self.is_laser = False
         self.last_shot = 0
         self.engine_particles = []
+        self.move = (0, 0)  # 本步的移动方向，由 GameState 根据输入设置
 
     def update(self):
-        keys = pygame.key.get_pressed()
-        dx = (keys[pygame.K_d] - keys[pygame.K_a]) * self.speed
-        dy = (keys[pygame.K_s] - keys[pygame.K_w]) * self.speed
-        self.rect.x += dx
-        self.rect.y += dy
+        self.rect.x += self.move[0] * self.speed
+        self.rect.y += self.move[1] * self.speed
         self.rect.clamp_ip(pygame.Rect(0, 0, WIDTH, HEIGHT))
         
         self.shield_regen_timer += 1
@@ -106,40 +770,30 @@ class Player(pygame.sprite.Sprite):
             return True
         return False
 
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self, is_boss=False):
+class Enemy(PooledSprite):
+    def __init__(self, is_boss=False, rng=random, now=None, level=1):
         super().__init__()
+        self.reset(is_boss, rng, now, level)
+
+    def reset(self, is_boss=False, rng=random, now=None, level=1):
         self.is_boss = is_boss
         
         if is_boss:
             # 加载Boss灯笼图像
-            try:
-                original_image = pygame.image.load(get_asset_path('lantern_boss.png')).convert_alpha()
-                self.image = pygame.transform.smoothscale(original_image, (180, 140))
-            except Exception as e:
-                print(f"无法加载Boss灯笼图像: {e}")
-                # 后备方案
-                self.image = pygame.Surface((160, 100), pygame.SRCALPHA)
-                pygame.draw.ellipse(self.image, FESTIVE_RED, (10, 10, 140, 80))
-                pygame.draw.rect(self.image, GOLD, (10, 10, 140, 80), 4)
-            self.hp = 1000 + (player_lvl_ref * 60)
+            self.image = assets.image('lantern_boss.png', (180, 140), draw_boss_fallback, label='Boss灯笼图像')
+            self.hp = 1000 + (level * 60)
+            self.max_hp = self.hp
             self.rect = self.image.get_rect(center=(WIDTH//2, -100))
             self.speed = 2
         else:
             # 加载普通灯笼图像
-            try:
-                original_image = pygame.image.load(get_asset_path('lantern_enemy.png')).convert_alpha()
-                self.image = pygame.transform.smoothscale(original_image, (45, 55))
-            except Exception as e:
-                print(f"无法加载灯笼图像: {e}")
-                # 后备方案
-                self.image = pygame.Surface((40, 50), pygame.SRCALPHA)
-                pygame.draw.ellipse(self.image, FESTIVE_RED, (5, 0, 30, 35))
-                pygame.draw.rect(self.image, GOLD, (15, 35, 10, 10))
+            self.image = assets.image('lantern_enemy.png', (45, 55), draw_enemy_fallback, label='灯笼图像')
             self.hp = 1
-            self.rect = self.image.get_rect(x=random.randint(50, WIDTH-50), y=-60)
-            self.speed = random.uniform(2, 4)
-        self.last_shot = pygame.time.get_ticks()
+            self.rect = self.image.get_rect(x=rng.randint(50, WIDTH-50), y=-60)
+            self.speed = rng.uniform(2, 4)
+        self.last_shot = pygame.time.get_ticks() if now is None else now
+        self.pattern_clock = {}  # (阶段, 弹幕下标) -> 上次发射时间
+        self.volleys = {}        # (阶段, 弹幕下标) -> 已发射轮数，旋转弹幕据此取角度
 
     def update(self):
         if self.is_boss:
@@ -150,32 +804,51 @@ class Enemy(pygame.sprite.Sprite):
             self.rect.y += self.speed
             if self.rect.top > HEIGHT: self.kill()
 
-    def shoot(self, enemy_bullets, all_sprites):
-        now = pygame.time.get_ticks()
-        rate = 2000 if not self.is_boss else 700
-        if now - self.last_shot > rate:
-            eb = EnemyBullet(self.rect.centerx, self.rect.bottom)
-            enemy_bullets.add(eb)
-            all_sprites.add(eb)
-            self.last_shot = now
-
-class Bullet(pygame.sprite.Sprite):
+    def schedule(self):
+        """返回 (阶段, ((间隔, 弹幕), ...))；Boss 按剩余血量切换阶段"""
+        if not self.is_boss:
+            return 0, ((2000, STRAIGHT_SHOT),)
+        ratio = self.hp / self.max_hp
+        for phase, (threshold, patterns) in enumerate(BOSS_PHASES):
+            if ratio > threshold:
+                return phase, patterns
+        return len(BOSS_PHASES) - 1, BOSS_PHASES[-1][1]
+
+    def shoot(self, enemy_bullets, all_sprites, now=None, field=None, target=None):
+        if now is None:
+            now = pygame.time.get_ticks()
+        if field is None:
+            # 没有弹幕引擎（未安装 NumPy）时每颗子弹都是精灵
+            rate = LEGACY_SCHEDULE[self.is_boss][0][0]
+            if now - self.last_shot > rate:
+                eb = enemy_bullet_pool.acquire(self.rect.centerx, self.rect.bottom)
+                enemy_bullets.add(eb)
+                all_sprites.add(eb)
+                self.last_shot = now
+            return
+
+        phase, patterns = self.schedule()
+        for i, (rate, pattern) in enumerate(patterns):
+            key = (phase, i)
+            last = self.pattern_clock.get(key, self.last_shot)
+            if now - last > rate:
+                volley = self.volleys.get(key, 0)
+                field.emit(pattern, self.rect.centerx, self.rect.bottom, target, volley)
+                self.pattern_clock[key] = now
+                self.volleys[key] = volley + 1
+
+class Bullet(PooledSprite):
     def __init__(self, x, y, is_laser=False):
         super().__init__()
+        self.reset(x, y, is_laser)
+
+    def reset(self, x, y, is_laser=False):
         self.is_laser = is_laser
         if is_laser:
-            self.image = pygame.Surface((20, 100), pygame.SRCALPHA)
-            # 绘制更华丽的激光
-            for i in range(20):
-                alpha = 255 - i * 10
-                pygame.draw.rect(self.image, (*CYAN[:3], max(0, alpha)), (i//2, 0, 20-i, 100))
-            pygame.draw.rect(self.image, WHITE, (8, 0, 4, 100))
+            self.image = templates.get('laser', CYAN, (20, 100))
             self.damage = 60
         else:
-            self.image = pygame.Surface((10, 25), pygame.SRCALPHA)
-            # 金色烟花子弹
-            pygame.draw.ellipse(self.image, GOLD, (0, 0, 10, 25))
-            pygame.draw.ellipse(self.image, YELLOW, (2, 2, 6, 21))
+            self.image = templates.get('bullet', GOLD, (10, 25))
             self.damage = 30
         self.rect = self.image.get_rect(center=(x, y))
 
@@ -183,14 +856,13 @@ class Bullet(pygame.sprite.Sprite):
         self.rect.y -= 18
         if self.rect.bottom < 0: self.kill()
 
-class EnemyBullet(pygame.sprite.Sprite):
+class EnemyBullet(PooledSprite):
     def __init__(self, x, y):
         super().__init__()
-        self.image = pygame.Surface((16, 16), pygame.SRCALPHA)
-        # 绘制烟花弹
-        pygame.draw.circle(self.image, FESTIVE_RED, (8, 8), 8)
-        pygame.draw.circle(self.image, GOLD, (8, 8), 8, 2)
-        pygame.draw.circle(self.image, WHITE, (8, 8), 4)
+        self.reset(x, y)
+
+    def reset(self, x, y):
+        self.image = templates.get('enemy_bullet', FESTIVE_RED, 16)
         self.rect = self.image.get_rect(center=(x, y))
 
     def update(self):
@@ -198,40 +870,15 @@ class EnemyBullet(pygame.sprite.Sprite):
         if self.rect.top > HEIGHT: self.kill()
 
 class Supply(pygame.sprite.Sprite):
-    def __init__(self, kind):
+    def __init__(self, kind, rng=random):
         super().__init__()
         self.kind = kind
         
         # 根据类型加载不同的补给图像
-        if kind == 'weapon':
-            try:
-                original_image = pygame.image.load(get_asset_path('supply_weapon.png')).convert_alpha()
-                self.image = pygame.transform.smoothscale(original_image, (40, 40))
-            except Exception as e:
-                print(f"无法加载武器补给图像: {e}")
-                self.image = pygame.Surface((30, 30), pygame.SRCALPHA)
-                pygame.draw.rect(self.image, GOLD, (0, 0, 30, 30), border_radius=5)
-                pygame.draw.rect(self.image, WHITE, (0, 0, 30, 30), 2, border_radius=5)
-        elif kind == 'heal':
-            try:
-                original_image = pygame.image.load(get_asset_path('supply_heal.png')).convert_alpha()
-                self.image = pygame.transform.smoothscale(original_image, (40, 40))
-            except Exception as e:
-                print(f"无法加载治疗补给图像: {e}")
-                self.image = pygame.Surface((30, 30), pygame.SRCALPHA)
-                pygame.draw.rect(self.image, FESTIVE_RED, (0, 0, 30, 30), border_radius=5)
-                pygame.draw.rect(self.image, GOLD, (0, 0, 30, 30), 2, border_radius=5)
-        else:  # shield
-            try:
-                original_image = pygame.image.load(get_asset_path('supply_shield.png')).convert_alpha()
-                self.image = pygame.transform.smoothscale(original_image, (40, 40))
-            except Exception as e:
-                print(f"无法加载护盾补给图像: {e}")
-                self.image = pygame.Surface((30, 30), pygame.SRCALPHA)
-                pygame.draw.rect(self.image, CYAN, (0, 0, 30, 30), border_radius=5)
-                pygame.draw.rect(self.image, WHITE, (0, 0, 30, 30), 2, border_radius=5)
+        filename, label, fallback = SUPPLY_IMAGES.get(kind, SUPPLY_IMAGES['shield'])
+        self.image = assets.image(filename, (40, 40), fallback, label=label)
         
-        self.rect = self.image.get_rect(x=random.randint(50, WIDTH-50), y=-40)
+        self.rect = self.image.get_rect(x=rng.randint(50, WIDTH-50), y=-40)
         self.glow_timer = 0
 
     def update(self):
@@ -240,13 +887,155 @@ class Supply(pygame.sprite.Sprite):
         # 添加发光动画效果
         self.glow_timer += 1
 
-# --- 全局参考与主逻辑 ---
-player_lvl_ref = 1
+# 预分配容量按常见峰值估计，不足时自动扩容
+bullet_pool = SpritePool(Bullet, 64)
+enemy_bullet_pool = SpritePool(EnemyBullet, 64)
+particle_pool = SpritePool(Particle, 512)
+enemy_pool = SpritePool(Enemy, 32)
+
+# --- 碰撞宽相：均匀网格 ---
+class SpatialGrid:
+    """每帧用一组精灵重建的均匀网格，查询结果与 pygame.sprite.spritecollide 一致"""
+    def __init__(self, cell_size=64, verify=False):
+        self.cell_size = cell_size
+        self.verify = verify  # 为 True 时每次查询都与暴力检测结果比对
+        self.group = None
+        self._cells = {}
+        self._order = {}
+        self.queries = 0
+        self.candidates = 0
+
+    def rebuild(self, group):
+        self.group = group
+        self._cells.clear()
+        self._order.clear()
+        cs = self.cell_size
+        cells = self._cells
+        for index, sprite in enumerate(group):
+            self._order[sprite] = index
+            r = sprite.rect
+            for cx in range(r.left // cs, (r.right - 1) // cs + 1):
+                for cy in range(r.top // cs, (r.bottom - 1) // cs + 1):
+                    cell = cells.get((cx, cy))
+                    if cell is None:
+                        cells[(cx, cy)] = [sprite]
+                    else:
+                        cell.append(sprite)
+
+    def spritecollide(self, sprite, dokill=False, collided=None):
+        """返回与 sprite 相交且仍在组内的精灵，顺序与组的迭代顺序相同"""
+        self.queries += 1
+        rect = sprite.rect
+        cs = self.cell_size
+        cells = self._cells
+        members = self.group.spritedict
+        found = set()
+        hits = []
+        for cx in range(rect.left // cs, (rect.right - 1) // cs + 1):
+            for cy in range(rect.top // cs, (rect.bottom - 1) // cs + 1):
+                for other in cells.get((cx, cy), ()):
+                    if other in found or other not in members:
+                        continue
+                    found.add(other)
+                    self.candidates += 1
+                    if collided(sprite, other) if collided else rect.colliderect(other.rect):
+                        hits.append(other)
+        if len(hits) > 1:
+            hits.sort(key=self._order.__getitem__)
+
+        if self.verify:
+            expected = pygame.sprite.spritecollide(sprite, self.group, False, collided)
+            if hits != expected:
+                raise AssertionError(f"网格碰撞结果与暴力检测不一致: {hits} != {expected}")
+
+        if dokill:
+            for other in hits:
+                other.kill()
+        return hits
+
+# --- 碰撞窄相：按图像缓存的像素遮罩 ---
+MASK_BG_THRESHOLD = (32, 32, 32, 255)  # 不透明图像中与角落颜色相差在此之内视为底色（忽略 alpha）
+
+def image_mask(surface):
+    """图像的碰撞遮罩。角落透明的图像按 alpha 通道生成；资源 PNG 是不透明的，
+    改为把与四角相连、颜色接近角落的底色区域视为空白，主体内部的相近颜色不受影响"""
+    w, h = surface.get_size()
+    corner = surface.get_at((0, 0))
+    if corner.a < 128:
+        return pygame.mask.from_surface(surface)
+    similar = pygame.mask.from_threshold(surface, corner, MASK_BG_THRESHOLD)
+    background = pygame.mask.Mask((w, h))
+    for pos in ((0, 0), (w - 1, 0), (0, h - 1), (w - 1, h - 1)):
+        if similar.get_at(pos) and not background.get_at(pos):
+            background.draw(similar.connected_component(pos), (0, 0))
+    background.invert()
+    return background
+
+class MaskCache:
+    """每个 Surface 只生成一次遮罩（见 image_mask），Surface 被释放后对应遮罩随之丢弃。
+
+    资源与模板本就是共享的 Surface，因此遮罩数量等于不同图像的数量。
+    """
+    def __init__(self):
+        self._masks = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, surface):
+        mask = self._masks.get(surface)
+        if mask is not None:
+            self.hits += 1
+            return mask
+        self.misses += 1
+        # 从副本生成：生成遮罩会锁定 Surface，而共享图像可能正被渲染线程绘制
+        mask = image_mask(surface.copy())
+        self._masks[surface] = mask
+        return mask
+
+    def stats(self):
+        return {'masks': len(self._masks), 'hits': self.hits, 'misses': self.misses}
+
+masks = MaskCache()
+
+class MaskCollider:
+    """两阶段碰撞回调：先比较矩形，相交时才比较缓存的遮罩。
+
+    可直接作为 spritecollide 的 collided 参数；计数器统计各阶段的配对数量。
+    """
+    def __init__(self, cache=masks):
+        self.cache = cache
+        self.pairs = 0       # 调用次数（宽相给出的候选对）
+        self.mask_tests = 0  # 矩形相交、进入遮罩比较的配对
+        self.hits = 0
+
+    def __call__(self, a, b):
+        self.pairs += 1
+        ra, rb = a.rect, b.rect
+        if not ra.colliderect(rb):
+            return False
+        self.mask_tests += 1
+        get = self.cache.get
+        if get(a.image).overlap(get(b.image), (rb.x - ra.x, rb.y - ra.y)) is None:
+            return False
+        self.hits += 1
+        return True
 
-def create_explosion(x, y, color, group, count=15, size=5):
+    def stats(self):
+        return {'pairs': self.pairs, 'mask_tests': self.mask_tests, 'hits': self.hits}
+
+    def reset_stats(self):
+        self.pairs = 0
+        self.mask_tests = 0
+        self.hits = 0
+
+# --- 主逻辑 ---
+def create_explosion(x, y, color, group, count=15, size=5, rng=random):
     """创建更华丽的爆炸特效"""
+    if isinstance(group, ParticleSystem):
+        group.emit(x, y, color, count, size)
+        return
     for _ in range(count):
-        p = Particle(x, y, color, random.randint(3, size))
+        p = particle_pool.acquire(x, y, color, rng.randint(3, size), rng)
         group.add(p)
 
 def draw_chinese_border(screen, width, height, color=GOLD, thickness=3):
@@ -258,7 +1047,7 @@ def draw_chinese_border(screen, width, height, color=GOLD, thickness=3):
         pygame.draw.line(screen, color, (corner_x, corner_y), (corner_x + corner_size//2, corner_y + corner_size//2), 2)
         pygame.draw.line(screen, color, (corner_x + corner_size, corner_y + corner_size), (corner_x + corner_size//2, corner_y + corner_size//2), 2)
 
-def draw_hp_bar(screen, x, y, width, height, current, maximum, bg_color, fill_color, label=""):
+def draw_hp_bar(screen, x, y, width, height, current, maximum, bg_color, fill_color, label="", highlight=True):
     """绘制华丽的血条"""
     # 背景
     pygame.draw.rect(screen, bg_color, (x-2, y-2, width+4, height+4), border_radius=3)
@@ -269,17 +1058,32 @@ def draw_hp_bar(screen, x, y, width, height, current, maximum, bg_color, fill_co
     if fill_width > 0:
         pygame.draw.rect(screen, fill_color, (x, y, fill_width, height), border_radius=2)
         # 高光效果
-        highlight = pygame.Surface((fill_width, height//3), pygame.SRCALPHA)
-        highlight.fill((255, 255, 255, 60))
-        screen.blit(highlight, (x, y))
+        if highlight:
+            shine = pygame.Surface((fill_width, height//3), pygame.SRCALPHA)
+            shine.fill((255, 255, 255, 60))
+            screen.blit(shine, (x, y))
     
     # 边框
     pygame.draw.rect(screen, GOLD, (x, y, width, height), 2, border_radius=2)
 
-def show_upgrade_menu(screen, player):
-    upgrading = True
-    font = pygame.font.SysFont("SimHei", 32)
-    small_font = pygame.font.SysFont("SimHei", 24)
+def apply_upgrade(player, choice):
+    """按升级界面的选项 1/2/3 强化龙马"""
+    if choice == 1:
+        if player.bullet_count < 3: player.bullet_count += 1
+        else: player.fire_rate = max(120, player.fire_rate - 60)
+    elif choice == 2:
+        player.max_hp += 20
+        player.hp = player.max_hp
+    elif choice == 3:
+        player.max_shield += 20
+        player.shield = player.max_shield
+
+UPGRADE_KEYS = {pygame.K_1: 1, pygame.K_2: 2, pygame.K_3: 3}
+
+def draw_upgrade_menu(screen, player):
+    """把升级界面画到 screen 上（只绘制一次，由 UpgradeScene 等待按键）"""
+    font = get_font(32)
+    small_font = get_font(24)
     
     # 华丽的升级界面背景
     overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
@@ -288,269 +1092,1397 @@ def show_upgrade_menu(screen, player):
     # 绘制装饰边框
     pygame.draw.rect(overlay, GOLD, (WIDTH//2 - 280, 150, 560, 350), 4, border_radius=15)
     pygame.draw.rect(overlay, FESTIVE_RED, (WIDTH//2 - 275, 155, 550, 340), 2, border_radius=12)
+    screen.blit(overlay, (0, 0))
     
-    while upgrading:
-        screen.blit(overlay, (0, 0))
-        
-        # 标题
-        title = font.render(f"🎊 龙马升级 (LV {player.level}) 🎊", True, GOLD)
-        title_rect = title.get_rect(center=(WIDTH//2, 190))
-        screen.blit(title, title_rect)
-        
-        # 选项
-        options = [
-            ("🐉 1. 龙魂觉醒", "增加炮弹数量/射速", WHITE),
-            ("💚 2. 祥龙补给", "生命上限+20并回满", (100, 255, 100)),
-            ("🛡️ 3. 瑞马护甲", "护盾上限+20", CYAN)
-        ]
-        
-        for i, (title_text, desc_text, color) in enumerate(options):
-            y_pos = 260 + i * 70
-            title_surf = font.render(title_text, True, color)
-            desc_surf = small_font.render(desc_text, True, (200, 200, 200))
-            screen.blit(title_surf, (WIDTH//2 - 180, y_pos))
-            screen.blit(desc_surf, (WIDTH//2 - 180, y_pos + 30))
-        
-        # 底部提示
-        hint = small_font.render("按数字键选择升级方向", True, (150, 150, 150))
-        hint_rect = hint.get_rect(center=(WIDTH//2, 460))
-        screen.blit(hint, hint_rect)
-        
-        pygame.display.flip()
-        
-        for event in pygame.event.get():
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_1:
-                    if player.bullet_count < 3: player.bullet_count += 1
-                    else: player.fire_rate = max(120, player.fire_rate - 60)
-                    upgrading = False
-                elif event.key == pygame.K_2:
-                    player.max_hp += 20
-                    player.hp = player.max_hp
-                    upgrading = False
-                elif event.key == pygame.K_3:
-                    player.max_shield += 20
-                    player.shield = player.max_shield
-                    upgrading = False
-
-def draw_firework(screen, x, y, frame, color):
-    """绘制烟花效果"""
-    num_sparks = 12
-    for i in range(num_sparks):
-        angle = (i * 30 + frame * 3) % 360
+    # 标题
+    title = font.render(f"🎊 龙马升级 (LV {player.level}) 🎊", True, GOLD)
+    title_rect = title.get_rect(center=(WIDTH//2, 190))
+    screen.blit(title, title_rect)
+    
+    # 选项
+    options = [
+        ("🐉 1. 龙魂觉醒", "增加炮弹数量/射速", WHITE),
+        ("💚 2. 祥龙补给", "生命上限+20并回满", (100, 255, 100)),
+        ("🛡️ 3. 瑞马护甲", "护盾上限+20", CYAN)
+    ]
+    
+    for i, (title_text, desc_text, color) in enumerate(options):
+        y_pos = 260 + i * 70
+        title_surf = font.render(title_text, True, color)
+        desc_surf = small_font.render(desc_text, True, (200, 200, 200))
+        screen.blit(title_surf, (WIDTH//2 - 180, y_pos))
+        screen.blit(desc_surf, (WIDTH//2 - 180, y_pos + 30))
+    
+    # 底部提示
+    hint = small_font.render("按数字键选择升级方向", True, (150, 150, 150))
+    hint_rect = hint.get_rect(center=(WIDTH//2, 460))
+    screen.blit(hint, hint_rect)
+
+FIREWORK_FRAMES = 31   # 烟花持续帧数（0..30）
+FIREWORK_RADIUS = 2 * (FIREWORK_FRAMES - 1) + 5  # 最远火花距离 + 火花半径
+
+def bake_firework(color, num_sparks=12):
+    """预渲染一朵烟花的全部帧，返回以烟花中心对齐的 Surface 元组"""
+    size = FIREWORK_RADIUS * 2
+    # 三角函数表：每个火花的基础角度与每帧旋转 3 度
+    angles = [math.radians(i * 360 / num_sparks) for i in range(num_sparks)]
+    frames = []
+    for frame in range(FIREWORK_FRAMES):
+        image = pygame.Surface((size, size), pygame.SRCALPHA)
         dist = frame * 2
-        spark_x = x + math.cos(math.radians(angle)) * dist
-        spark_y = y + math.sin(math.radians(angle)) * dist
+        spin = math.radians(frame * 3)
         spark_size = max(1, 4 - frame // 10)
-        pygame.draw.circle(screen, color, (int(spark_x), int(spark_y)), spark_size)
+        for angle in angles:
+            spark_x = FIREWORK_RADIUS + math.cos(angle + spin) * dist
+            spark_y = FIREWORK_RADIUS + math.sin(angle + spin) * dist
+            pygame.draw.circle(image, color, (int(spark_x), int(spark_y)), spark_size)
+        frames.append(to_display_format(image))
+    return tuple(frames)
+
+_baked_fireworks = {}
+
+def firework_frames(color, num_sparks=12):
+    """取得（必要时烘焙）某种烟花的帧序列，进程内共享"""
+    key = (tuple(color), num_sparks)
+    frames = _baked_fireworks.get(key)
+    if frames is None:
+        frames = _baked_fireworks[key] = bake_firework(color, num_sparks)
+    return frames
 
-def main():
-    global player_lvl_ref
+class FireworkSystem:
+    """烟花存储：位置、帧号与样式放在紧凑数组中，过期烟花与末尾交换后删除（O(1)）。
+    绘制使用按 (颜色, 火花数) 预渲染的帧序列，运行时没有三角函数计算"""
+    def __init__(self):
+        self.x = array('i')
+        self.y = array('i')
+        self.frame = array('i')
+        self.style = array('i')
+        self._styles = {}      # (颜色, 火花数) -> 下标
+        self._style_keys = []
+        self.journal = None    # 为列表时记录 ('firework', x, y, 颜色, 火花数)
+
+    def spawn(self, x, y, color=GOLD, num_sparks=12):
+        if self.journal is not None:
+            self.journal.append(('firework', x, y, tuple(color), num_sparks))
+        key = (tuple(color), num_sparks)
+        style = self._styles.get(key)
+        if style is None:
+            style = self._styles[key] = len(self._style_keys)
+            self._style_keys.append(key)
+        self.x.append(int(x))
+        self.y.append(int(y))
+        # 生成所在的这一步末尾还会 update() 一次，从 -1 开始使第 0 帧也能被绘制
+        self.frame.append(-1)
+        self.style.append(style)
+
+    def update(self):
+        frame = self.frame
+        i = 0
+        while i < len(frame):
+            frame[i] += 1
+            if frame[i] >= FIREWORK_FRAMES:
+                self._swap_remove(i)
+            else:
+                i += 1
+
+    def _swap_remove(self, i):
+        for arr in (self.x, self.y, self.frame, self.style):
+            arr[i] = arr[-1]
+            arr.pop()
+
+    def draw(self, surface, max_sparks=None):
+        """max_sparks 限制每朵烟花绘制的火花数（画质降级）"""
+        if not self.frame:
+            return
+        r = FIREWORK_RADIUS
+        baked = [firework_frames(color, sparks if max_sparks is None else min(sparks, max_sparks))
+                 for color, sparks in self._style_keys]
+        surface.blits([(baked[s][f], (x - r, y - r))
+                       for x, y, f, s in zip(self.x, self.y, self.frame, self.style) if f >= 0], False)
+
+    def dirty_rects(self):
+        r = FIREWORK_RADIUS
+        return [pygame.Rect(x - r, y - r, 2 * r, 2 * r) for x, y in zip(self.x, self.y)]
+
+    def snapshot(self):
+        snap = copy.copy(self)
+        snap.x, snap.y = array('i', self.x), array('i', self.y)
+        snap.frame, snap.style = array('i', self.frame), array('i', self.style)
+        snap._style_keys = list(self._style_keys)
+        return snap
+
+    def __len__(self):
+        return len(self.frame)
+
+# --- 无头、确定性的模拟核心 ---
+# 每步输入：移动方向 (-1/0/1)、是否开火、升级选项 (0 表示未选择)
+FrameInput = namedtuple('FrameInput', 'move_x move_y fire upgrade', defaults=(0, 0, False, 0))
+
+# 遥测事件：GameState.telemetry.record(帧号, 事件, 参数, 数值)，由 telemetry.py 写出与分析
+#   spawn    参数 0 普通敌人 / 1 Boss，数值为生命值
+#   kill     参数同上，数值为获得的福分
+#   damage   参数为伤害来源（DAMAGE_SOURCES 下标），数值为伤害
+#   supply   参数为补给类型（SUPPLY_KINDS 下标），数值为拾取者（0 主玩家 / 1 队友）
+#   level_up 数值为新等级
+#   boss_hit 数值为对 Boss 造成的伤害
+#   down     参数为阵亡的玩家（0 主玩家 / 1 队友）
+#   end      会话结束
+TELEMETRY_EVENTS = ('spawn', 'kill', 'damage', 'supply', 'level_up', 'boss_hit', 'down', 'end')
+EV_SPAWN, EV_KILL, EV_DAMAGE, EV_SUPPLY, EV_LEVEL_UP, EV_BOSS_HIT, EV_DOWN, EV_END = range(len(TELEMETRY_EVENTS))
+DAMAGE_SOURCES = ('barrage', 'bullet', 'ram')  # 弹幕引擎子弹 / 精灵敌弹 / 撞上敌人
+SUPPLY_KINDS = tuple(SUPPLY_IMAGES)
+
+def init_headless():
+    """无窗口运行：使用 SDL dummy 驱动初始化 pygame"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
     pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
-    pygame.display.set_caption("🎊 龙马精神：新春大作战 🏮")
-    clock = pygame.time.Clock()
-    font = pygame.font.SysFont("SimHei", 24)
-    big_font = pygame.font.SysFont("SimHei", 48)
-    
-    # 加载背景图像
-    try:
-        bg_image = pygame.image.load(get_asset_path('background.png')).convert()
-        bg_image = pygame.transform.smoothscale(bg_image, (WIDTH, HEIGHT))
-    except Exception as e:
-        print(f"无法加载背景图像: {e}")
-        bg_image = None
-
-    player = Player()
-    all_sprites = pygame.sprite.Group(player)
-    enemies = pygame.sprite.Group()
-    player_bullets = pygame.sprite.Group()
-    enemy_bullets = pygame.sprite.Group()
-    supplies = pygame.sprite.Group()
-    boss_group = pygame.sprite.Group()
-    particles = pygame.sprite.Group()
-
-    score = 0
-    in_boss_fight = False
-    next_boss_milestone = 10
-    running = True
-    frame_count = 0
-    fireworks = []  # 存储烟花效果
-
-    while running:
-        dt = clock.tick(FPS)
-        now = pygame.time.get_ticks()
-        player_lvl_ref = player.level
-        frame_count += 1
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT: running = False
+class GameState:
+    """与显示、键鼠和系统时钟解耦的游戏逻辑。
+
+    step(inputs, dt) 按固定步长 STEP_MS 推进模拟，随机数来自带种子的
+    random.Random，时间来自模拟时钟 time_ms；相同种子与输入序列得到相同状态。
+    """
+    def __init__(self, seed=None, verify_collisions=False, pixel_collisions=True):
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.time_ms = 0.0
+        self.frame = 0
+        self.accumulator = 0.0
+        self.alpha = 0.0  # 渲染插值系数：accumulator / STEP_MS
+
+        self.player = Player()
+        self.partner = None  # 联机合作的第二名玩家，见 add_partner()
+        self.all_sprites = pygame.sprite.Group(self.player)
+        self.enemies = pygame.sprite.Group()
+        self.player_bullets = pygame.sprite.Group()
+        self.enemy_bullets = pygame.sprite.Group()
+        self.bullet_field = BulletField() if np is not None else None
+        self.supplies = pygame.sprite.Group()
+        self.boss_group = pygame.sprite.Group()
+        self.particles = ParticleSystem(seed=self.seed) if np is not None else pygame.sprite.Group()
+        self.fireworks = FireworkSystem()  # 存储烟花效果
+        self.prev_positions = {}  # 上一步各精灵位置，供渲染插值
+
+        self.score = 0
+        self.in_boss_fight = False
+        self.next_boss_milestone = 10
+        self.pending_upgrades = 0
+        self.game_over = False
+        # 可选的分阶段计时器，需提供 begin(阶段名) / end()
+        self.profiler = None
+        # 可选的遥测记录器，需提供 record(帧号, 事件, 参数, 数值)
+        self.telemetry = None
+
+        # 碰撞宽相网格，每步在碰撞处理前重建
+        self.enemy_grid = SpatialGrid(verify=verify_collisions)
+        self.boss_grid = SpatialGrid(verify=verify_collisions)
+        self.enemy_bullet_grid = SpatialGrid(verify=verify_collisions)
+        self.supply_grid = SpatialGrid(verify=verify_collisions)
+        # 窄相：矩形相交后再比较像素遮罩；为 None 时只比较矩形
+        self.collider = MaskCollider() if pixel_collisions else None
+
+    def add_partner(self):
+        """加入第二名玩家。两人共享福分、经验与武器等级，生命与护盾各自独立；
+        队友阵亡后退出，主玩家阵亡时游戏结束"""
+        partner = Player()
+        partner.rect.centerx += 120
+        self.partner = partner
+        self.all_sprites.add(partner)
+        return partner
+
+    def players(self):
+        return (self.player,) if self.partner is None else (self.player, self.partner)
+
+    def step(self, inputs, dt=STEP_MS, partner_inputs=None):
+        """累积 dt 毫秒并按固定步长推进，返回实际执行的步数。
+        partner_inputs 为第二名玩家的输入：FrameInput 时每一步相同；为函数时每一步调用一次，
+        取得该步的输入（联机时逐步消费队友的输入队列）"""
+        if inputs.upgrade and self.pending_upgrades:
+            apply_upgrade(self.player, inputs.upgrade)
+            self.pending_upgrades -= 1
+        if self.pending_upgrades or self.game_over:
+            # 等待升级选择（或游戏已结束）时暂停模拟
+            return 0
+
+        self.accumulator = min(self.accumulator + dt, STEP_MS * MAX_STEPS_PER_CALL)
+        steps = 0
+        while self.accumulator >= STEP_MS - 1e-9:
+            self.tick(inputs, partner_inputs() if callable(partner_inputs) else partner_inputs)
+            self.accumulator -= STEP_MS
+            steps += 1
+            if self.pending_upgrades or self.game_over:
+                break
+        self.alpha = max(0.0, self.accumulator) / STEP_MS
+        return steps
+
+    def tick(self, inputs, partner_inputs=None):
+        """推进一个固定步长"""
+        player = self.player
+        partner = self.partner
+        if partner_inputs is None:
+            partner_inputs = FrameInput()
+        self.frame += 1
+        self.time_ms += STEP_MS
+        now = self.time_ms
+        rng = self.rng
+        particles = self.particles
+        prof = self.profiler
+        tel = self.telemetry
 
         # 1. 逻辑生成
-        if not in_boss_fight:
-            if random.random() < 0.04:
-                e = Enemy()
-                enemies.add(e)
-                all_sprites.add(e)
-            if player.level >= next_boss_milestone:
-                in_boss_fight = True
-                for e in enemies:
-                    create_explosion(e.rect.centerx, e.rect.centery, GOLD, particles, 20, 6)
+        if prof is not None: prof.begin('spawn')
+        if not self.in_boss_fight:
+            if rng.random() < 0.04:
+                e = enemy_pool.acquire(rng=rng, now=now)
+                self.enemies.add(e)
+                self.all_sprites.add(e)
+                if tel is not None: tel.record(self.frame, EV_SPAWN, 0, e.hp)
+            if player.level >= self.next_boss_milestone:
+                self.in_boss_fight = True
+                for e in self.enemies:
+                    create_explosion(e.rect.centerx, e.rect.centery, GOLD, particles, 20, 6, rng)
                     e.kill()
-                boss = Enemy(is_boss=True)
-                boss_group.add(boss)
-                all_sprites.add(boss)
+                boss = Enemy(is_boss=True, rng=rng, now=now, level=player.level)
+                self.boss_group.add(boss)
+                self.all_sprites.add(boss)
+                if tel is not None: tel.record(self.frame, EV_SPAWN, 1, boss.hp)
 
         # 2. 玩家开火逻辑
-        if pygame.mouse.get_pressed()[0] and now - player.last_shot > player.fire_rate:
-            if player.is_laser:
-                b = Bullet(player.rect.centerx, player.rect.top, True)
-                player_bullets.add(b)
-                all_sprites.add(b)
+        if prof is not None: prof.begin('fire')
+        self.fire(player, inputs, now)
+        if partner is not None:
+            self.fire(partner, partner_inputs, now)
+
+        if prof is not None: prof.begin('enemy_fire')
+        target = player.rect.center
+        for e in self.enemies:
+            e.shoot(self.enemy_bullets, self.all_sprites, now, self.bullet_field, self.target_for(e, target))
+        for b in self.boss_group:
+            b.shoot(self.enemy_bullets, self.all_sprites, now, self.bullet_field, self.target_for(b, target))
+
+        # 3. 碰撞处理
+        if prof is not None: prof.begin('collision')
+        self.collide()
+
+        # 4. 更新
+        if prof is not None: prof.begin('update')
+        player.move = (inputs.move_x, inputs.move_y)
+        if partner is not None:
+            partner.move = (partner_inputs.move_x, partner_inputs.move_y)
+        self.prev_positions = {s: s.rect.topleft for s in self.all_sprites}
+        self.all_sprites.update()
+        if self.bullet_field is not None:
+            self.bullet_field.update()
+        particles.update()
+        self.fireworks.update()
+        if prof is not None: prof.end()
+
+        if partner is not None and partner.hp <= 0:
+            create_explosion(partner.rect.centerx, partner.rect.centery, GOLD, particles, 25, 7, rng)
+            partner.kill()
+            self.partner = None
+            if tel is not None: tel.record(self.frame, EV_DOWN, 1)
+        if player.hp <= 0:
+            self.game_over = True
+            if tel is not None: tel.record(self.frame, EV_DOWN, 0)
+
+    def fire(self, shooter, inputs, now):
+        # 武器等级记在主玩家身上，队友共用
+        weapon = self.player
+        if inputs.fire and now - shooter.last_shot > weapon.fire_rate:
+            if weapon.is_laser:
+                b = bullet_pool.acquire(shooter.rect.centerx, shooter.rect.top, True)
+                self.player_bullets.add(b)
+                self.all_sprites.add(b)
             else:
-                offsets = [0] if player.bullet_count==1 else ([-15, 15] if player.bullet_count==2 else [-25, 0, 25])
+                offsets = [0] if weapon.bullet_count==1 else ([-15, 15] if weapon.bullet_count==2 else [-25, 0, 25])
                 for off in offsets:
-                    b = Bullet(player.rect.centerx + off, player.rect.top)
-                    player_bullets.add(b)
-                    all_sprites.add(b)
-            player.last_shot = now
+                    b = bullet_pool.acquire(shooter.rect.centerx + off, shooter.rect.top)
+                    self.player_bullets.add(b)
+                    self.all_sprites.add(b)
+            shooter.last_shot = now
 
-        for e in enemies:
-            e.shoot(enemy_bullets, all_sprites)
-        for b in boss_group:
-            b.shoot(enemy_bullets, all_sprites)
+    def target_for(self, shooter, target):
+        """瞄准型弹幕的目标：单人时为主玩家，合作时为距离更近的玩家"""
+        partner = self.partner
+        if partner is None:
+            return target
+        x, y = shooter.rect.center
+        other = partner.rect.center
+        if (other[0] - x) ** 2 + (other[1] - y) ** 2 < (target[0] - x) ** 2 + (target[1] - y) ** 2:
+            return other
+        return target
 
-        # 3. 碰撞处理
-        # 补给
-        for s in pygame.sprite.spritecollide(player, supplies, True):
-            create_explosion(player.rect.centerx, player.rect.centery, GOLD, particles, 20, 5)
-            if s.kind == 'weapon':
-                if player.bullet_count >= 3: player.is_laser = True
-                else: player.bullet_count += 1
-            elif s.kind == 'heal':
-                player.hp = min(player.max_hp, player.hp + 50)
-            elif s.kind == 'shield':
-                player.max_shield += 10
-                player.shield = player.max_shield
+    def collide(self):
+        player = self.player
+        particles = self.particles
+        rng = self.rng
+        collided = self.collider
+        tel = self.telemetry
+        self.enemy_grid.rebuild(self.enemies)
+        self.boss_grid.rebuild(self.boss_group)
+        self.enemy_bullet_grid.rebuild(self.enemy_bullets)
+        self.supply_grid.rebuild(self.supplies)
+
+        # 补给：武器升级归全队，治疗与护盾归拾取者
+        for index, p in enumerate(self.players()):
+            for s in self.supply_grid.spritecollide(p, True, collided):
+                create_explosion(p.rect.centerx, p.rect.centery, GOLD, particles, 20, 5, rng)
+                if tel is not None: tel.record(self.frame, EV_SUPPLY, SUPPLY_KINDS.index(s.kind), index)
+                if s.kind == 'weapon':
+                    if player.bullet_count >= 3: player.is_laser = True
+                    else: player.bullet_count += 1
+                elif s.kind == 'heal':
+                    p.hp = min(p.max_hp, p.hp + 50)
+                elif s.kind == 'shield':
+                    p.max_shield += 10
+                    p.shield = p.max_shield
 
         # 玩家子弹打击
-        for b in player_bullets:
-            hits = pygame.sprite.spritecollide(b, enemies, True)
+        for b in self.player_bullets:
+            hits = self.enemy_grid.spritecollide(b, True, collided)
             for hit in hits:
-                create_explosion(hit.rect.centerx, hit.rect.centery, FESTIVE_RED, particles, 18, 5)
-                score += 10
+                create_explosion(hit.rect.centerx, hit.rect.centery, FESTIVE_RED, particles, 18, 5, rng)
+                self.score += 10
+                if tel is not None: tel.record(self.frame, EV_KILL, 0, 10)
                 if player.gain_xp(35):
-                    show_upgrade_menu(screen, player)
+                    self.pending_upgrades += 1
+                    if tel is not None: tel.record(self.frame, EV_LEVEL_UP, 0, player.level)
                 if not b.is_laser: b.kill()
             
-            boss_hits = pygame.sprite.spritecollide(b, boss_group, False)
+            boss_hits = self.boss_grid.spritecollide(b, False, collided)
             for boss in boss_hits:
                 boss.hp -= b.damage
-                create_explosion(b.rect.centerx, b.rect.top, GOLD, particles, 10, 4)
+                if tel is not None: tel.record(self.frame, EV_BOSS_HIT, 0, b.damage)
+                create_explosion(b.rect.centerx, b.rect.top, GOLD, particles, 10, 4, rng)
                 if not b.is_laser: b.kill()
                 if boss.hp <= 0:
                     # Boss死亡大爆炸
                     for _ in range(3):
                         create_explosion(
-                            boss.rect.centerx + random.randint(-50, 50),
-                            boss.rect.centery + random.randint(-30, 30),
-                            GOLD, particles, 25, 7
+                            boss.rect.centerx + rng.randint(-50, 50),
+                            boss.rect.centery + rng.randint(-30, 30),
+                            GOLD, particles, 25, 7, rng
                         )
                     boss.kill()
-                    in_boss_fight = False
-                    score += 2000
-                    next_boss_milestone += 5
+                    self.in_boss_fight = False
+                    self.score += 2000
+                    self.next_boss_milestone += 5
+                    if tel is not None: tel.record(self.frame, EV_KILL, 1, 2000)
                     # 添加烟花效果
-                    fireworks.append({'x': boss.rect.centerx, 'y': boss.rect.centery, 'frame': 0, 'color': GOLD})
+                    self.fireworks.spawn(boss.rect.centerx, boss.rect.centery, GOLD)
                     # 掉落补给
-                    ws = Supply('weapon')
+                    ws = Supply('weapon', rng)
                     ws.rect.center = boss.rect.center
-                    supplies.add(ws)
-                    all_sprites.add(ws)
+                    self.supplies.add(ws)
+                    self.all_sprites.add(ws)
 
         # 玩家受损
-        if pygame.sprite.spritecollide(player, enemy_bullets, True) or pygame.sprite.spritecollide(player, enemies, True):
-            player.shield_regen_timer = 0
-            if player.shield > 0:
-                player.shield -= 20
-                if player.shield < 0:
-                    player.hp += player.shield
-                    player.shield = 0
+        for p in self.players():
+            field_hits = 0
+            if self.bullet_field is not None:
+                mask = masks.get(p.image) if collided is not None else None
+                field_hits = self.bullet_field.collide_rect(p.rect, True, mask)
+            if field_hits:
+                source = 0
+            elif self.enemy_bullet_grid.spritecollide(p, True, collided):
+                source = 1
+            elif self.enemy_grid.spritecollide(p, True, collided):
+                source = 2
             else:
-                player.hp -= 20
+                source = None
+            if source is not None:
+                if tel is not None: tel.record(self.frame, EV_DAMAGE, source, 20)
+                p.shield_regen_timer = 0
+                if p.shield > 0:
+                    p.shield -= 20
+                    if p.shield < 0:
+                        p.hp += p.shield
+                        p.shield = 0
+                else:
+                    p.hp -= 20
+
+    def checksum(self):
+        """状态摘要，用于比较两次运行是否一致"""
+        p = self.player
+        parts = [self.frame, self.score, p.level, p.xp, p.hp, round(p.shield, 3), p.rect.topleft,
+                 self.in_boss_fight, self.pending_upgrades, len(self.particles)]
+        for group in (self.enemies, self.player_bullets, self.enemy_bullets, self.supplies, self.boss_group):
+            parts.append(tuple(s.rect.topleft for s in group))
+        for b in self.boss_group:
+            parts.append(b.hp)
+        if self.partner is not None:
+            parts.append((self.partner.rect.topleft, self.partner.hp, round(self.partner.shield, 3)))
+        if self.bullet_field is not None:
+            parts.append(self.bullet_field.positions().round(3).tobytes())
+        return zlib.crc32(repr(parts).encode())
+
+# --- 分阶段帧分析器 ---
+PROFILE_PHASES = ('spawn', 'fire', 'enemy_fire', 'collision', 'update',
+                  'background', 'border', 'fireworks', 'sprites', 'particles', 'hud', 'flip')
+PROFILE_COUNTS = ('enemies', 'player_bullets', 'enemy_bullets', 'supplies', 'particles', 'fireworks')
+PROFILE_COLORS = ((255, 120, 120), (255, 180, 80), (255, 230, 90), (240, 60, 60), (120, 220, 120),
+                  (90, 160, 255), (150, 120, 255), (255, 120, 230), (80, 230, 230), (255, 255, 255),
+                  (200, 200, 120), (140, 140, 140))
+
+class FrameProfiler:
+    """把每帧各阶段耗时（毫秒）与各组实体数量写入环形缓冲，可选流式写出 CSV。
+
+    未启用时 GameState/GameRenderer 的 profiler 为 None，每个阶段只多一次 None 判断。
+    """
+    def __init__(self, capacity=240, csv_path=None):
+        self.capacity = capacity
+        self._index = {name: i for i, name in enumerate(PROFILE_PHASES)}
+        self.times = [[0.0] * len(PROFILE_PHASES) for _ in range(capacity)]
+        self.counts = [[0] * len(PROFILE_COUNTS) for _ in range(capacity)]
+        self.cursor = 0    # 当前帧写入的行
+        self.filled = 0
+        self.frames = 0
+        self.show_overlay = False
+        self._phase = None
+        self._start = 0.0
+        self._font = None
+        self._csv_file = None
+        self._csv = None
+        if csv_path:
+            self._csv_file = open(csv_path, 'w', newline='', encoding='utf-8', buffering=1 << 16)
+            self._csv = csv.writer(self._csv_file)
+            # 阶段与实体组有同名项（particles、fireworks），列名加前缀区分
+            self._csv.writerow(['frame'] + [f'ms_{name}' for name in PROFILE_PHASES]
+                               + [f'n_{name}' for name in PROFILE_COUNTS])
+
+    def begin(self, phase):
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.times[self.cursor][self._phase] += (now - self._start) * 1000
+        self._phase = self._index[phase] if phase is not None else None
+        self._start = now
+
+    def end(self):
+        self.begin(None)
+
+    def end_frame(self, state):
+        """记录实体数量并推进到下一行"""
+        self.end()
+        row = self.cursor
+        counts = self.counts[row]
+        counts[0] = len(state.enemies)
+        counts[1] = len(state.player_bullets)
+        counts[2] = len(state.enemy_bullets) + (len(state.bullet_field) if state.bullet_field is not None else 0)
+        counts[3] = len(state.supplies)
+        counts[4] = len(state.particles)
+        counts[5] = len(state.fireworks)
+        self.frames += 1
+        if self._csv is not None:
+            self._csv.writerow([self.frames] + [round(t, 4) for t in self.times[row]] + counts)
+
+        self.cursor = (row + 1) % self.capacity
+        self.filled = min(self.filled + 1, self.capacity)
+        next_row = self.times[self.cursor]
+        for i in range(len(next_row)):
+            next_row[i] = 0.0
+
+    def recent(self):
+        """按时间顺序返回缓冲中已完成的帧"""
+        start = (self.cursor - self.filled) % self.capacity
+        return [self.times[(start + i) % self.capacity] for i in range(self.filled)]
+
+    def averages(self):
+        rows = self.recent()
+        if not rows:
+            return [0.0] * len(PROFILE_PHASES)
+        return [sum(col) / len(rows) for col in zip(*rows)]
+
+    def draw_overlay(self, screen, x=WIDTH - 330, y=HEIGHT - 190, width=300, height=160):
+        """堆叠柱状图：每列一帧，虚线为 16.6 ms 预算"""
+        if self._font is None:
+            self._font = get_font(12)
+        panel = pygame.Rect(x, y, width, height)
+        pygame.draw.rect(screen, (0, 0, 0), panel)
+        pygame.draw.rect(screen, GOLD, panel, 1)
+
+        graph_h = height - 50
+        budget = 1000 / FPS
+        scale = graph_h / (budget * 2)
+        rows = self.recent()[-(width - 4):]
+        base_y = y + 2 + graph_h
+        for col, row in enumerate(rows):
+            top = base_y
+            for phase, ms in enumerate(row):
+                h = ms * scale
+                if h >= 0.5:
+                    pygame.draw.line(screen, PROFILE_COLORS[phase], (x + 2 + col, top), (x + 2 + col, max(y + 2, top - h)))
+                    top -= h
+        budget_y = base_y - budget * scale
+        for bx in range(x + 2, x + width - 2, 6):
+            pygame.draw.line(screen, GOLD, (bx, budget_y), (bx + 3, budget_y))
+
+        # 图例：各阶段平均耗时
+        for i, (name, avg) in enumerate(zip(PROFILE_PHASES, self.averages())):
+            lx = x + 4 + (i % 4) * 74
+            ly = base_y + 4 + (i // 4) * 14
+            label = self._font.render(f"{name} {avg:.2f}", True, PROFILE_COLORS[i])
+            screen.blit(label, (lx, ly))
+
+    def close(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+            self._csv = None
+
+# --- 自适应画质：帧耗时超出预算时逐级降低特效，恢复余量后逐级还原 ---
+# particle_stride 每几个粒子画一个；firework_sparks 每朵烟花最多画的火花数；
+# hp_highlight 血条高光；background 背景图（关闭时纯色填充）
+QualityLevel = namedtuple('QualityLevel', 'name particle_stride firework_sparks hp_highlight background')
+QUALITY_LEVELS = (
+    QualityLevel('高', 1, 12, True, True),
+    QualityLevel('中高', 2, 12, True, True),
+    QualityLevel('中', 2, 6, False, True),
+    QualityLevel('低', 3, 6, False, False),
+    QualityLevel('最低', 4, 4, False, False),
+)
+GOVERNOR_OVERLAY_RECT = pygame.Rect(WIDTH - 330, 20, 300, 86)
+
+class QualityGovernor:
+    """根据 clock.tick 测得的每帧工作耗时（不含等待，即 clock.get_rawtime()）调节画质。
+
+    近 degrade_window 帧平均超过预算的 degrade_ratio 时降一级；近 restore_window 帧平均
+    低于预算的 restore_ratio 时升一级。两个阈值之间不动作，每次调整后清空样本重新测量；
+    升级后很快又降级（画质来回跳动）时，下次升级所需的帧数加倍；升级后稳定保持初始
+    restore_window 帧未再降级，则恢复为初始帧数。
+    """
+    def __init__(self, budget_ms=1000 / FPS, degrade_ratio=0.9, restore_ratio=0.6,
+                 degrade_window=30, restore_window=120, max_restore_window=1920, stall_ms=250):
+        self.budget_ms = budget_ms
+        self.degrade_ms = budget_ms * degrade_ratio
+        self.restore_ms = budget_ms * restore_ratio
+        self.degrade_window = degrade_window
+        self.restore_window = restore_window
+        self.base_restore_window = restore_window
+        self.max_restore_window = max_restore_window
+        self.stall_ms = stall_ms
+        self.level = 0
+        self.reason = "初始"
+        self.history = deque(maxlen=3)  # 最近的 (帧号, 说明)
+        self.frames = 0
+        self.changes = 0
+        self.show_overlay = False
+        # 两个窗口各自维护滑动和，每帧 O(1)
+        self._recent = deque()   # 最近 degrade_window 帧
+        self._recent_sum = 0.0
+        self._window = deque()   # 最近 restore_window 帧
+        self._window_sum = 0.0
+        self._restored_at = None
+        self._font = None
+
+    @property
+    def settings(self):
+        return QUALITY_LEVELS[self.level]
+
+    def update(self, work_ms):
+        """每帧调用一次；返回画质是否改变"""
+        self.frames += 1
+        if (self.restore_window > self.base_restore_window and self._restored_at is not None
+                and self.frames - self._restored_at >= self.base_restore_window):
+            self.restore_window = self.base_restore_window  # 升级后画质已稳定
+        if work_ms > self.stall_ms:
+            return False  # 加载、拖动窗口等造成的单次卡顿不代表渲染负载
+        self._recent.append(work_ms)
+        self._recent_sum += work_ms
+        if len(self._recent) > self.degrade_window:
+            self._recent_sum -= self._recent.popleft()
+        self._window.append(work_ms)
+        self._window_sum += work_ms
+        if len(self._window) > self.restore_window:
+            self._window_sum -= self._window.popleft()
+
+        if len(self._recent) >= self.degrade_window and self.level < len(QUALITY_LEVELS) - 1:
+            recent = self._recent_sum / self.degrade_window
+            if recent > self.degrade_ms:
+                if self._restored_at is not None and self.frames - self._restored_at < 2 * self.degrade_window:
+                    self.restore_window = min(self.restore_window * 2, self.max_restore_window)
+                self._restored_at = None  # 升级没有保持住
+                self._change(self.level + 1, f"近 {self.degrade_window} 帧平均 {recent:.1f}ms > {self.degrade_ms:.1f}ms")
+                return True
+        if len(self._window) >= self.restore_window and self.level > 0:
+            recent = self._window_sum / self.restore_window
+            if recent < self.restore_ms:
+                self._change(self.level - 1, f"近 {self.restore_window} 帧平均 {recent:.1f}ms < {self.restore_ms:.1f}ms")
+                self._restored_at = self.frames
+                return True
+        return False
+
+    def _change(self, level, reason):
+        direction = "降至" if level > self.level else "升至"
+        self.level = level
+        self.reason = f"{direction}{QUALITY_LEVELS[level].name}：{reason}"
+        self.history.append((self.frames, self.reason))
+        self.changes += 1
+        self._recent.clear()
+        self._window.clear()
+        self._recent_sum = self._window_sum = 0.0
+
+    def draw_overlay(self, screen):
+        if self._font is None:
+            self._font = get_font(14)
+        rect = GOVERNOR_OVERLAY_RECT
+        pygame.draw.rect(screen, (0, 0, 0), rect)
+        pygame.draw.rect(screen, GOLD, rect, 1)
+        settings = self.settings
+        lines = [(f"画质 {self.level}/{len(QUALITY_LEVELS) - 1} {settings.name}  粒子 1/{settings.particle_stride}"
+                  f"  火花 {settings.firework_sparks}", GOLD)]
+        lines.extend((f"#{frame} {reason}", WHITE) for frame, reason in reversed(self.history))
+        # 说明文字可能比面板宽，裁剪到边框以内
+        clip = screen.get_clip()
+        screen.set_clip(rect.inflate(-4, -4).clip(clip))
+        for i, (text, color) in enumerate(lines):
+            screen.blit(self._font.render(text, True, color), (rect.x + 6, rect.y + 4 + i * 20))
+        screen.set_clip(clip)
+
+    def stats(self):
+        return {'level': self.level, 'name': self.settings.name, 'changes': self.changes, 'reason': self.reason}
+
+# --- 保留模式 HUD ---
+class HudLayer:
+    """HUD 的每一块（血条、护盾条、经验条、文字、Boss 血条）按显示值缓存成 Surface，
+    只有显示值变化时才重新渲染，每帧只做拼贴"""
+    def __init__(self, font):
+        self.font = font
+        self._pieces = {}  # 名称 -> (显示值, Surface, 位置)
+        self.renders = 0
+        self.highlight = True  # 血条高光，画质降级时关闭
+
+    def _piece(self, name, key, pos, paint, changed):
+        entry = self._pieces.get(name)
+        if entry is None or entry[0] != key:
+            surface = paint()
+            if entry is not None:
+                changed.append(entry[1].get_rect(topleft=entry[2]))
+            entry = (key, surface, pos)
+            self._pieces[name] = entry
+            self.renders += 1
+            changed.append(surface.get_rect(topleft=pos))
+        return entry
+
+    def _drop(self, name, changed):
+        entry = self._pieces.pop(name, None)
+        if entry is not None:
+            changed.append(entry[1].get_rect(topleft=entry[2]))
+
+    def draw(self, screen, state):
+        """拼贴 HUD，返回本帧内容有变化的区域"""
+        player = state.player
+        changed = []
+        font = self.font
+
+        # UI - 华丽的血条和护盾条
+        highlight = self.highlight
+        hp_fill = int(200 * (player.hp / player.max_hp))
+        self._piece('hp', (hp_fill, player.max_hp, highlight), (23, 23), lambda: paint_hp_bar(
+            200, 18, player.hp, player.max_hp, (80, 0, 0), (50, 205, 50), highlight), changed)
+        shield_fill = int(200 * (player.shield / player.max_shield))
+        self._piece('shield', (shield_fill, player.max_shield, highlight), (23, 48), lambda: paint_hp_bar(
+            200, 12, player.shield, player.max_shield, (0, 50, 50), CYAN, highlight), changed)
+
+        # 经验条
+        xp_width = int(WIDTH * (player.xp / player.xp_next))
+        self._piece('xp', xp_width, (0, HEIGHT-12), lambda: paint_xp_bar(xp_width), changed)
+
+        # 信息显示
+        self._piece('info', (player.level, state.score), (25, 75), lambda: font.render(
+            f"🎊 等级: {player.level}  🧧 福分: {state.score}", True, GOLD), changed)
+
+        # Boss血条
+        boss = next(iter(state.boss_group), None) if state.in_boss_fight else None
+        if boss is not None:
+            boss_hp_width = min(300, boss.hp // 4)
+            self._piece('boss_bar', boss_hp_width, (WIDTH//2-150, 15), lambda: paint_boss_bar(boss_hp_width), changed)
+            self._piece('boss_label', None, (WIDTH//2 - 70, 40), lambda: font.render("🏮 年兽 Boss 🏮", True, GOLD), changed)
+        else:
+            self._drop('boss_bar', changed)
+            self._drop('boss_label', changed)
+
+        screen.blits([(surface, pos) for _, surface, pos in self._pieces.values()], False)
+        return changed
+
+def paint_hp_bar(width, height, current, maximum, bg_color, fill_color, highlight=True):
+    """把血条画到独立 Surface 上（含 2 像素外框）"""
+    surface = pygame.Surface((width + 4, height + 4), pygame.SRCALPHA)
+    draw_hp_bar(surface, 2, 2, width, height, current, maximum, bg_color, fill_color, highlight=highlight)
+    return surface
+
+def paint_xp_bar(xp_width):
+    surface = pygame.Surface((WIDTH, 12))
+    surface.fill((30, 30, 60))
+    pygame.draw.rect(surface, XP_PURPLE, (0, 0, xp_width, 12))
+    pygame.draw.rect(surface, GOLD, (0, 0, WIDTH, 12), 1)
+    return surface
+
+def paint_boss_bar(boss_hp_width):
+    surface = pygame.Surface((300, 20), pygame.SRCALPHA)
+    pygame.draw.rect(surface, (50, 0, 0), (0, 0, 300, 20), border_radius=5)
+    pygame.draw.rect(surface, FESTIVE_RED, (0, 0, boss_hp_width, 20), border_radius=5)
+    pygame.draw.rect(surface, GOLD, (0, 0, 300, 20), 2, border_radius=5)
+    return surface
+
+# --- 渲染：只做插值与绘制 ---
+class GameRenderer:
+    def __init__(self, screen):
+        self.screen = screen
+        self.font = get_font(24)
+        self.big_font = get_font(48)
+        # 加载背景图像
+        self.bg_image = assets.image('background.png', (WIDTH, HEIGHT), lambda: None, alpha=False, label='背景图像')
+        self.hud = HudLayer(self.font)
+        self.hud_changed = []
+        # 启动时烘焙 Boss 击破烟花
+        firework_frames(GOLD, 12)
+        self.profiler = None
+        # 可选的自适应画质调节器（QualityGovernor），为 None 时始终最高画质
+        self.governor = None
+
+    @property
+    def quality(self):
+        return QUALITY_LEVELS[0] if self.governor is None else self.governor.settings
+
+    def draw(self, state, alpha=1.0):
+        """绘制一帧；alpha 为上一步到当前步之间的插值系数"""
+        screen = self.screen
+        prof = self.profiler
+        quality = self.quality
 
-        # 4. 绘图
-        all_sprites.update()
-        particles.update()
-        
         # 绘制背景
-        if bg_image:
-            screen.blit(bg_image, (0, 0))
+        if prof is not None: prof.begin('background')
+        if self.bg_image and quality.background:
+            screen.blit(self.bg_image, (0, 0))
         else:
             screen.fill(BG_RED)
             # 备用：绘制简单的纸屑效果
-            for _ in range(3):
-                pygame.draw.circle(screen, GOLD, (random.randint(0, WIDTH), random.randint(0, HEIGHT)), 1)
+            if quality.background:
+                for _ in range(3):
+                    pygame.draw.circle(screen, GOLD, (random.randint(0, WIDTH), random.randint(0, HEIGHT)), 1)
         
         # 绘制中国风边框
+        if prof is not None: prof.begin('border')
         draw_chinese_border(screen, WIDTH, HEIGHT, GOLD, 3)
         
         # 绘制烟花
-        for fw in fireworks[:]:
-            draw_firework(screen, fw['x'], fw['y'], fw['frame'], fw['color'])
-            fw['frame'] += 1
-            if fw['frame'] > 30:
-                fireworks.remove(fw)
-        
-        all_sprites.draw(screen)
-        particles.draw(screen)
+        if prof is not None: prof.begin('fireworks')
+        self.draw_fireworks(state)
         
-        # UI - 华丽的血条和护盾条
-        draw_hp_bar(screen, 25, 25, 200, 18, player.hp, player.max_hp, (80, 0, 0), (50, 205, 50), "生命")
-        draw_hp_bar(screen, 25, 50, 200, 12, player.shield, player.max_shield, (0, 50, 50), CYAN, "护盾")
+        if prof is not None: prof.begin('sprites')
+        screen.blits(self.sprite_blits(state, alpha), False)
+        if state.bullet_field is not None:
+            state.bullet_field.draw(screen)
+        if prof is not None: prof.begin('particles')
+        self.draw_particles(state)
         
-        # 经验条
-        pygame.draw.rect(screen, (30, 30, 60), (0, HEIGHT-12, WIDTH, 12))
-        xp_width = WIDTH * (player.xp / player.xp_next)
-        pygame.draw.rect(screen, XP_PURPLE, (0, HEIGHT-12, xp_width, 12))
-        pygame.draw.rect(screen, GOLD, (0, HEIGHT-12, WIDTH, 12), 1)
+        if prof is not None: prof.begin('hud')
+        self.draw_hud(state)
+        if prof is not None:
+            prof.end()
+            if prof.show_overlay:
+                prof.draw_overlay(screen)
+        self.draw_governor_overlay()
+
+    def draw_fireworks(self, state):
+        state.fireworks.draw(self.screen, self.quality.firework_sparks)
+
+    def draw_particles(self, state):
+        particles = state.particles
+        if isinstance(particles, ParticleSystem):
+            particles.draw(self.screen, self.quality.particle_stride)
+        else:
+            particles.draw(self.screen)
+
+    def draw_hud(self, state):
+        self.hud.highlight = self.quality.hp_highlight
+        self.hud_changed = self.hud.draw(self.screen, state)
+
+    def draw_governor_overlay(self):
+        if self.governor is not None and self.governor.show_overlay:
+            self.governor.draw_overlay(self.screen)
+
+    def sprite_blits(self, state, alpha):
+        """返回 (图像, 插值后左上角) 列表"""
+        if alpha >= 1.0 or not state.prev_positions:
+            return [(s.image, s.rect.topleft) for s in state.all_sprites]
+        prev_positions = state.prev_positions
+        blit_list = []
+        for s in state.all_sprites:
+            x, y = s.rect.topleft
+            prev = prev_positions.get(s)
+            if prev is not None:
+                x = int(prev[0] + (x - prev[0]) * alpha)
+                y = int(prev[1] + (y - prev[1]) * alpha)
+            blit_list.append((s.image, (x, y)))
+        return blit_list
+
+    def invalidate(self):
+        """整屏被其他界面覆盖后调用；全量重绘模式下无需处理"""
+
+    def present(self):
+        pygame.display.flip()
+
+    def draw_game_over(self, state):
+        # 显示游戏结束画面
+        screen = self.screen
+        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        overlay.fill((40, 10, 10, 200))
+        screen.blit(overlay, (0, 0))
         
-        # 信息显示
-        info = font.render(f"🎊 等级: {player.level}  🧧 福分: {score}", True, GOLD)
-        screen.blit(info, (25, 75))
+        game_over = self.big_font.render("🎊 新春大吉 🎊", True, GOLD)
+        score_text = self.font.render(f"最终福分: {state.score}", True, WHITE)
+        level_text = self.font.render(f"最终等级: {state.player.level}", True, WHITE)
         
-        # Boss血条
-        if in_boss_fight:
-            for boss in boss_group:
-                boss_hp_width = min(300, boss.hp // 4)
-                pygame.draw.rect(screen, (50, 0, 0), (WIDTH//2-150, 15, 300, 20), border_radius=5)
-                pygame.draw.rect(screen, FESTIVE_RED, (WIDTH//2-150, 15, boss_hp_width, 20), border_radius=5)
-                pygame.draw.rect(screen, GOLD, (WIDTH//2-150, 15, 300, 20), 2, border_radius=5)
-                boss_label = font.render("🏮 年兽 Boss 🏮", True, GOLD)
-                screen.blit(boss_label, (WIDTH//2 - 70, 40))
-
-        # 游戏结束
-        if player.hp <= 0:
-            # 显示游戏结束画面
-            overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            overlay.fill((40, 10, 10, 200))
-            screen.blit(overlay, (0, 0))
-            
-            game_over = big_font.render("🎊 新春大吉 🎊", True, GOLD)
-            score_text = font.render(f"最终福分: {score}", True, WHITE)
-            level_text = font.render(f"最终等级: {player.level}", True, WHITE)
-            
-            screen.blit(game_over, (WIDTH//2 - 120, HEIGHT//2 - 80))
-            screen.blit(score_text, (WIDTH//2 - 70, HEIGHT//2))
-            screen.blit(level_text, (WIDTH//2 - 70, HEIGHT//2 + 40))
-            
+        screen.blit(game_over, (WIDTH//2 - 120, HEIGHT//2 - 80))
+        screen.blit(score_text, (WIDTH//2 - 70, HEIGHT//2))
+        screen.blit(level_text, (WIDTH//2 - 70, HEIGHT//2 + 40))
+
+def read_input(upgrade=0):
+    """把当前键盘/鼠标状态转换为一步的输入"""
+    keys = pygame.key.get_pressed()
+    return FrameInput(
+        move_x=keys[pygame.K_d] - keys[pygame.K_a],
+        move_y=keys[pygame.K_s] - keys[pygame.K_w],
+        fire=bool(pygame.mouse.get_pressed()[0]),
+        upgrade=upgrade,
+    )
+
+def set_profiler(state, renderer, profiler):
+    # 多线程模式下 state 为 None：分析器只记录主线程的绘制阶段
+    if state is not None:
+        state.profiler = profiler
+    renderer.profiler = profiler
+
+# HUD 所在区域：脏矩形模式下每帧先恢复背景再拼贴 HUD
+HUD_DIRTY_RECTS = (
+    pygame.Rect(20, 20, 420, 90),             # 血条、护盾条与等级/福分
+    pygame.Rect(WIDTH//2 - 152, 13, 304, 60),  # Boss 血条与名称
+    pygame.Rect(0, HEIGHT - 12, WIDTH, 12),    # 经验条
+)
+
+class DirtyRectRenderer(GameRenderer):
+    """脏矩形渲染：只用静态背景修补上一帧与本帧被绘制过的区域，
+    再用 display.update(rects) 提交；脏区域过大时退回整屏重绘"""
+    def __init__(self, screen, full_redraw_ratio=0.5):
+        super().__init__(screen)
+        self.full_redraw_ratio = full_redraw_ratio
+        self.full_redraw = True
+        self.full_frames = 0
+        self.partial_frames = 0
+        self._prev_rects = []
+        self._dirty = None
+        # 背景与边框都是静态的，预先合成一张
+        self.static_bg = pygame.Surface((WIDTH, HEIGHT)).convert() if pygame.display.get_surface() else pygame.Surface((WIDTH, HEIGHT))
+        if self.bg_image:
+            self.static_bg.blit(self.bg_image, (0, 0))
+        else:
+            self.static_bg.fill(BG_RED)
+        draw_chinese_border(self.static_bg, WIDTH, HEIGHT, GOLD, 3)
+
+    def draw(self, state, alpha=1.0):
+        screen = self.screen
+        prof = self.profiler
+        screen_rect = screen.get_rect()
+
+        if prof is not None: prof.begin('sprites')
+        sprite_blits = self.sprite_blits(state, alpha)
+        rects = [pygame.Rect(pos, image.get_size()) for image, pos in sprite_blits]
+        if isinstance(state.particles, ParticleSystem):
+            rects.extend(state.particles.dirty_rects())
+        else:
+            rects.extend(p.rect.inflate(2, 2) for p in state.particles)
+        if state.bullet_field is not None:
+            rects.extend(state.bullet_field.dirty_rects())
+        rects.extend(state.fireworks.dirty_rects())
+        if prof is not None and prof.show_overlay:
+            rects.append(pygame.Rect(WIDTH - 330, HEIGHT - 190, 300, 160))
+        if self.governor is not None and self.governor.show_overlay:
+            rects.append(GOVERNOR_OVERLAY_RECT)
+        rects = [r.clip(screen_rect) for r in rects]
+
+        # 上一帧画过的位置需要用背景擦除
+        dirty = self._prev_rects + rects
+        self._prev_rects = rects
+        area = sum(r.w * r.h for r in dirty)
+
+        if prof is not None: prof.begin('background')
+        if self.full_redraw or area > self.full_redraw_ratio * screen_rect.w * screen_rect.h:
+            screen.blit(self.static_bg, (0, 0))
+            self._dirty = None
+            self.full_redraw = False
+            self.full_frames += 1
+        else:
+            # HUD 含半透明像素，每帧在干净背景上重新拼贴，但只在内容变化时提交
+            for r in dirty + list(HUD_DIRTY_RECTS):
+                screen.blit(self.static_bg, r, r)
+            self._dirty = dirty
+            self.partial_frames += 1
+
+        if prof is not None: prof.begin('fireworks')
+        self.draw_fireworks(state)
+        if prof is not None: prof.begin('sprites')
+        screen.blits(sprite_blits, False)
+        if state.bullet_field is not None:
+            state.bullet_field.draw(screen)
+        if prof is not None: prof.begin('particles')
+        self.draw_particles(state)
+        if prof is not None: prof.begin('hud')
+        self.draw_hud(state)
+        if self._dirty is not None:
+            self._dirty.extend(self.hud_changed)
+        if prof is not None:
+            prof.end()
+            if prof.show_overlay:
+                prof.draw_overlay(screen)
+        self.draw_governor_overlay()
+
+    def draw_game_over(self, state):
+        super().draw_game_over(state)
+        self.invalidate()
+
+    def invalidate(self):
+        self.full_redraw = True
+        self._dirty = None
+
+    def present(self):
+        if self._dirty is None:
             pygame.display.flip()
-            pygame.time.wait(3000)
-            running = False
         else:
+            pygame.display.update(self._dirty)
+
+# --- 多线程：模拟线程发布只读快照，主线程绘制 ---
+class SpriteView:
+    """精灵在某一步结束时的图像与位置"""
+    __slots__ = ('image', 'rect')
+
+    def __init__(self, sprite):
+        self.image = sprite.image
+        self.rect = sprite.rect.copy()
+
+class SpriteViews(tuple):
+    """未安装 NumPy 时粒子精灵的快照，提供与 Group 相同的 draw()"""
+    def draw(self, surface):
+        surface.blits([(v.image, v.rect) for v in self], False)
+
+PlayerView = namedtuple('PlayerView', 'hp max_hp shield max_shield xp xp_next level')
+BossView = namedtuple('BossView', 'hp max_hp')
+
+class RenderSnapshot:
+    """一步结束时渲染所需的全部数据：精灵位置与图像、粒子/弹幕/烟花副本与 HUD 数值。
+
+    属性与 GameState 中渲染器用到的部分同名，GameRenderer 可直接绘制快照；
+    创建后不再修改，可在线程间安全共享。
+    """
+    def __init__(self, state):
+        views = {s: SpriteView(s) for s in state.all_sprites}
+        self.all_sprites = tuple(views.values())
+        self.prev_positions = {views[s]: pos for s, pos in state.prev_positions.items() if s in views}
+        self.enemies = tuple(views[s] for s in state.enemies if s in views)
+        self.player_bullets = tuple(views[s] for s in state.player_bullets if s in views)
+        self.enemy_bullets = tuple(views[s] for s in state.enemy_bullets if s in views)
+        self.supplies = tuple(views[s] for s in state.supplies if s in views)
+        self.boss_group = tuple(BossView(b.hp, b.max_hp) for b in state.boss_group)
+        if isinstance(state.particles, ParticleSystem):
+            self.particles = state.particles.snapshot()
+        else:
+            self.particles = SpriteViews(SpriteView(p) for p in state.particles)
+        self.bullet_field = state.bullet_field.snapshot() if state.bullet_field is not None else None
+        self.fireworks = state.fireworks.snapshot()
+        p = state.player
+        self.player = PlayerView(p.hp, p.max_hp, p.shield, p.max_shield, p.xp, p.xp_next, p.level)
+        self.score = state.score
+        self.in_boss_fight = state.in_boss_fight
+        self.pending_upgrades = state.pending_upgrades
+        self.game_over = state.game_over
+        self.frame = state.frame
+        self.alpha = state.alpha
+        self.created = time.perf_counter()
+
+class SnapshotBuffer:
+    """双缓冲：写入端填充后台槽后交换前后台，读取端总是取得最近一份完整快照"""
+    def __init__(self, snapshot=None):
+        self._slots = [snapshot, None]
+        self._front = 0
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def publish(self, snapshot):
+        back = 1 - self._front
+        self._slots[back] = snapshot
+        with self._lock:
+            self._front = back
+            self.published += 1
+
+    def read(self):
+        with self._lock:
+            return self._slots[self._front]
+
+class SimulationThread(threading.Thread):
+    """按固定频率推进 GameState，每次推进后发布一份 RenderSnapshot。
+
+    主线程用 submit() 交付最新输入、choose_upgrade() 交付升级选择，
+    自身只读取 buffer 中的快照，绘制耗时不影响模拟节奏与输入处理。
+    rate 为 None 时不限速，每次按 STEP_MS 推进（用于基准）；max_steps 限制推进次数。
+    """
+    def __init__(self, state, rate=FPS, recorder=None, max_steps=None):
+        super().__init__(name='simulation', daemon=True)
+        self.state = state
+        self.rate = rate
+        self.recorder = recorder
+        self.max_steps = max_steps
+        self.buffer = SnapshotBuffer(RenderSnapshot(state))
+        self._input = FrameInput()
+        self._upgrade = 0
+        self._input_lock = threading.Lock()
+        self._upgrade_done = threading.Event()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self.steps = 0
+        self.snapshot_ms = 0.0
+
+    def submit(self, inputs):
+        with self._input_lock:
+            self._input = inputs
+
+    def choose_upgrade(self, choice, timeout=1.0):
+        """交付升级选择，等待模拟线程应用并发布新快照"""
+        self._upgrade_done.clear()
+        with self._input_lock:
+            self._upgrade = choice
+        self._wake.set()
+        return self._upgrade_done.wait(timeout)
+
+    def next_input(self):
+        with self._input_lock:
+            inputs = self._input
+            if self._upgrade:
+                inputs = inputs._replace(upgrade=self._upgrade)
+                self._upgrade = 0
+        return inputs
+
+    def run(self):
+        state = self.state
+        clock = pygame.time.Clock()
+        while not self._stopping.is_set():
+            dt = clock.tick(self.rate) if self.rate else STEP_MS
+            inputs = self.next_input()
+            if self.recorder is not None:
+                self.recorder.write(dt, inputs)
+            state.step(inputs, dt)
+            start = time.perf_counter()
+            self.buffer.publish(RenderSnapshot(state))
+            self.snapshot_ms += (time.perf_counter() - start) * 1000
+            self.steps += 1
+            if inputs.upgrade:
+                self._upgrade_done.set()
+            if state.game_over or self.steps == self.max_steps:
+                break
+            if state.pending_upgrades:
+                # 等待升级选择时模拟暂停：阻塞到 choose_upgrade()/stop()，而不是空转发布快照
+                self._wake.clear()
+                with self._input_lock:
+                    chosen = self._upgrade
+                if not chosen and not self._stopping.is_set():
+                    self._wake.wait()
+                    clock.tick()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        self.join()
+
+# --- 场景状态机：游戏中 / 升级 / 结束 ---
+class Scene:
+    """场景基类。非模态场景每帧调用 frame()；模态场景进入时绘制一次，
+    之后在 pygame.event.wait 上休眠，每来一个事件调用一次 handle_event()。
+    两者都返回下一个场景：返回 self 表示留在当前场景，None 表示退出游戏。
+    """
+    modal = False
+    timeout = 0  # 模态场景等待事件的超时（毫秒），0 表示一直等待
+
+    def enter(self):
+        """切换到该场景时调用一次"""
+
+    def frame(self):
+        return self
+
+    def handle_event(self, event):
+        return self
+
+def run_scenes(scene):
+    """驱动场景状态机，直到某个场景返回 None"""
+    current = None
+    while scene is not None:
+        if scene is not current:
+            current = scene
+            scene.enter()
+        if scene.modal:
+            scene = scene.handle_event(pygame.event.wait(scene.timeout))
+        else:
+            scene = scene.frame()
+
+# 窗口被遮挡后恢复时重新提交画面即可，模态场景无需重绘
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED)
+
+class PlayingScene(Scene):
+    """游戏进行中：每帧处理输入、推进模拟（或读取模拟线程的快照）并绘制"""
+    def __init__(self, screen, clock, state, renderer, profiler=None, recorder=None, sim=None, net=None,
+                 capture=None):
+        self.screen = screen
+        self.clock = clock
+        self.state = state
+        self.renderer = renderer
+        self.profiler = profiler
+        self.recorder = recorder
+        self.sim = sim
+        self.net = net  # 联机主机（netplay.NetHost），队友输入来自网络
+        self.capture = capture  # 画面录制（capture.FrameCapture），每帧提交后拷贝屏幕
+        self.sim_state = state if sim is None else None
+        self.upgrade_choice = 0
+        set_profiler(self.sim_state, renderer, profiler)
+
+    def enter(self):
+        # 从模态场景返回：整屏已被覆盖，且等待期间的时间不计入模拟
+        self.renderer.invalidate()
+        self.clock.tick()
+
+    def choose_upgrade(self, choice):
+        if self.sim is not None:
+            self.sim.choose_upgrade(choice)
+        else:
+            # 选择结果作为下一帧的输入交给模拟
+            self.upgrade_choice = choice
+
+    def frame(self):
+        dt = self.clock.tick(FPS)
+        renderer = self.renderer
+        if renderer.governor is not None:
+            renderer.governor.update(self.clock.get_rawtime())
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return None
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                if self.profiler is None:
+                    self.profiler = FrameProfiler()
+                    set_profiler(self.sim_state, renderer, self.profiler)
+                self.profiler.show_overlay = not self.profiler.show_overlay
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4 and renderer.governor is not None:
+                renderer.governor.show_overlay = not renderer.governor.show_overlay
+        profiler = self.profiler
+
+        if self.sim is None:
+            inputs = read_input(self.upgrade_choice)
+            if self.recorder is not None:
+                self.recorder.write(dt, inputs)
+            partner_inputs = None
+            if self.net is not None:
+                self.net.poll()
+                partner_inputs = self.net.partner_input
+            self.state.step(inputs, dt, partner_inputs)
+            if self.net is not None:
+                self.net.after_step()
+            self.upgrade_choice = 0
+            view = self.state
+        else:
+            self.sim.submit(read_input())
+            view = self.sim.buffer.read()
+        if view.pending_upgrades:
+            return UpgradeScene(self, view.player)
+
+        renderer.draw(view, view.alpha)
+        if view.game_over:
+            return GameOverScene(renderer, view, net=self.net)
+        if profiler is not None: profiler.begin('flip')
+        renderer.present()
+        if self.capture is not None:
+            self.capture.grab(self.screen)
+        if profiler is not None: profiler.end_frame(view)
+        return self
+
+# 联机主机在模态场景中检查网络的间隔（毫秒）
+NET_SERVICE_MS = 50
+# 结束画面刚出现时忽略按键的时长（毫秒），避免阵亡瞬间仍按着的键直接跳过
+INPUT_GRACE_MS = 500
+
+class LobbyScene(Scene):
+    """联机主机：等待队友加入，每 NET_SERVICE_MS 毫秒检查一次网络"""
+    modal = True
+    timeout = NET_SERVICE_MS
+
+    def __init__(self, playing):
+        self.playing = playing
+
+    def enter(self):
+        screen = self.playing.screen
+        screen.fill(BG_RED)
+        draw_chinese_border(screen, WIDTH, HEIGHT, GOLD, 3)
+        text = get_font(32).render(f"等待队友加入… 端口 {self.playing.net.port}", True, GOLD)
+        screen.blit(text, text.get_rect(center=(WIDTH//2, HEIGHT//2)))
+        pygame.display.flip()
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            return None
+        self.playing.net.poll()
+        if self.playing.net.connected:
+            return self.playing
+        if event.type in EXPOSE_EVENTS:
+            pygame.display.flip()
+        return self
+
+class UpgradeScene(Scene):
+    """升级界面：绘制一次后休眠等待数字键，选择后回到游戏。
+    联机时每 NET_SERVICE_MS 毫秒醒来一次，继续收发数据包"""
+    modal = True
+
+    def __init__(self, playing, player):
+        self.playing = playing
+        self.player = player
+
+    @property
+    def timeout(self):
+        return NET_SERVICE_MS if self.playing.net is not None else 0
+
+    def enter(self):
+        draw_upgrade_menu(self.playing.screen, self.player)
+        pygame.display.flip()
+
+    def handle_event(self, event):
+        if self.playing.net is not None:
+            self.playing.net.service()
+        if event.type == pygame.QUIT:
+            return None
+        if event.type == pygame.KEYDOWN and event.key in UPGRADE_KEYS:
+            self.playing.choose_upgrade(UPGRADE_KEYS[event.key])
+            return self.playing
+        if event.type in EXPOSE_EVENTS:
+            pygame.display.flip()
+        return self
+
+class GameOverScene(Scene):
+    """结束画面：显示 duration 毫秒，期间按键、点击或关闭窗口提前退出。
+    刚进入的 grace 毫秒内忽略按键和点击：阵亡时玩家往往正按着方向键或开火键。
+    net 为联机主机时等待期间继续收发数据包，让队友也收到结束状态"""
+    modal = True
+
+    def __init__(self, renderer, view, duration=3000, net=None, grace=INPUT_GRACE_MS):
+        self.renderer = renderer
+        self.view = view
+        self.duration = duration
+        self.net = net
+        self.grace = grace
+        self.deadline = 0
+        self.accept_input_at = 0
+
+    @property
+    def timeout(self):
+        remaining = max(1, self.deadline - pygame.time.get_ticks())
+        return remaining if self.net is None else min(remaining, NET_SERVICE_MS)
+
+    def enter(self):
+        self.renderer.draw_game_over(self.view)
+        self.renderer.present()
+        now = pygame.time.get_ticks()
+        self.deadline = now + self.duration
+        self.accept_input_at = now + self.grace
+
+    def handle_event(self, event):
+        if self.net is not None:
+            self.net.service()
+        if event.type == pygame.QUIT:
+            return None
+        if event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN) and pygame.time.get_ticks() >= self.accept_input_at:
+            return None
+        if pygame.time.get_ticks() >= self.deadline:
+            return None
+        if event.type in EXPOSE_EVENTS:
             pygame.display.flip()
+        return self
+
+def main(verify_collisions=False, seed=None, profile_csv=None, dirty_rects=False, record=None, threaded=False,
+         host=None, telemetry=None, adaptive_quality=True, capture=None, capture_block=False):
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("🎊 龙马精神：新春大作战 🏮")
+    clock = pygame.time.Clock()
+    assets.use_bundle()
+
+    state = GameState(seed, verify_collisions)
+    renderer = DirtyRectRenderer(screen) if dirty_rects else GameRenderer(screen)
+    # 自适应画质：按每帧耗时增减特效，按 F4 显示当前等级与调整原因
+    if adaptive_quality:
+        renderer.governor = QualityGovernor()
+    # 帧分析器：指定 CSV 时从开局记录，否则按 F3 时才创建
+    profiler = FrameProfiler(csv_path=profile_csv) if profile_csv else None
+    # 录制：记录种子与每帧 (dt, 输入)，可用 replay.py 无头回放
+    recorder = None
+    if record:
+        from replay import ReplayWriter
+        recorder = ReplayWriter(record, state.seed)
+    # 遥测：生成、击杀、受伤、补给、升级与 Boss 战事件，后台线程写出，用 telemetry.py 分析
+    if telemetry:
+        from telemetry import TelemetryWriter
+        state.telemetry = TelemetryWriter(telemetry, state.seed)
+    # 多线程模式：模拟在后台线程按固定频率推进，主线程只处理输入并绘制最新快照
+    sim = SimulationThread(state, FPS, recorder) if threaded else None
+    # 联机主机：在 host 端口等待队友，之后队友的输入经网络进入模拟
+    net = None
+    if host is not None:
+        from netplay import NetHost
+        net = NetHost(state, host)
+    # 画面录制：主循环只拷贝像素，PNG/原始流编码在后台线程池中完成
+    frame_capture = None
+    if capture:
+        from capture import FrameCapture
+        frame_capture = FrameCapture.for_surface(capture, screen, block=capture_block)
+    playing = PlayingScene(screen, clock, state, renderer, profiler, recorder, sim, net, frame_capture)
+    if sim is not None:
+        sim.start()
+
+    run_scenes(LobbyScene(playing) if net is not None else playing)
 
+    if sim is not None:
+        sim.stop()
+    if net is not None:
+        net.close()
+        print(f"联机统计: {net.stats.summary()}")
+    if playing.profiler is not None:
+        playing.profiler.close()
+    if recorder is not None:
+        recorder.close()
+    if frame_capture is not None:
+        print(f"画面录制: {frame_capture.close()}")
+    if state.telemetry is not None:
+        state.telemetry.close(state.frame)
+        if state.telemetry.dropped:
+            print(f"遥测丢弃 {state.telemetry.dropped} 个事件")
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="龙马精神：新春大作战")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    parser.add_argument("--verify-collisions", action="store_true", help="网格碰撞结果与暴力检测逐一比对")
+    parser.add_argument("--profile-csv", help="把每帧分阶段耗时写入 CSV（按 F3 显示分析图）")
+    parser.add_argument("--dirty-rects", action="store_true", help="脏矩形渲染，适合软件渲染的低配机器")
+    parser.add_argument("--record", help="把种子与每帧输入录制到文件")
+    parser.add_argument("--threaded", action="store_true", help="模拟与绘制分别在两个线程中运行")
+    parser.add_argument("--fixed-quality", action="store_true", help="关闭自适应画质，始终使用最高特效")
+    parser.add_argument("--capture", metavar="PATH",
+                        help="录制画面：目录写 PNG 序列，以 .raw 结尾写原始像素流")
+    parser.add_argument("--capture-block", action="store_true", help="编码跟不上时等待而不是丢帧")
+    parser.add_argument("--telemetry", help="把游戏事件写入遥测日志（python telemetry.py 分析）")
+    parser.add_argument("--host", type=int, nargs="?", const=7777, metavar="PORT",
+                        help="作为联机主机等待队友（python netplay.py join 地址:端口）")
+    args = parser.parse_args()
+    if args.host is not None and (args.threaded or args.record):
+        parser.error("--host 不能与 --threaded 或 --record 同时使用")
+    if args.host is not None and np is None:
+        parser.error("--host 需要 NumPy：弹幕以事件日志同步")
+    main(args.verify_collisions, args.seed, args.profile_csv, args.dirty_rects, args.record, args.threaded,
+         args.host, args.telemetry, not args.fixed_quality, args.capture, args.capture_block)
@@ -0,0 +1,889 @@
+"""双人联机合作：主机权威模拟，UDP 传输增量快照
+
+主机在 main() 中运行 GameState，第二名玩家（队友）由客户端的输入驱动。主机每
+SEND_INTERVAL 步发送一个快照；客户端发送自己的输入，本地玩家做客户端预测，
+其余实体在两份快照之间插值显示。
+
+数据包（小端）:
+    HELLO     类型(1)
+    INPUT     类型(1) + 已收到快照帧号(4) + 已收到事件日志帧号(4) + 客户端时间(4)
+              + 最新输入序号(4) + 数量(1) + 输入(1)*数量      输入字节与录像格式相同
+    SNAPSHOT  类型(1) + 帧号(4) + 基准帧号(4) + 已处理输入序号(4) + 回显时间(4) + 主机滞留毫秒(2)
+              + HUD 增量 + 实体增量 + 事件日志
+增量以客户端确认收到的快照为基准：HUD 只发送变化的字段，未变化的实体不发送，
+位移小的实体只发送 int8 位移。弹幕、爆炸与烟花以事件日志传输，客户端确认前每个快照都会
+重发；客户端按相同顺序重放，弹幕与主机逐位一致。
+
+用法:
+    python game.py --host 7777                          # 主机，等待队友加入
+    python netplay.py join 127.0.0.1:7777               # 客户端
+    python netplay.py join 127.0.0.1:7777 --loss 0.2 --latency 80
+    python netplay.py selftest --loss 0.2 --latency 60  # 本机无头自测：两端经 localhost UDP 通信并逐帧校验
+"""
+import argparse
+import os
+import random
+import socket
+import struct
+import sys
+import time
+import zlib
+from collections import OrderedDict, deque
+
+# selftest 逐行输出结果，不混入 pygame 的欢迎信息
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+import game
+from replay import pack_input, unpack_input
+
+DEFAULT_PORT = 7777
+HELLO, INPUT, SNAPSHOT = 1, 2, 3
+INPUT_HEADER = struct.Struct('<BIIIIB')
+SNAPSHOT_HEADER = struct.Struct('<BIIIIH')
+SEND_INTERVAL = 2         # 每两步发送一个快照（30 Hz）
+KEEPALIVE_MS = 100        # 模拟暂停（升级界面、结束画面）时重发最新快照的间隔
+INPUT_REDUNDANCY = 8      # 每个输入包附带最近 8 步输入，丢包时由后续包补齐
+MAX_INPUT_BACKLOG = 4     # 主机积压的队友输入超过此数时丢弃最旧的，限制输入延迟
+INTERP_DELAY = 6          # 客户端显示比最新快照晚 6 步（100 ms）
+HISTORY = 128             # 两端保留的快照数量
+JOURNAL_LIMIT = 600       # 事件日志超过 10 秒未确认视为断线
+JOURNAL_BUDGET = 1024     # 每个快照携带的事件日志字节上限
+# 解码截断、伪造或错位的数据包时可能出现的异常；这样的包直接丢弃
+DECODE_ERRORS = (struct.error, KeyError, IndexError, ValueError)
+
+# --- 实体 ---
+(KIND_PLAYER, KIND_PARTNER, KIND_ENEMY, KIND_BOSS, KIND_BULLET, KIND_LASER,
+ KIND_ENEMY_BULLET, KIND_SUPPLY_WEAPON, KIND_SUPPLY_HEAL, KIND_SUPPLY_SHIELD) = range(10)
+SUPPLY_KINDS = {'weapon': KIND_SUPPLY_WEAPON, 'heal': KIND_SUPPLY_HEAL, 'shield': KIND_SUPPLY_SHIELD}
+
+ENTITY_FULL = struct.Struct('<HBBhh')   # 编号, 标志=1, 类型, x, y
+ENTITY_DELTA = struct.Struct('<HBbb')   # 编号, 标志=0, dx, dy
+COUNT = struct.Struct('<H')
+
+def kind_of(state, sprite):
+    if sprite is state.player:
+        return KIND_PLAYER
+    if isinstance(sprite, game.Player):
+        return KIND_PARTNER
+    if isinstance(sprite, game.Enemy):
+        return KIND_BOSS if sprite.is_boss else KIND_ENEMY
+    if isinstance(sprite, game.Bullet):
+        return KIND_LASER if sprite.is_laser else KIND_BULLET
+    if isinstance(sprite, game.Supply):
+        return SUPPLY_KINDS.get(sprite.kind, KIND_SUPPLY_SHIELD)
+    return KIND_ENEMY_BULLET
+
+_kind_images = {}
+
+def kind_image(kind):
+    """客户端按实体类型取得与主机相同的共享图像"""
+    image = _kind_images.get(kind)
+    if image is not None:
+        return image
+    if kind in (KIND_PLAYER, KIND_PARTNER):
+        image = game.assets.image('longma_player.png', (70, 70), game.draw_player_fallback, label='龙马图像')
+    elif kind == KIND_BOSS:
+        image = game.assets.image('lantern_boss.png', (180, 140), game.draw_boss_fallback, label='Boss灯笼图像')
+    elif kind == KIND_ENEMY:
+        image = game.assets.image('lantern_enemy.png', (45, 55), game.draw_enemy_fallback, label='灯笼图像')
+    elif kind == KIND_LASER:
+        image = game.templates.get('laser', game.CYAN, (20, 100))
+    elif kind == KIND_BULLET:
+        image = game.templates.get('bullet', game.GOLD, (10, 25))
+    elif kind == KIND_ENEMY_BULLET:
+        image = game.templates.get('enemy_bullet', game.FESTIVE_RED, 16)
+    else:
+        name = {KIND_SUPPLY_WEAPON: 'weapon', KIND_SUPPLY_HEAL: 'heal'}.get(kind, 'shield')
+        filename, label, fallback = game.SUPPLY_IMAGES[name]
+        image = game.assets.image(filename, (40, 40), fallback, label=label)
+    _kind_images[kind] = image
+    return image
+
+class EntityIds:
+    """给精灵分配 16 位网络编号；池中对象被再次取出时视为新实体。
+    消失实体的编号排到空闲队列末尾，尽量晚地被复用"""
+    def __init__(self):
+        self._ids = {}
+        self._free = deque(range(1, 0x10000))
+
+    def capture(self, state):
+        """返回 {编号: (类型, x, y)}，坐标为矩形左上角"""
+        old = self._ids
+        ids = {}
+        entities = {}
+        for sprite in state.all_sprites:
+            key = (sprite, getattr(sprite, 'generation', 0))
+            eid = old.pop(key, None)
+            if eid is None:
+                eid = self._free.popleft()
+            ids[key] = eid
+            entities[eid] = (kind_of(state, sprite), sprite.rect.x, sprite.rect.y)
+        self._free.extend(old.values())
+        self._ids = ids
+        return entities
+
+def encode_entities(entities, base):
+    records = []
+    for eid, value in entities.items():
+        old = base.get(eid)
+        if old == value:
+            continue
+        kind, x, y = value
+        if old is not None and old[0] == kind and -128 <= x - old[1] <= 127 and -128 <= y - old[2] <= 127:
+            records.append(ENTITY_DELTA.pack(eid, 0, x - old[1], y - old[2]))
+        else:
+            records.append(ENTITY_FULL.pack(eid, 1, kind, x, y))
+    removed = [eid for eid in base if eid not in entities]
+    return b''.join([COUNT.pack(len(records))] + records +
+                    [COUNT.pack(len(removed)), struct.pack(f'<{len(removed)}H', *removed)])
+
+def decode_entities(data, offset, base):
+    entities = dict(base)
+    (count,), offset = COUNT.unpack_from(data, offset), offset + COUNT.size
+    for _ in range(count):
+        eid, full = struct.unpack_from('<HB', data, offset)
+        if full:
+            _, _, kind, x, y = ENTITY_FULL.unpack_from(data, offset)
+            offset += ENTITY_FULL.size
+        else:
+            _, _, dx, dy = ENTITY_DELTA.unpack_from(data, offset)
+            offset += ENTITY_DELTA.size
+            kind, x, y = base[eid]
+            x, y = x + dx, y + dy
+        entities[eid] = (kind, x, y)
+    (count,), offset = COUNT.unpack_from(data, offset), offset + COUNT.size
+    for eid in struct.unpack_from(f'<{count}H', data, offset):
+        entities.pop(eid, None)
+    return entities, offset + 2 * count
+
+# --- HUD ---
+HUD_FIELDS = ('score', 'level', 'xp', 'xp_next', 'hp', 'max_hp', 'shield', 'max_shield',
+              'partner_hp', 'partner_max_hp', 'partner_shield', 'partner_max_shield',
+              'boss_hp', 'boss_max_hp', 'flags')
+FLAG_BOSS_FIGHT, FLAG_PENDING_UPGRADE, FLAG_GAME_OVER, FLAG_PARTNER_ALIVE = 1, 2, 4, 8
+
+def capture_hud(state):
+    """HUD 数值；生命与护盾放大 10 倍取整"""
+    p = state.player
+    q = state.partner
+    boss = next(iter(state.boss_group), None)
+    flags = ((FLAG_BOSS_FIGHT if state.in_boss_fight else 0) |
+             (FLAG_PENDING_UPGRADE if state.pending_upgrades else 0) |
+             (FLAG_GAME_OVER if state.game_over else 0) |
+             (FLAG_PARTNER_ALIVE if q is not None else 0))
+    return (state.score, p.level, p.xp, p.xp_next,
+            round(p.hp * 10), p.max_hp, round(p.shield * 10), p.max_shield,
+            round(q.hp * 10) if q else 0, q.max_hp if q else 1,
+            round(q.shield * 10) if q else 0, q.max_shield if q else 1,
+            boss.hp if boss else 0, boss.max_hp if boss else 1, flags)
+
+def encode_hud(hud, base):
+    mask = 0
+    values = []
+    for i, value in enumerate(hud):
+        if base is None or base[i] != value:
+            mask |= 1 << i
+            values.append(value)
+    return struct.pack(f'<I{len(values)}i', mask, *values)
+
+def decode_hud(data, offset, base):
+    (mask,) = struct.unpack_from('<I', data, offset)
+    offset += 4
+    hud = list(base) if base is not None else [0] * len(HUD_FIELDS)
+    for i in range(len(HUD_FIELDS)):
+        if mask >> i & 1:
+            (hud[i],) = struct.unpack_from('<i', data, offset)
+            offset += 4
+    return tuple(hud), offset
+
+# --- 事件日志：弹幕、爆炸与烟花 ---
+PATTERNS = [game.STRAIGHT_SHOT] + [p for _, patterns in game.BOSS_PHASES for _, p in patterns]
+PATTERN_INDEX = {p: i for i, p in enumerate(PATTERNS)}
+
+OP_EMIT, OP_HIT, OP_UPDATE, OP_EXPLOSION, OP_FIREWORK = range(1, 6)
+EMIT = struct.Struct('<BBhhBhhI')        # 操作, 弹幕下标, x, y, 是否瞄准, 目标 x, 目标 y, 轮次
+EXPLOSION = struct.Struct('<BhhBBBBB')   # 操作, x, y, r, g, b, 数量, 尺寸
+FIREWORK = struct.Struct('<BhhBBBB')     # 操作, x, y, r, g, b, 火花数
+BATCH = struct.Struct('<IH')             # 帧号, 长度
+
+def encode_journal(entries):
+    parts = []
+    for entry in entries:
+        op = entry[0]
+        if op == 'emit':
+            _, pattern, x, y, target, volley = entry
+            tx, ty = target if target is not None else (0, 0)
+            parts.append(EMIT.pack(OP_EMIT, PATTERN_INDEX[pattern], x, y, target is not None, tx, ty,
+                                   volley & 0xFFFFFFFF))
+        elif op == 'hit':
+            ids = entry[1]
+            parts.append(struct.pack(f'<BH{len(ids)}I', OP_HIT, len(ids), *ids))
+        elif op == 'update':
+            parts.append(bytes((OP_UPDATE,)))
+        elif op == 'explosion':
+            _, x, y, color, count, size = entry
+            parts.append(EXPLOSION.pack(OP_EXPLOSION, round(x), round(y), *color[:3], count, size))
+        elif op == 'firework':
+            _, x, y, color, sparks = entry
+            parts.append(FIREWORK.pack(OP_FIREWORK, round(x), round(y), *color[:3], sparks))
+    return b''.join(parts)
+
+def apply_journal(data, field, particles, fireworks):
+    """按记录顺序重放；'update' 对应主机的一个固定步长"""
+    offset = 0
+    while offset < len(data):
+        op = data[offset]
+        if op == OP_EMIT:
+            _, index, x, y, aimed, tx, ty, volley = EMIT.unpack_from(data, offset)
+            offset += EMIT.size
+            field.emit(PATTERNS[index], x, y, (tx, ty) if aimed else None, volley)
+        elif op == OP_HIT:
+            (count,) = struct.unpack_from('<H', data, offset + 1)
+            field.remove_ids(struct.unpack_from(f'<{count}I', data, offset + 3))
+            offset += 3 + 4 * count
+        elif op == OP_UPDATE:
+            offset += 1
+            field.update()
+            particles.update()
+            fireworks.update()
+        elif op == OP_EXPLOSION:
+            _, x, y, r, g, b, count, size = EXPLOSION.unpack_from(data, offset)
+            offset += EXPLOSION.size
+            particles.emit(x, y, (r, g, b), count, size)
+        elif op == OP_FIREWORK:
+            _, x, y, r, g, b, sparks = FIREWORK.unpack_from(data, offset)
+            offset += FIREWORK.size
+            fireworks.spawn(x, y, (r, g, b), sparks)
+        else:
+            raise ValueError(f"未知的事件操作: {op}")
+
+def field_digest(field):
+    n = field.count
+    return zlib.crc32(field.pos[:n].tobytes() + field.ids[:n].tobytes())
+
+# --- 传输 ---
+def monotonic_ms():
+    return time.monotonic() * 1000
+
+class NetStats:
+    """收发字节、包数、模拟丢包、往返延迟与预测误差"""
+    def __init__(self, clock=monotonic_ms):
+        self.clock = clock
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.packets_dropped = 0
+        self.packets_malformed = 0   # 无法解码而丢弃的收到的包
+        self.rtt_ms = None       # 指数平滑
+        self.rtt_samples = 0
+        self.snapshot_bytes = 0
+        self.snapshots = 0
+        self.prediction_error = 0.0   # 最近一次校正的像素距离
+        self.max_prediction_error = 0.0
+        self._window = deque()   # (时间, 已发送字节, 已接收字节)，用于计算最近一秒的速率
+
+    def sent(self, size):
+        self.bytes_sent += size
+        self.packets_sent += 1
+
+    def received(self, size):
+        self.bytes_received += size
+        self.packets_received += 1
+
+    def rtt(self, sample):
+        self.rtt_ms = sample if self.rtt_ms is None else self.rtt_ms * 0.9 + sample * 0.1
+        self.rtt_samples += 1
+
+    def rates(self):
+        """最近一秒的 (上行, 下行) 字节/秒"""
+        now = self.clock()
+        window = self._window
+        window.append((now, self.bytes_sent, self.bytes_received))
+        while len(window) > 1 and now - window[0][0] > 1000:
+            window.popleft()
+        t, sent, received = window[0]
+        span = (now - t) / 1000
+        if span <= 0:
+            return 0.0, 0.0
+        return (self.bytes_sent - sent) / span, (self.bytes_received - received) / span
+
+    def summary(self):
+        return {'bytes_sent': self.bytes_sent, 'bytes_received': self.bytes_received,
+                'packets_sent': self.packets_sent, 'packets_received': self.packets_received,
+                'packets_dropped': self.packets_dropped, 'packets_malformed': self.packets_malformed,
+                'rtt_ms': round(self.rtt_ms, 2) if self.rtt_ms is not None else None,
+                'mean_snapshot_bytes': round(self.snapshot_bytes / self.snapshots, 1) if self.snapshots else 0,
+                'max_prediction_error': round(self.max_prediction_error, 2)}
+
+class LossyChannel:
+    """非阻塞 UDP 套接字；可按 loss 概率丢弃发出的包，并延迟 latency±jitter 毫秒后再发送，
+    用于在本机模拟网络状况"""
+    def __init__(self, sock, loss=0.0, latency=0.0, jitter=0.0, seed=None, clock=monotonic_ms, stats=None):
+        self.sock = sock
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.clock = clock
+        self.stats = stats or NetStats(clock)
+        self._queue = []  # (到期时间, 序号, 数据, 地址)
+        self._order = 0
+
+    def send(self, data, addr):
+        self.stats.sent(len(data))
+        if self.loss and self.rng.random() < self.loss:
+            self.stats.packets_dropped += 1
+            return
+        if not self.latency and not self.jitter:
+            self._sendto(data, addr)
+            return
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        self._order += 1
+        self._queue.append((self.clock() + max(0.0, delay), self._order, data, addr))
+
+    def flush(self):
+        if not self._queue:
+            return
+        now = self.clock()
+        self._queue.sort()
+        while self._queue and self._queue[0][0] <= now:
+            _, _, data, addr = self._queue.pop(0)
+            self._sendto(data, addr)
+
+    def _sendto(self, data, addr):
+        try:
+            self.sock.sendto(data, addr)
+        except (BlockingIOError, ConnectionRefusedError):
+            pass
+
+    def receive(self):
+        self.flush()
+        packets = []
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(65536)
+            except (BlockingIOError, ConnectionResetError, ConnectionRefusedError):
+                return packets
+            self.stats.received(len(data))
+            packets.append((data, addr))
+
+    def close(self):
+        self.sock.close()
+
+def open_socket(bind_addr):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(bind_addr)
+    sock.setblocking(False)
+    return sock
+
+
+# --- 主机 ---
+class NetHost:
+    """权威端：接收队友输入，在每次 GameState.step 之后调用 after_step() 发送快照"""
+    def __init__(self, state, port=DEFAULT_PORT, bind='0.0.0.0', loss=0.0, latency=0.0, jitter=0.0,
+                 seed=None, clock=monotonic_ms, verify=False):
+        if state.bullet_field is None:
+            raise ValueError("联机需要 NumPy：弹幕以事件日志同步")
+        self.state = state
+        self.clock = clock
+        self.channel = LossyChannel(open_socket((bind, port)), loss, latency, jitter, seed, clock)
+        self.stats = self.channel.stats
+        self.port = self.channel.sock.getsockname()[1]
+        self.peer = None
+        self.disconnected = False
+        self.ids = EntityIds()
+        self.history = OrderedDict()  # 帧号 -> (实体, HUD)
+        self.journal = []             # 本步累积的事件
+        self.batches = deque()        # 未确认的 (帧号, 事件字节)
+        self.snapshot_ack = 0
+        self.journal_ack = 0
+        self.inputs = deque()         # (序号, FrameInput)
+        self.received_seq = 0
+        self.processed_seq = 0
+        self.last_input = game.FrameInput()
+        self.echo = 0
+        self.echo_at = 0.0
+        self.last_sent = None
+        self.last_hud = None
+        self.sent_at = 0.0
+        # verify 时保存每个快照与每批事件后的弹幕摘要，供自测逐帧比对
+        self.records = {} if verify else None
+        self.field_digests = {} if verify else None
+
+    @property
+    def connected(self):
+        return self.peer is not None and not self.disconnected
+
+    def poll(self):
+        for data, addr in self.channel.receive():
+            if not data:
+                continue
+            if data[0] == HELLO and self.peer is None:
+                self.peer = addr
+                self._start()
+            elif data[0] == INPUT and addr == self.peer:
+                try:
+                    self._read_input(data)
+                except DECODE_ERRORS:
+                    self.stats.packets_malformed += 1
+
+    def service(self):
+        """模态场景（升级界面、结束画面）等待期间定时调用：收包并按需补发快照"""
+        self.poll()
+        self.after_step()
+
+    def _start(self):
+        state = self.state
+        state.add_partner()
+        # 事件日志从空弹幕、编号 0 开始，客户端从同样的初始状态重放
+        field = state.bullet_field
+        field.clear()
+        field.next_id = 0
+        field.journal = state.particles.journal = state.fireworks.journal = self.journal
+
+    def _read_input(self, data):
+        _, snapshot_ack, journal_ack, client_time, newest, count = INPUT_HEADER.unpack_from(data)
+        payload = data[INPUT_HEADER.size:]
+        if len(payload) != count:
+            raise ValueError(f"输入包长度不符: {len(payload)} != {count}")
+        self.snapshot_ack = max(self.snapshot_ack, snapshot_ack)
+        self.journal_ack = max(self.journal_ack, journal_ack)
+        self.echo, self.echo_at = client_time, self.clock()
+        for i, byte in enumerate(payload):
+            seq = newest - count + 1 + i
+            if seq > self.received_seq:
+                self.inputs.append((seq, unpack_input(byte)))
+                self.received_seq = seq
+        while self.batches and self.batches[0][0] <= self.journal_ack:
+            self.batches.popleft()
+        while self.history and next(iter(self.history)) < self.snapshot_ack:
+            self.history.popitem(last=False)
+
+    def partner_input(self):
+        """本次 step 中队友的输入；没有新输入时沿用上一步"""
+        if not self.connected:
+            return None
+        if self.state.pending_upgrades or self.state.game_over:
+            return self.last_input  # 模拟暂停，保留输入等恢复后再用
+        while len(self.inputs) > MAX_INPUT_BACKLOG:
+            self.processed_seq, self.last_input = self.inputs.popleft()
+        if self.inputs:
+            self.processed_seq, self.last_input = self.inputs.popleft()
+        return self.last_input
+
+    def after_step(self):
+        state = self.state
+        if not self.connected:
+            return
+        if self.journal:
+            self.batches.append((state.frame, encode_journal(self.journal)))
+            self.journal.clear()
+            if self.field_digests is not None:
+                self.field_digests[state.frame] = field_digest(state.bullet_field)
+        if len(self.batches) > JOURNAL_LIMIT:
+            self._disconnect()
+            return
+        if self.last_sent is None or state.frame - self.last_sent >= SEND_INTERVAL:
+            self.send_snapshot()
+        elif state.frame != self.last_sent and capture_hud(state) != self.last_hud:
+            self.send_snapshot()  # 升级、结束等状态变化立即通知，不等发送间隔
+        elif (state.pending_upgrades or state.game_over) and self.clock() - self.sent_at >= KEEPALIVE_MS:
+            self.send_snapshot()  # 暂停时帧号不变，重发同一帧以防丢包
+        self.channel.flush()
+
+    def send_snapshot(self):
+        state = self.state
+        frame = state.frame
+        entities = self.ids.capture(state)
+        hud = capture_hud(state)
+        # 帧号 0 表示无基准，客户端按空状态解码
+        base = self.history.get(self.snapshot_ack) if self.snapshot_ack else None
+        baseline = self.snapshot_ack if base is not None else 0
+        base_entities, base_hud = base if base is not None else ({}, None)
+
+        hold = min(0xFFFF, int(self.clock() - self.echo_at)) if self.echo_at else 0
+        parts = [SNAPSHOT_HEADER.pack(SNAPSHOT, frame, baseline, self.processed_seq, self.echo, hold),
+                 encode_hud(hud, base_hud), encode_entities(entities, base_entities)]
+        batches = []
+        budget = JOURNAL_BUDGET
+        for batch_frame, data in self.batches:
+            if batches and len(data) > budget:
+                break
+            batches.append(BATCH.pack(batch_frame, len(data)) + data)
+            budget -= len(data) + BATCH.size
+        parts.append(COUNT.pack(len(batches)))
+        parts.extend(batches)
+        packet = b''.join(parts)
+        self.channel.send(packet, self.peer)
+        self.stats.snapshot_bytes += len(packet)
+        self.stats.snapshots += 1
+
+        self.history[frame] = (entities, hud)
+        self.last_hud = hud
+        self.sent_at = self.clock()
+        while len(self.history) > HISTORY:
+            self.history.popitem(last=False)
+        if self.records is not None:
+            self.records[frame] = (entities, hud)
+        self.last_sent = frame
+
+    def _disconnect(self):
+        print("队友连接超时")
+        self.disconnected = True
+        state = self.state
+        state.bullet_field.journal = state.particles.journal = state.fireworks.journal = None
+        if state.partner is not None:
+            state.partner.kill()
+            state.partner = None
+
+    def close(self):
+        self.channel.close()
+
+
+# --- 客户端 ---
+class EntityView:
+    __slots__ = ('image', 'rect')
+
+    def __init__(self, image, x, y):
+        self.image = image
+        self.rect = image.get_rect(topleft=(x, y))
+
+class ClientView:
+    """与 RenderSnapshot 同名的属性集合，GameRenderer 可直接绘制"""
+    prev_positions = {}
+    alpha = 1.0
+
+class NetClient:
+    """队友端：发送输入并预测本地玩家，接收快照后插值显示其余实体"""
+    def __init__(self, host_addr, loss=0.0, latency=0.0, jitter=0.0, seed=None, clock=monotonic_ms,
+                 verify=False):
+        # 解析为 IP，与 recvfrom 返回的来源地址比较
+        self.host_addr = (socket.gethostbyname(host_addr[0]), host_addr[1])
+        self.clock = clock
+        self.channel = LossyChannel(open_socket(('0.0.0.0', 0)), loss, latency, jitter, seed, clock)
+        self.stats = self.channel.stats
+        self.worlds = OrderedDict()   # 帧号 -> (实体, HUD)
+        self.latest = 0
+        self.journal_frame = 0        # 已收到的事件日志最后一帧
+        self.batches = deque()        # 已收到、尚未重放的 (帧号, 事件字节)
+        self.field = game.BulletField()
+        self.particles = game.ParticleSystem(seed=seed)
+        self.fireworks = game.FireworkSystem()
+        self.render_frame = 0.0
+        self.seq = 0
+        self.unacked = deque()        # 已发送、主机尚未处理的 (序号, FrameInput)
+        self.local = game.Player()    # 本地预测的队友位置
+        self.local_id = None
+        self.input_ack = 0
+        # verify 时记录解码出的快照与每批事件重放后的弹幕摘要
+        self.decoded = [] if verify else None
+        self.field_digests = [] if verify else None
+
+    @property
+    def connected(self):
+        return self.latest > 0
+
+    def send_input(self, inputs):
+        """每帧调用一次：记录并预测本帧输入，连同最近几步输入一起发给主机"""
+        if not self.connected:
+            self.channel.send(bytes((HELLO,)), self.host_addr)
+            return
+        hud = self.worlds[self.latest][1]
+        if not hud[-1] & (FLAG_PENDING_UPGRADE | FLAG_GAME_OVER):
+            # 主机暂停（升级界面）时不产生新输入，避免预测走在主机前面
+            self.seq += 1
+            self.unacked.append((self.seq, inputs))
+            self._predict(inputs)
+        recent = list(self.unacked)[-INPUT_REDUNDANCY:]
+        packet = INPUT_HEADER.pack(INPUT, self.latest, self.journal_frame, int(self.clock()) & 0xFFFFFFFF,
+                                   self.seq, len(recent)) + bytes(pack_input(i) for _, i in recent)
+        self.channel.send(packet, self.host_addr)
+
+    def _predict(self, inputs):
+        local = self.local
+        local.rect.x += inputs.move_x * local.speed
+        local.rect.y += inputs.move_y * local.speed
+        local.rect.clamp_ip(pygame.Rect(0, 0, game.WIDTH, game.HEIGHT))
+
+    def poll(self):
+        for data, addr in self.channel.receive():
+            if data and data[0] == SNAPSHOT and addr == self.host_addr:
+                try:
+                    self._read_snapshot(data)
+                except DECODE_ERRORS:
+                    self.stats.packets_malformed += 1
+
+    def _read_snapshot(self, data):
+        """解码成功后才修改客户端状态，解码失败时抛出 DECODE_ERRORS 之一"""
+        _, frame, baseline, input_ack, echo, hold = SNAPSHOT_HEADER.unpack_from(data)
+        if frame <= self.latest:
+            return  # 乱序到达的旧快照
+        base = self.worlds.get(baseline) if baseline else ({}, None)
+        if base is None:
+            return  # 基准已被丢弃，等待主机改用更新的基准
+        offset = SNAPSHOT_HEADER.size
+        hud, offset = decode_hud(data, offset, base[1])
+        entities, offset = decode_entities(data, offset, base[0])
+        (count,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        batches = []
+        journal_frame = self.journal_frame
+        for _ in range(count):
+            batch_frame, length = BATCH.unpack_from(data, offset)
+            offset += BATCH.size
+            if offset + length > len(data):
+                raise ValueError("事件日志被截断")
+            if batch_frame > journal_frame:
+                batches.append((batch_frame, data[offset:offset + length]))
+                journal_frame = batch_frame
+            offset += length
+        self.batches.extend(batches)
+        self.journal_frame = journal_frame
+
+        first = not self.connected
+        self.worlds[frame] = (entities, hud)
+        while len(self.worlds) > HISTORY:
+            self.worlds.popitem(last=False)
+        self.latest = frame
+        if self.decoded is not None:
+            self.decoded.append((frame, entities, hud))
+        if echo:
+            self.stats.rtt((int(self.clock()) - echo - hold) % 2**32)
+        self._reconcile(entities, input_ack, first)
+        if first:
+            self.render_frame = frame - INTERP_DELAY
+
+    def _reconcile(self, entities, input_ack, first):
+        """以主机位置为准，重放主机尚未处理的输入"""
+        partner = next(((eid, x, y) for eid, (kind, x, y) in entities.items() if kind == KIND_PARTNER), None)
+        if partner is None:
+            self.local_id = None
+            return
+        self.local_id = partner[0]
+        while self.unacked and self.unacked[0][0] <= input_ack:
+            self.unacked.popleft()
+        self.input_ack = input_ack
+        predicted = self.local.rect.topleft
+        self.local.rect.topleft = partner[1:]
+        for _, inputs in self.unacked:
+            self._predict(inputs)
+        if not first:
+            x, y = self.local.rect.topleft
+            error = ((x - predicted[0]) ** 2 + (y - predicted[1]) ** 2) ** 0.5
+            self.stats.prediction_error = error
+            self.stats.max_prediction_error = max(self.stats.max_prediction_error, error)
+
+    def advance(self, dt):
+        """推进显示时间，并重放已到显示时间的事件日志"""
+        if not self.connected:
+            return
+        target = self.latest - INTERP_DELAY
+        self.render_frame += dt / game.STEP_MS
+        # 偏离过多（卡顿或积压）时直接对齐，否则平滑追赶
+        if abs(self.render_frame - target) > 4 * INTERP_DELAY:
+            self.render_frame = target
+        elif self.render_frame > self.latest:
+            self.render_frame = self.latest
+        while self.batches and self.batches[0][0] <= self.render_frame:
+            batch_frame, data = self.batches.popleft()
+            try:
+                apply_journal(data, self.field, self.particles, self.fireworks)
+            except DECODE_ERRORS:
+                self.stats.packets_malformed += 1
+            if self.field_digests is not None:
+                self.field_digests.append((batch_frame, field_digest(self.field)))
+
+    def _bracket(self):
+        rf = self.render_frame
+        older = newer = None
+        for frame in self.worlds:
+            if frame <= rf:
+                older = frame
+            else:
+                newer = frame
+                break
+        if older is None:
+            return newer, None
+        return older, newer
+
+    def view(self):
+        if not self.connected:
+            return None
+        older, newer = self._bracket()
+        a = self.worlds[older][0]
+        b = self.worlds[newer][0] if newer is not None else None
+        t = (self.render_frame - older) / (newer - older) if newer is not None else 0.0
+        t = min(1.0, max(0.0, t))
+
+        sprites = []
+        for eid, (kind, x, y) in a.items():
+            if eid == self.local_id or kind == KIND_PARTNER:
+                continue
+            other = b.get(eid) if b is not None else None
+            if other is not None and other[0] == kind:
+                x = int(x + (other[1] - x) * t)
+                y = int(y + (other[2] - y) * t)
+            sprites.append(EntityView(kind_image(kind), x, y))
+        hud = self.worlds[self.latest][1]
+        values = dict(zip(HUD_FIELDS, hud))
+        partner_alive = values['flags'] & FLAG_PARTNER_ALIVE
+        if partner_alive and self.local_id is not None:
+            sprites.append(EntityView(kind_image(KIND_PARTNER), *self.local.rect.topleft))
+
+        view = ClientView()
+        view.all_sprites = tuple(sprites)
+        view.enemies = view.player_bullets = view.enemy_bullets = view.supplies = ()
+        view.particles = self.particles
+        view.bullet_field = self.field
+        view.fireworks = self.fireworks
+        view.player = game.PlayerView(values['partner_hp'] / 10, values['partner_max_hp'],
+                                      values['partner_shield'] / 10, values['partner_max_shield'],
+                                      values['xp'], values['xp_next'], values['level'])
+        view.score = values['score']
+        view.in_boss_fight = bool(values['flags'] & FLAG_BOSS_FIGHT)
+        view.boss_group = (game.BossView(values['boss_hp'], values['boss_max_hp']),) if view.in_boss_fight else ()
+        view.pending_upgrades = 1 if values['flags'] & FLAG_PENDING_UPGRADE else 0
+        view.game_over = bool(values['flags'] & FLAG_GAME_OVER)
+        view.partner_alive = bool(partner_alive)
+        view.frame = self.latest
+        return view
+
+    def close(self):
+        self.channel.close()
+
+
+# --- 统计显示 ---
+def stats_line(stats):
+    up, down = stats.rates()
+    rtt = f"{stats.rtt_ms:.0f}" if stats.rtt_ms is not None else '-'
+    return (f"RTT {rtt} ms  上行 {up / 1024:.1f} KB/s  下行 {down / 1024:.1f} KB/s  "
+            f"丢包 {stats.packets_dropped}  预测误差 {stats.prediction_error:.0f}px")
+
+def draw_stats(screen, font, stats):
+    text = font.render(stats_line(stats), True, game.WHITE)
+    screen.blit(text, (10, game.HEIGHT - 36))
+
+
+# --- 客户端主循环 ---
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    return (host or '127.0.0.1', int(port)) if port.isdigit() else (text, DEFAULT_PORT)
+
+def join(address, loss=0.0, latency=0.0, jitter=0.0):
+    pygame.init()
+    screen = pygame.display.set_mode((game.WIDTH, game.HEIGHT))
+    pygame.display.set_caption("🎊 龙马精神：新春大作战 🏮（队友）")
+    clock = pygame.time.Clock()
+    game.assets.use_bundle()
+    client = NetClient(parse_address(address), loss, latency, jitter)
+    renderer = game.GameRenderer(screen)
+    font = game.get_font(18)
+    running = True
+    while running:
+        dt = clock.tick(game.FPS)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+        client.poll()
+        client.send_input(game.read_input())
+        client.advance(dt)
+        view = client.view()
+        if view is None:
+            screen.fill(game.BG_RED)
+            screen.blit(renderer.font.render(f"正在连接 {address} …", True, game.GOLD), (game.WIDTH // 2 - 140, game.HEIGHT // 2))
+            pygame.display.flip()
+            continue
+        renderer.draw(view)
+        if view.pending_upgrades:
+            screen.blit(renderer.font.render("主机正在选择升级…", True, game.GOLD), (game.WIDTH // 2 - 110, game.HEIGHT // 2))
+        elif not view.partner_alive:
+            screen.blit(renderer.font.render("你已阵亡，观战中", True, game.GOLD), (game.WIDTH // 2 - 100, game.HEIGHT // 2))
+        draw_stats(screen, font, client.stats)
+        if view.game_over:
+            game.run_scenes(game.GameOverScene(renderer, view))
+            running = False
+        else:
+            renderer.present()
+    client.close()
+    pygame.quit()
+    print(client.stats.summary())
+
+
+# --- 本机自测 ---
+def selftest(seconds=30.0, loss=0.1, latency=50.0, jitter=10.0, seed=1):
+    """主机与客户端在同一进程中经 localhost UDP 通信，使用虚拟时钟推进。
+    逐帧比对客户端解码的实体/HUD 与主机发送时的记录，以及重放后的弹幕摘要"""
+    game.init_headless()
+    pygame.display.set_mode((1, 1))
+    now = [0.0]
+    clock = lambda: now[0]
+    state = game.GameState(seed)
+    host = NetHost(state, port=0, bind='127.0.0.1', loss=loss, latency=latency, jitter=jitter,
+                   seed=seed, clock=clock, verify=True)
+    client = NetClient(('127.0.0.1', host.port), loss, latency, jitter, seed + 1, clock, verify=True)
+    rng = random.Random(seed)
+    host_move = client_move = 0
+    frames = int(seconds * game.FPS)
+    start = time.perf_counter()
+    for frame in range(frames):
+        now[0] += game.STEP_MS
+        if frame % 45 == 0:
+            host_move, client_move = rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1))
+        host.poll()
+        if host.connected:
+            inputs = game.FrameInput(host_move, 0, True, 1 if state.pending_upgrades else 0)
+            state.step(inputs, game.STEP_MS, host.partner_input)
+            # 自测关注同步而非胜负
+            for p in state.players():
+                p.hp = p.max_hp
+        host.after_step()
+        client.poll()
+        client.send_input(game.FrameInput(client_move, rng.choice((-1, 0, 1)), True))
+        client.advance(game.STEP_MS)
+        client.channel.flush()
+    elapsed = time.perf_counter() - start
+
+    entity_mismatches = sum(1 for f, entities, hud in client.decoded if host.records.get(f) != (entities, hud))
+    field_mismatches = sum(1 for f, digest in client.field_digests if host.field_digests.get(f) != digest)
+    result = {
+        'frames': frames, 'host_frame': state.frame, 'seconds': round(elapsed, 2),
+        'snapshots_decoded': len(client.decoded), 'journal_batches_applied': len(client.field_digests),
+        'entity_mismatches': entity_mismatches, 'field_mismatches': field_mismatches,
+        'enemy_bullets': len(state.bullet_field), 'host': host.stats.summary(), 'client': client.stats.summary(),
+        'downstream_bytes_per_second': round(host.stats.bytes_sent / seconds),
+        'upstream_bytes_per_second': round(client.stats.bytes_sent / seconds),
+    }
+    host.close()
+    client.close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='双人联机合作')
+    sub = parser.add_subparsers(dest='command', required=True)
+    join_parser = sub.add_parser('join', help='作为队友加入主机')
+    join_parser.add_argument('address', help='主机地址，如 192.168.1.5:7777')
+    test_parser = sub.add_parser('selftest', help='本机无头自测')
+    test_parser.add_argument('--seconds', type=float, default=30.0)
+    test_parser.add_argument('--seed', type=int, default=1)
+    for p in (join_parser, test_parser):
+        p.add_argument('--loss', type=float, default=0.0, help='模拟丢包率 (0-1)')
+        p.add_argument('--latency', type=float, default=0.0, help='模拟单向延迟（毫秒）')
+        p.add_argument('--jitter', type=float, default=0.0, help='模拟延迟抖动（毫秒）')
+    args = parser.parse_args(argv)
+    if game.np is None:
+        parser.error("联机需要 NumPy：弹幕以事件日志同步")
+
+    if args.command == 'join':
+        join(args.address, args.loss, args.latency, args.jitter)
+        return 0
+    result = selftest(args.seconds, args.loss, args.latency, args.jitter, args.seed)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    return 0 if not result['entity_mismatches'] and not result['field_mismatches'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""输入录制与无头回放
+
+录像是可流式读写的二进制文件：
+    文件头  MAGIC(8) + 版本(uint16) + 随机种子(uint64)
+    每帧    dt 毫秒(uint16) + 输入(uint8)
+输入字节：bit0-1 move_x+1，bit2-3 move_y+1，bit4 开火，bit5-6 升级选项。
+写入端经缓冲追加，读取端按块惰性解析，长时间录像不会整体载入内存。
+
+用法:
+    python game.py --record session.rec
+    python replay.py session.rec                        # 最快速度回放
+    python replay.py session.rec --render-frames 1200,5000 --out-dir shots
+    python replay.py session.rec --profile-csv replay.csv
+    python replay.py session.rec --telemetry session.tel
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+
+import game
+
+MAGIC = b'FJDZREC\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sHQ')
+RECORD = struct.Struct('<HB')
+CHUNK_RECORDS = 4096
+
+
+def pack_input(inputs):
+    return ((inputs.move_x + 1)
+            | (inputs.move_y + 1) << 2
+            | (1 << 4 if inputs.fire else 0)
+            | (inputs.upgrade & 3) << 5)
+
+def unpack_input(byte):
+    return game.FrameInput(
+        move_x=(byte & 3) - 1,
+        move_y=(byte >> 2 & 3) - 1,
+        fire=bool(byte >> 4 & 1),
+        upgrade=byte >> 5 & 3,
+    )
+
+
+class ReplayWriter:
+    """逐帧追加 (dt, 输入)，数据经缓冲 I/O 写出"""
+    def __init__(self, path, seed, buffering=1 << 16):
+        self._file = open(path, 'wb', buffering=buffering)
+        self._file.write(HEADER.pack(MAGIC, VERSION, seed))
+        self.frames = 0
+
+    def write(self, dt, inputs):
+        self._file.write(RECORD.pack(min(int(dt), 0xFFFF), pack_input(inputs)))
+        self.frames += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayReader:
+    """读取文件头，迭代时按块惰性产出 (dt, FrameInput)"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, self.seed = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"不是录像文件: {path}")
+        if version != VERSION:
+            raise ValueError(f"不支持的录像版本: {version}")
+
+    def __iter__(self):
+        # 输入字节最多 128 种取值，解码结果可复用
+        decoded = {}
+        with open(self.path, 'rb') as f:
+            f.seek(HEADER.size)
+            while True:
+                chunk = f.read(RECORD.size * CHUNK_RECORDS)
+                usable = len(chunk) - len(chunk) % RECORD.size
+                if not usable:
+                    return  # 末尾不完整的记录（如录制时崩溃）被忽略
+                for dt, byte in RECORD.iter_unpack(chunk[:usable]):
+                    inputs = decoded.get(byte)
+                    if inputs is None:
+                        inputs = decoded[byte] = unpack_input(byte)
+                    yield dt, inputs
+
+
+def replay(path, render_frames=(), out_dir='.', profile_csv=None, verify_collisions=False, telemetry=None):
+    """按录像驱动 GameState，返回最终状态与统计"""
+    reader = ReplayReader(path)
+    state = game.GameState(reader.seed, verify_collisions)
+    renderer = None
+    if render_frames:
+        import pygame
+        renderer = game.GameRenderer(pygame.display.set_mode((game.WIDTH, game.HEIGHT)))
+        os.makedirs(out_dir, exist_ok=True)
+    profiler = game.FrameProfiler(csv_path=profile_csv) if profile_csv else None
+    state.profiler = profiler
+    if telemetry:
+        from telemetry import TelemetryWriter
+        state.telemetry = TelemetryWriter(telemetry, reader.seed)
+
+    frames = 0
+    start = time.perf_counter()
+    for dt, inputs in reader:
+        state.step(inputs, dt)
+        frames += 1
+        if renderer is not None and frames in render_frames:
+            import pygame
+            renderer.profiler = profiler
+            renderer.draw(state, state.alpha)
+            renderer.profiler = None
+            pygame.image.save(renderer.screen, os.path.join(out_dir, f"frame_{frames:07d}.png"))
+        if profiler is not None:
+            profiler.end_frame(state)
+    elapsed = time.perf_counter() - start
+    if profiler is not None:
+        profiler.close()
+    if state.telemetry is not None:
+        state.telemetry.close(state.frame)
+    return state, {'frames': frames, 'ticks': state.frame, 'seconds': elapsed,
+                   'frames_per_second': frames / elapsed if elapsed else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='无头回放录像')
+    parser.add_argument('recording')
+    parser.add_argument('--render-frames', default='', help='逗号分隔的帧号，只渲染并保存这些帧')
+    parser.add_argument('--out-dir', default='replay_frames')
+    parser.add_argument('--profile-csv', help='回放时记录分阶段耗时')
+    parser.add_argument('--verify-collisions', action='store_true')
+    parser.add_argument('--telemetry', help='回放时写出遥测日志')
+    args = parser.parse_args(argv)
+
+    game.init_headless()
+    render_frames = {int(n) for n in args.render_frames.split(',') if n.strip()}
+    state, stats = replay(args.recording, render_frames, args.out_dir, args.profile_csv, args.verify_collisions,
+                          args.telemetry)
+    print(f"回放 {stats['frames']} 帧（{stats['ticks']} 步），用时 {stats['seconds']:.2f}s，"
+          f"{stats['frames_per_second']:.0f} 帧/秒")
+    print(f"等级 {state.player.level}  福分 {state.score}  生命 {state.player.hp:.0f}  "
+          f"{'游戏结束' if state.game_over else '未结束'}  校验和 {state.checksum()}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
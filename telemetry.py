@@ -0,0 +1,255 @@
+"""游戏遥测：事件环形缓冲 + 后台写出 + 流式离线分析
+
+日志是可流式读取的二进制文件：
+    文件头  MAGIC(8) + 版本(uint16) + 随机种子(uint64)
+    每块    事件数(uint32) + CRC32(uint32) + 若干事件
+    事件    帧号(uint32) + 事件(uint8) + 参数(uint8) + 数值(int32)
+事件类型与参数含义见 game.TELEMETRY_EVENTS。
+
+记录端把事件写进预分配的块缓冲，写满一块交给后台线程写盘，帧循环从不等待 I/O；
+后台线程跟不上、空闲块用尽时丢弃事件并计数。分析端逐块读取，内存占用与日志长度无关。
+
+用法:
+    python game.py --telemetry session.tel
+    python replay.py session.rec --telemetry session.tel   # 由录像重新生成
+    python telemetry.py session.tel [更多日志...] [--json]
+"""
+import argparse
+import json
+import queue
+import struct
+import sys
+import threading
+import zlib
+
+import game
+
+MAGIC = b'FJDZTEL\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sHQ')
+CHUNK = struct.Struct('<II')
+EVENT = struct.Struct('<IBBi')
+CHUNK_EVENTS = 4096
+CHUNKS = 8
+
+
+class TelemetryWriter:
+    """GameState.telemetry 的实现：record() 只做一次 pack_into，写盘在后台线程"""
+    def __init__(self, path, seed, chunk_events=CHUNK_EVENTS, chunks=CHUNKS):
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, seed))
+        self.chunk_events = chunk_events
+        self._buffers = [bytearray(CHUNK.size + chunk_events * EVENT.size) for _ in range(chunks)]
+        self._free = queue.SimpleQueue()
+        for index in range(1, chunks):
+            self._free.put(index)
+        self._full = queue.SimpleQueue()
+        self._current = 0
+        self._offset = CHUNK.size
+        self._count = 0
+        self.events = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._write_loop, name='telemetry', daemon=True)
+        self._thread.start()
+
+    def record(self, frame, event, arg=0, value=0):
+        if self._current is None:
+            try:
+                self._current = self._free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1  # 所有块都在等待写盘
+                return
+        EVENT.pack_into(self._buffers[self._current], self._offset, frame, event, arg, value)
+        self._offset += EVENT.size
+        self._count += 1
+        self.events += 1
+        if self._count == self.chunk_events:
+            self.flush()
+
+    def flush(self):
+        """把当前块（即使未满）交给后台线程"""
+        if self._current is None or not self._count:
+            return
+        self._full.put((self._current, self._count))
+        self._current = None
+        self._offset = CHUNK.size
+        self._count = 0
+
+    def _write_loop(self):
+        while True:
+            item = self._full.get()
+            if item is None:
+                break
+            index, count = item
+            buffer = self._buffers[index]
+            end = CHUNK.size + count * EVENT.size
+            view = memoryview(buffer)
+            CHUNK.pack_into(buffer, 0, count, zlib.crc32(view[CHUNK.size:end]))
+            self._file.write(view[:end])
+            view.release()
+            self._free.put(index)
+
+    def close(self, frame=None):
+        """写出剩余事件并结束后台线程；给出帧号时先记录 end 事件"""
+        if self._file is None:
+            return
+        if frame is not None:
+            self.record(frame, game.EV_END)
+        self.flush()
+        self._full.put(None)
+        self._thread.join()
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TelemetryReader:
+    """读取文件头，迭代时逐块产出事件列表 [(帧号, 事件, 参数, 数值), ...]"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, self.seed = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"不是遥测日志: {path}")
+        if version != VERSION:
+            raise ValueError(f"不支持的遥测版本: {version}")
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            f.seek(HEADER.size)
+            while True:
+                head = f.read(CHUNK.size)
+                if len(head) < CHUNK.size:
+                    return
+                count, crc = CHUNK.unpack(head)
+                data = f.read(count * EVENT.size)
+                if len(data) < count * EVENT.size or zlib.crc32(data) != crc:
+                    return  # 末尾不完整的块（如写出时崩溃）被忽略
+                yield list(EVENT.iter_unpack(data))
+
+
+class TelemetryAnalysis:
+    """逐块累积统计；每个日志文件是一局，调用 feed_file() 依次加入"""
+    def __init__(self):
+        self.sessions = 0
+        self.events = 0
+        self.level_frames = {}     # 等级 -> 停留帧数
+        self.level_kills = {}      # 等级 -> 击杀普通敌人数
+        self.spawns = [0, 0]
+        self.supplies = dict.fromkeys(game.SUPPLY_KINDS, 0)
+        self.damage = {source: [0, 0] for source in game.DAMAGE_SOURCES}  # 来源 -> [普通阶段, Boss 战]
+        self.bosses = []           # 已击败 Boss：{'level', 'frames', 'damage_dealt', 'damage_taken'}
+        self.unfinished_bosses = 0
+        self.deaths = 0
+
+    def feed_file(self, path):
+        self.sessions += 1
+        # 每局的进行状态
+        level, level_start, frame = 1, 0, 0
+        boss = None
+        for events in TelemetryReader(path):
+            self.events += len(events)
+            for frame, event, arg, value in events:
+                if event == game.EV_KILL:
+                    if arg == 0:
+                        self.level_kills[level] = self.level_kills.get(level, 0) + 1
+                    elif boss is not None:
+                        boss['frames'] = frame - boss.pop('start')
+                        self.bosses.append(boss)
+                        boss = None
+                elif event == game.EV_DAMAGE:
+                    self.damage[game.DAMAGE_SOURCES[arg]][boss is not None] += value
+                    if boss is not None:
+                        boss['damage_taken'] += value
+                elif event == game.EV_BOSS_HIT:
+                    if boss is not None:
+                        boss['damage_dealt'] += value
+                elif event == game.EV_SPAWN:
+                    self.spawns[arg] += 1
+                    if arg == 1:
+                        boss = {'level': level, 'start': frame, 'hp': value, 'damage_dealt': 0, 'damage_taken': 0}
+                elif event == game.EV_LEVEL_UP:
+                    self.level_frames[level] = self.level_frames.get(level, 0) + frame - level_start
+                    level, level_start = value, frame
+                elif event == game.EV_SUPPLY:
+                    self.supplies[game.SUPPLY_KINDS[arg]] += 1
+                elif event == game.EV_DOWN:
+                    if arg == 0:
+                        self.deaths += 1
+        self.level_frames[level] = self.level_frames.get(level, 0) + frame - level_start
+        if boss is not None:
+            self.unfinished_bosses += 1
+
+    def report(self):
+        levels = []
+        for level in sorted(self.level_frames):
+            seconds = self.level_frames[level] / game.FPS
+            kills = self.level_kills.get(level, 0)
+            levels.append({'level': level, 'seconds': round(seconds, 1), 'kills': kills,
+                           'kills_per_minute': round(kills * 60 / seconds, 2) if seconds else 0.0})
+        ttk = sorted(b['frames'] / game.FPS for b in self.bosses)
+        return {
+            'sessions': self.sessions,
+            'events': self.events,
+            'seconds': round(sum(self.level_frames.values()) / game.FPS, 1),
+            'spawns': {'enemy': self.spawns[0], 'boss': self.spawns[1]},
+            'deaths': self.deaths,
+            'levels': levels,
+            'bosses': {
+                'defeated': len(self.bosses),
+                'unfinished': self.unfinished_bosses,
+                'time_to_kill_mean': round(sum(ttk) / len(ttk), 2) if ttk else None,
+                'time_to_kill_min': round(ttk[0], 2) if ttk else None,
+                'time_to_kill_max': round(ttk[-1], 2) if ttk else None,
+                'fights': [{'level': b['level'], 'hp': b['hp'], 'seconds': round(b['frames'] / game.FPS, 2),
+                            'damage_dealt': b['damage_dealt'], 'damage_taken': b['damage_taken']}
+                           for b in self.bosses],
+            },
+            'damage_taken': {source: {'normal': normal, 'boss': boss, 'total': normal + boss}
+                             for source, (normal, boss) in self.damage.items()},
+            'supplies': self.supplies,
+        }
+
+
+def print_report(report):
+    print(f"{report['sessions']} 局，{report['events']} 个事件，游戏时间 {report['seconds']:.0f}s，"
+          f"阵亡 {report['deaths']} 次")
+    print(f"生成: 敌人 {report['spawns']['enemy']}  Boss {report['spawns']['boss']}")
+    print("等级   停留(s)   击杀   击杀/分钟")
+    for row in report['levels']:
+        print(f"{row['level']:>4} {row['seconds']:>9.1f} {row['kills']:>6} {row['kills_per_minute']:>10.2f}")
+    bosses = report['bosses']
+    print(f"Boss: 击败 {bosses['defeated']}  未完成 {bosses['unfinished']}")
+    if bosses['defeated']:
+        print(f"  击杀用时 平均 {bosses['time_to_kill_mean']:.2f}s  "
+              f"最短 {bosses['time_to_kill_min']:.2f}s  最长 {bosses['time_to_kill_max']:.2f}s")
+    print("受到伤害   普通阶段   Boss战     合计")
+    for source, row in report['damage_taken'].items():
+        print(f"{source:<8} {row['normal']:>10} {row['boss']:>8} {row['total']:>8}")
+    print("补给: " + "  ".join(f"{kind} {count}" for kind, count in report['supplies'].items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='流式分析遥测日志')
+    parser.add_argument('logs', nargs='+')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出统计')
+    args = parser.parse_args(argv)
+
+    analysis = TelemetryAnalysis()
+    for path in args.logs:
+        analysis.feed_file(path)
+    report = analysis.report()
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_report(report)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
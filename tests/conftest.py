@@ -0,0 +1,18 @@
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def display():
+    pygame.init()
+    # 资源加载时 convert_alpha 需要显示模式
+    yield pygame.display.set_mode((1, 1))
+    pygame.quit()
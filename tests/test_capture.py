@@ -0,0 +1,81 @@
+import json
+import os
+import random
+import threading
+
+import pygame
+import pytest
+
+import capture
+
+
+def noise_surface(size, depth, seed=0):
+    rng = random.Random(seed)
+    surface = pygame.Surface(size, 0, depth)
+    for x in range(size[0]):
+        for y in range(size[1]):
+            surface.set_at((x, y), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    return surface
+
+
+def same_pixels(a, b):
+    return all(a.get_at((x, y))[:3] == b.get_at((x, y))[:3]
+               for x in range(a.get_width()) for y in range(a.get_height()))
+
+
+@pytest.mark.parametrize('depth', [24, 32])
+@pytest.mark.parametrize('numpy', [True, False])
+def test_png_frames_match_screen(tmp_path, monkeypatch, depth, numpy):
+    if not numpy:
+        monkeypatch.setattr(capture, 'np', None)
+    elif capture.np is None:
+        pytest.skip('未安装 NumPy')
+    frames = [noise_surface((37, 23), depth, seed) for seed in range(3)]  # 宽度为奇数：24 位时行尾有填充
+    recorder = capture.FrameCapture.for_surface(str(tmp_path), frames[0], workers=2, block=True)
+    for surface in frames:
+        assert recorder.grab(surface)
+    stats = recorder.close()
+    assert stats['written'] == 3 and stats['dropped'] == 0
+    for i, surface in enumerate(frames, 1):
+        assert same_pixels(pygame.image.load(os.path.join(tmp_path, f'frame_{i:06d}.png')), surface)
+
+
+def test_raw_stream_and_metadata(tmp_path):
+    path = str(tmp_path / 'session.raw')
+    frames = [noise_surface((16, 8), 32, seed) for seed in range(4)]
+    recorder = capture.FrameCapture.for_surface(path, frames[0], block=True)
+    for surface in frames:
+        recorder.grab(surface)
+    recorder.close()
+    with open(path + '.json', encoding='utf-8') as f:
+        meta = json.load(f)
+    assert meta['frames'] == 4 and (meta['width'], meta['height']) == (16, 8)
+    data = open(path, 'rb').read()
+    assert len(data) == 4 * 16 * 8 * 4
+    # 按像素格式名解出第 2 帧的像素
+    fmt = meta['pixel_format']
+    frame = data[16 * 8 * 4:2 * 16 * 8 * 4]
+    for y in range(8):
+        for x in range(16):
+            pixel = frame[(y * 16 + x) * 4:(y * 16 + x + 1) * 4]
+            rgb = tuple(pixel[fmt.index(c)] for c in 'rgb')
+            assert rgb == tuple(frames[1].get_at((x, y))[:3])
+
+
+def test_drops_frames_when_encoders_fall_behind(tmp_path, monkeypatch):
+    release = threading.Event()
+    encode_png = capture.encode_png
+
+    def slow_encode(*args):
+        release.wait()
+        return encode_png(*args)
+
+    monkeypatch.setattr(capture, 'encode_png', slow_encode)
+    surface = noise_surface((8, 8), 32)
+    recorder = capture.FrameCapture.for_surface(str(tmp_path), surface, workers=1, buffers=2)
+    results = [recorder.grab(surface) for _ in range(5)]
+    assert results == [True, True, False, False, False]
+    release.set()
+    stats = recorder.close()
+    assert stats == dict(stats, frames=5, written=2, dropped=3)
+    assert sorted(os.listdir(tmp_path)) == ['frame_000001.png', 'frame_000002.png']
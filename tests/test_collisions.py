@@ -0,0 +1,71 @@
+import pytest
+
+import game
+
+
+def add_enemy(state, x, y):
+    e = game.enemy_pool.acquire(rng=state.rng, now=state.time_ms)
+    e.rect.topleft = (x, y)
+    state.enemies.add(e)
+    state.all_sprites.add(e)
+
+
+def grid_candidates(state):
+    return sum(g.candidates for g in (state.enemy_grid, state.boss_grid, state.enemy_bullet_grid, state.supply_grid))
+
+
+def play(state, frames, setup=None):
+    for frame in range(frames):
+        if setup is not None:
+            setup(state, frame)
+        state.player.hp = state.player.max_hp
+        move = 1 if (frame // 40) % 2 else -1
+        state.step(game.FrameInput(move, 0, True, 1), game.STEP_MS)
+
+
+def crowd(state, frame):
+    while len(state.enemies) < 60:
+        add_enemy(state, state.rng.randint(0, game.WIDTH - 45), state.rng.randint(0, game.HEIGHT // 2))
+
+
+@pytest.mark.parametrize('pixel_collisions', [True, False])
+def test_grid_matches_brute_force(pixel_collisions):
+    """verify_collisions 模式下每次网格查询都与暴力检测比对，不一致时抛出 AssertionError"""
+    state = game.GameState(seed=5, verify_collisions=True, pixel_collisions=pixel_collisions)
+
+    # 普通子弹：三连发打满屏灯笼
+    state.player.bullet_count = 3
+    state.player.fire_rate = 120
+    score = state.score
+    play(state, 300, crowd)
+    assert state.score > score
+
+    # 穿透激光
+    state.player.is_laser = True
+    score = state.score
+    play(state, 300, crowd)
+    assert state.score > score
+
+    # Boss 战：激光与普通子弹各打一段
+    state.player.level = state.next_boss_milestone
+    play(state, 2)
+    assert state.in_boss_fight
+    boss = next(iter(state.boss_group))
+    hp = boss.hp
+    play(state, 300)
+    state.player.is_laser = False
+    play(state, 300)
+    assert boss.hp < hp or not boss.alive()
+    assert grid_candidates(state) > 0
+
+
+def test_verify_detects_mismatch(monkeypatch):
+    state = game.GameState(seed=5, verify_collisions=True)
+    crowd(state, 0)
+    grid = state.enemy_grid
+    grid.rebuild(state.enemies)
+    probe = next(iter(state.enemies))
+    # 让网格漏掉一个格子里的精灵，暴力检测应发现不一致
+    monkeypatch.setattr(grid, '_cells', {})
+    with pytest.raises(AssertionError):
+        grid.spritecollide(probe, False)
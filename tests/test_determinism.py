@@ -0,0 +1,33 @@
+import random
+
+import game
+
+
+def input_sequence(frames, seed=0):
+    rng = random.Random(seed)
+    return [game.FrameInput(rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)), rng.random() < 0.9, rng.randint(1, 3))
+            for _ in range(frames)]
+
+
+def play(state, inputs):
+    for frame_input in inputs:
+        state.step(frame_input, game.STEP_MS)
+        state.player.hp = state.player.max_hp  # 锁定血量，整段输入都被执行
+    return state.checksum()
+
+
+def test_same_seed_same_inputs_same_checksum():
+    inputs = input_sequence(2400)
+    a, b = game.GameState(seed=11), game.GameState(seed=11)
+    # 交替推进两局：共享的对象池、缓存等进程级状态不能影响结果
+    for start in range(0, len(inputs), 100):
+        play(a, inputs[start:start + 100])
+        play(b, inputs[start:start + 100])
+        assert a.checksum() == b.checksum()
+    assert a.frame == b.frame == len(inputs)
+    assert a.score > 0
+
+
+def test_different_seed_diverges():
+    inputs = input_sequence(1200)
+    assert play(game.GameState(seed=11), inputs) != play(game.GameState(seed=12), inputs)
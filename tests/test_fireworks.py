@@ -0,0 +1,17 @@
+import pygame
+
+import game
+
+
+def test_firework_shows_every_frame():
+    fireworks = game.FireworkSystem()
+    surface = pygame.Surface((game.WIDTH, game.HEIGHT))
+    fireworks.spawn(400, 300)
+    shown = []
+    # 与 GameState.tick 相同的顺序：先生成、同一步内 update，之后绘制
+    while len(fireworks):
+        fireworks.update()
+        if len(fireworks):
+            shown.append(fireworks.frame[0])
+            fireworks.draw(surface)
+    assert shown == list(range(game.FIREWORK_FRAMES))
@@ -0,0 +1,39 @@
+import json
+import os
+
+import game
+
+
+def test_font_cache_honours_xdg_cache_home(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert game.font_cache_path() == os.path.join(str(tmp_path), 'feijidazhan', 'fonts.json')
+
+
+def test_missing_font_is_cached_until_font_dirs_change(tmp_path, monkeypatch):
+    fonts = tmp_path / 'fonts'
+    fonts.mkdir()
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setattr(game, 'font_dirs', lambda: [str(fonts), str(tmp_path / 'absent')])
+    scans = []
+
+    def match_font(name):
+        scans.append(name)
+        path = fonts / 'sub' / 'nosuchfont.ttf'
+        return str(path) if path.exists() else None
+
+    monkeypatch.setattr(game.pygame.font, 'match_font', match_font)
+    assert game.resolve_font_path('NoSuchFont') is None
+    assert game.resolve_font_path('NoSuchFont') is None
+    assert len(scans) == 1  # 第二次命中缓存的未找到结果
+
+    # 之后在子目录中安装了字体：目录修改时间变化，重新查找
+    (fonts / 'sub').mkdir()
+    font_file = fonts / 'sub' / 'nosuchfont.ttf'
+    font_file.write_bytes(b'')
+    os.utime(fonts / 'sub', ns=(1, os.stat(fonts).st_mtime_ns + 10**9))
+    assert game.resolve_font_path('NoSuchFont') == str(font_file)
+    assert game.resolve_font_path('NoSuchFont') == str(font_file)
+    assert len(scans) == 2
+    with open(game.font_cache_path(), encoding='utf-8') as f:
+        assert json.load(f) == {'NoSuchFont': str(font_file)}
+    assert [p.name for p in (tmp_path / 'cache' / 'feijidazhan').iterdir()] == ['fonts.json']
@@ -0,0 +1,39 @@
+import pygame
+
+import game
+
+
+class FakeRenderer:
+    def draw_game_over(self, view):
+        pass
+
+    def present(self):
+        pass
+
+
+def make_scene(monkeypatch, now):
+    monkeypatch.setattr(pygame.time, 'get_ticks', lambda: now[0])
+    scene = game.GameOverScene(FakeRenderer(), None)
+    scene.enter()
+    return scene
+
+
+def test_input_ignored_during_grace(monkeypatch):
+    now = [1000]
+    scene = make_scene(monkeypatch, now)
+    key = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE)
+    click = pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(0, 0))
+    now[0] += game.INPUT_GRACE_MS - 1
+    assert scene.handle_event(key) is scene
+    assert scene.handle_event(click) is scene
+    now[0] += 1
+    assert scene.handle_event(key) is None
+
+
+def test_quit_and_deadline_end_scene(monkeypatch):
+    now = [0]
+    scene = make_scene(monkeypatch, now)
+    assert scene.handle_event(pygame.event.Event(pygame.QUIT)) is None
+    assert scene.handle_event(pygame.event.Event(pygame.NOEVENT)) is scene
+    now[0] += scene.duration
+    assert scene.handle_event(pygame.event.Event(pygame.NOEVENT)) is None
@@ -0,0 +1,62 @@
+import pygame
+
+import game
+
+
+def test_running_sums_match_windows():
+    governor = game.QualityGovernor(degrade_window=4, restore_window=8)
+    for ms in (1, 2, 3, 4, 5, 6, 7, 8, 9, 10):
+        governor.update(ms)
+        assert len(governor._recent) <= 4 and len(governor._window) <= 8
+        assert governor._recent_sum == sum(governor._recent)
+        assert governor._window_sum == sum(governor._window)
+
+
+def test_degrade_and_restore_with_backoff():
+    governor = game.QualityGovernor(budget_ms=10, degrade_window=30, restore_window=120)
+    changes = [f for f in range(60) if governor.update(12)]
+    assert changes == [29, 59] and governor.level == 2
+    # 两个阈值之间不动作
+    assert not any(governor.update(7) for _ in range(300))
+    # 窗口里仍是 7ms 的样本：第 25 帧起 120 帧平均才低于 6ms
+    changes = [f for f in range(25) if governor.update(2)]
+    assert changes == [24] and governor.level == 1
+    # 升级后立即又降级：下次升级所需帧数加倍
+    assert [f for f in range(30) if governor.update(12)] == [29]
+    assert governor.level == 2
+    assert governor.restore_window == 240
+    assert not any(governor.update(2) for _ in range(239))
+    assert governor.update(2) and governor.level == 1
+
+
+def test_restore_window_resets_once_quality_holds():
+    governor = game.QualityGovernor(budget_ms=10, degrade_window=30, restore_window=120)
+    for _ in range(60):
+        governor.update(12)
+    for _ in range(120):
+        governor.update(2)
+    for _ in range(30):
+        governor.update(12)
+    assert governor.restore_window == 240 and governor.level == 2
+    # 降级后仍在降级画质：不视为稳定
+    for _ in range(239):
+        governor.update(2)
+    assert governor.restore_window == 240 and governor.level == 2
+    assert governor.update(2) and governor.level == 1
+    # 升级后保持初始 restore_window 帧未再降级：恢复初始值
+    for _ in range(119):
+        governor.update(7)
+    assert governor.restore_window == 240
+    governor.update(7)
+    assert governor.level == 1 and governor.restore_window == 120
+
+def test_overlay_text_stays_inside_panel():
+    governor = game.QualityGovernor()
+    governor._change(1, "很长的说明" * 20)
+    screen = pygame.Surface((game.WIDTH, game.HEIGHT))
+    screen.fill((1, 2, 3))
+    governor.draw_overlay(screen)
+    rect = game.GOVERNOR_OVERLAY_RECT
+    outside = [screen.get_at((x, rect.y + 30)) for x in range(rect.right, game.WIDTH)]
+    assert all(color == (1, 2, 3) for color in outside)
+    assert screen.get_clip() == screen.get_rect()
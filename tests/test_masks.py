@@ -0,0 +1,37 @@
+import pygame
+
+import game
+
+
+def test_player_mask_corner_is_empty():
+    mask = game.masks.get(game.Player().image)
+    w, h = mask.get_size()
+    assert not mask.get_at((0, 0))
+    assert not mask.get_at((w - 1, h - 1))
+    assert mask.get_at((w // 2, h // 2))
+    assert 0 < mask.count() < w * h
+
+
+def test_boss_mask_is_not_solid():
+    boss = game.Enemy(is_boss=True, now=0)
+    mask = game.masks.get(boss.image)
+    w, h = mask.get_size()
+    assert not mask.get_at((0, 0))
+    assert mask.count() < w * h
+
+
+def test_transparent_template_uses_alpha():
+    surface = pygame.Surface((10, 10), pygame.SRCALPHA)
+    pygame.draw.circle(surface, (255, 255, 255), (5, 5), 3)
+    mask = game.image_mask(surface)
+    assert not mask.get_at((0, 0))
+    assert mask.get_at((5, 5))
+
+
+def test_collider_ignores_corner_overlap():
+    player = game.Player()
+    other = game.Player()
+    # 两个矩形只在角落相交，图像主体没有接触
+    other.rect.topleft = (player.rect.right - 3, player.rect.bottom - 3)
+    assert player.rect.colliderect(other.rect)
+    assert not game.MaskCollider()(player, other)
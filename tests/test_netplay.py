@@ -0,0 +1,284 @@
+import random
+import select
+import socket
+
+import pytest
+
+import game
+import netplay
+
+
+def random_entities(rng, count, base=None):
+    entities = dict(base or {})
+    for eid in rng.sample(sorted(entities), len(entities) // 3) if entities else ():
+        del entities[eid]
+    for eid in list(entities):
+        kind, x, y = entities[eid]
+        if rng.random() < 0.2:
+            kind = rng.randrange(10)  # 编号被不同类型的实体复用
+        step = 300 if rng.random() < 0.1 else 20
+        entities[eid] = (kind, x + rng.randint(-step, step), y + rng.randint(-step, step))
+    while len(entities) < count:
+        entities[rng.randrange(1, 0x10000)] = (rng.randrange(10), rng.randint(-100, 1000), rng.randint(-100, 800))
+    return entities
+
+
+def test_entity_delta_round_trip():
+    rng = random.Random(0)
+    base = {}
+    for _ in range(50):
+        entities = random_entities(rng, rng.randint(0, 80), base)
+        data = netplay.encode_entities(entities, base)
+        decoded, offset = netplay.decode_entities(data, 0, base)
+        assert decoded == entities
+        assert offset == len(data)
+        base = entities
+
+
+def test_entity_delta_skips_unchanged():
+    entities = {1: (netplay.KIND_ENEMY, 10, 20), 2: (netplay.KIND_BULLET, 30, 40)}
+    data = netplay.encode_entities(entities, entities)
+    # 记录数 0 + 删除数 0
+    assert len(data) == 2 * netplay.COUNT.size
+
+
+def test_hud_delta_round_trip():
+    rng = random.Random(1)
+    base = None
+    for _ in range(30):
+        hud = tuple(rng.randint(-5, 5000) for _ in netplay.HUD_FIELDS)
+        if base is not None:
+            hud = tuple(b if rng.random() < 0.7 else h for b, h in zip(base, hud))
+        data = netplay.encode_hud(hud, base)
+        decoded, offset = netplay.decode_hud(data, 0, base)
+        assert decoded == hud
+        assert offset == len(data)
+        base = hud
+
+
+def test_entity_ids_are_recycled_without_collisions():
+    ids = netplay.EntityIds()
+    state = game.GameState(seed=0)
+    first = ids.capture(state)
+    assert list(first) == [1]
+    for _ in range(3):
+        state.step(game.FrameInput(0, 0, True), game.STEP_MS * 5)
+        entities = ids.capture(state)
+        assert len(entities) == len(state.all_sprites)
+    # 主玩家始终保持同一编号
+    assert entities[1][0] == netplay.KIND_PLAYER
+
+
+def test_partner_inputs_consumed_once_per_tick():
+    state = game.GameState(seed=0)
+    state.add_partner()
+    calls = []
+
+    def partner_input():
+        calls.append(state.frame)
+        return game.FrameInput(1, 0, False)
+
+    x = state.partner.rect.x
+    steps = state.step(game.FrameInput(), game.STEP_MS * 3, partner_input)
+    assert steps == 3
+    assert len(calls) == 3
+    assert state.partner.rect.x == x + 3 * state.partner.speed
+
+
+class Link:
+    """模拟网络：按概率丢包，随机延迟使数据包乱序到达"""
+    def __init__(self, rng, loss, max_delay):
+        self.rng = rng
+        self.loss = loss
+        self.max_delay = max_delay
+        self.in_flight = []
+        self.dropped = 0
+        self.reordered = 0
+        self._delivered = -1
+
+    def send(self, data, addr=None):
+        if self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        self.in_flight.append((self.now + self.rng.randint(0, self.max_delay), len(self.in_flight) + self.now * 1000, data))
+
+    def deliver(self, now):
+        self.now = now
+        ready = sorted(p for p in self.in_flight if p[0] <= now)
+        self.in_flight = [p for p in self.in_flight if p[0] > now]
+        for _, order, data in ready:
+            if order < self._delivered:
+                self.reordered += 1
+            self._delivered = max(self._delivered, order)
+            yield data
+
+
+def run_session(loss, max_delay, frames=900, seed=3):
+    rng = random.Random(seed)
+    now = [0.0]
+    state = game.GameState(seed)
+    host = netplay.NetHost(state, port=0, bind='127.0.0.1', clock=lambda: now[0], verify=True)
+    client = netplay.NetClient(('127.0.0.1', host.port), clock=lambda: now[0], verify=True)
+    down, up = Link(rng, loss, max_delay), Link(rng, loss, max_delay)
+    down.now = up.now = 0
+    host.channel.send = down.send
+    client.channel.send = up.send
+    host.peer = ('127.0.0.1', 0)
+    host._start()
+    try:
+        for frame in range(frames):
+            now[0] += game.STEP_MS
+            for data in up.deliver(frame):
+                if data[0] == netplay.INPUT:
+                    host._read_input(data)
+            state.step(game.FrameInput(rng.choice((-1, 0, 1)), 0, True, 1 if state.pending_upgrades else 0),
+                       game.STEP_MS, host.partner_input)
+            for p in state.players():
+                p.hp = p.max_hp
+            host.after_step()
+            for data in down.deliver(frame):
+                client._read_snapshot(data)
+            client.send_input(game.FrameInput(rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)), True))
+            client.advance(game.STEP_MS)
+    finally:
+        host.close()
+        client.close()
+    return state, host, client, down
+
+
+@pytest.mark.parametrize('loss, max_delay', [(0.0, 0), (0.25, 0), (0.2, 8)])
+def test_snapshots_survive_loss_and_reordering(loss, max_delay):
+    state, host, client, down = run_session(loss, max_delay)
+    if loss:
+        assert down.dropped > 0
+    if max_delay:
+        assert down.reordered > 0
+    assert len(client.decoded) > 100
+    for frame, entities, hud in client.decoded:
+        assert host.records[frame] == (entities, hud)
+    assert len(client.field_digests) > 100
+    for frame, digest in client.field_digests:
+        assert host.field_digests[frame] == digest
+    assert state.frame - client.latest < 60
+
+
+def test_paused_host_keeps_sending_state():
+    state = game.GameState(seed=0)
+    now = [0.0]
+    host = netplay.NetHost(state, port=0, bind='127.0.0.1', clock=lambda: now[0])
+    sent = []
+    host.channel.send = lambda data, addr: sent.append(data)
+    host.peer = ('127.0.0.1', 0)
+    host._start()
+    try:
+        state.step(game.FrameInput(), game.STEP_MS, host.partner_input)
+        host.after_step()
+        # 下一步触发升级：距上次发送不足 SEND_INTERVAL，也要立即发送
+        state.player.gain_xp(state.player.xp_next)
+        state.pending_upgrades += 1
+        state.frame += 1
+        sent.clear()
+        host.after_step()
+        assert len(sent) == 1
+        hud, _ = netplay.decode_hud(sent[0], netplay.SNAPSHOT_HEADER.size, None)
+        assert hud[-1] & netplay.FLAG_PENDING_UPGRADE
+        # 暂停期间帧号不变，按 KEEPALIVE_MS 重发
+        for _ in range(10):
+            now[0] += 50
+            host.service()
+        assert 3 <= len(sent) <= 7
+    finally:
+        host.close()
+
+
+def connected_pair(frames=30):
+    """经 localhost UDP 连接的主机与客户端，已交换 frames 步快照"""
+    now = [0.0]
+    state = game.GameState(seed=0)
+    host = netplay.NetHost(state, port=0, bind='127.0.0.1', clock=lambda: now[0])
+    client = netplay.NetClient(('localhost', host.port), clock=lambda: now[0])
+    for _ in range(frames):
+        now[0] += game.STEP_MS
+        host.poll()
+        if host.connected:
+            state.step(game.FrameInput(), game.STEP_MS, host.partner_input)
+        host.after_step()
+        wait_for(client.channel.sock)
+        client.poll()
+        client.send_input(game.FrameInput())
+        client.advance(game.STEP_MS)
+        wait_for(host.channel.sock)
+    assert client.connected
+    return state, host, client
+
+
+def wait_for(sock):
+    select.select([sock], [], [], 0.05)
+
+
+def client_address(client):
+    return ('127.0.0.1', client.channel.sock.getsockname()[1])
+
+
+def next_snapshot(state, host):
+    """截取主机下一个快照的原始字节，不发给客户端"""
+    sent = []
+    send = host.channel.send
+    host.channel.send = lambda data, addr: sent.append(data)
+    state.step(game.FrameInput(), game.STEP_MS * netplay.SEND_INTERVAL, host.partner_input)
+    host.after_step()
+    host.channel.send = send
+    return sent[-1]
+
+
+def test_client_drops_packets_not_from_host():
+    state, host, client = connected_pair()
+    stranger = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        packet = next_snapshot(state, host)
+        latest = client.latest
+        stranger.sendto(packet, client_address(client))
+        wait_for(client.channel.sock)
+        client.poll()
+        assert client.latest == latest
+        host.channel.sock.sendto(packet, client_address(client))
+        wait_for(client.channel.sock)
+        client.poll()
+        assert client.latest > latest
+    finally:
+        stranger.close()
+        host.close()
+        client.close()
+
+
+def test_malformed_packets_are_discarded():
+    state, host, client = connected_pair()
+    rng = random.Random(0)
+    try:
+        packet = next_snapshot(state, host)
+        latest, batches = client.latest, len(client.batches)
+        garbage = [packet[:n] for n in range(1, len(packet))]
+        garbage += [bytes((netplay.SNAPSHOT,)) + rng.randbytes(rng.randint(0, 64)) for _ in range(200)]
+        for data in garbage:
+            host.channel.sock.sendto(data, client_address(client))
+            wait_for(client.channel.sock)
+            client.poll()
+        assert client.stats.packets_malformed > len(packet) // 2
+        assert len(client.batches) == batches
+        # 截断的快照未改变客户端状态，完整的快照照常解码
+        assert client.latest == latest
+        host.channel.sock.sendto(packet, client_address(client))
+        wait_for(client.channel.sock)
+        client.poll()
+        assert client.latest == netplay.SNAPSHOT_HEADER.unpack_from(packet)[1]
+
+        # 主机：队友地址发来的坏输入包被丢弃，其他地址的包被忽略
+        for data in [bytes((netplay.INPUT,)) + rng.randbytes(rng.randint(0, 40)) for _ in range(200)]:
+            client.channel.sock.sendto(data, ('127.0.0.1', host.port))
+        wait_for(host.channel.sock)
+        host.poll()
+        assert host.stats.packets_malformed > 0
+        assert host.connected
+    finally:
+        host.close()
+        client.close()
@@ -0,0 +1,73 @@
+import pytest
+
+import game
+
+np = pytest.importorskip('numpy')
+
+
+class RecordingSurface:
+    def __init__(self):
+        self.blits_calls = []
+
+    def blits(self, sequence, doreturn=True):
+        self.blits_calls.append(list(sequence))
+
+
+def test_dead_particles_are_compacted_in_place():
+    ps = game.ParticleSystem(capacity=100, lifetime=30, seed=0)
+    pos = ps.pos
+    ps.emit(10, 20, game.GOLD, 10, 5)
+    for _ in range(10):
+        ps.update()
+    ps.emit(300, 400, game.FESTIVE_RED, 5, 4)
+    vel = ps.vel[10:15].copy()
+    for _ in range(20):
+        ps.update()
+    # 第一批寿命耗尽被剔除，第二批前移到数组开头
+    assert len(ps) == 5
+    assert (ps.life[:5] == 10).all()
+    np.testing.assert_allclose(ps.pos[:5], np.array([300, 400], np.float32) + vel * 20, rtol=1e-5)
+    assert ps.pos is pos  # 数组没有重新分配
+    for _ in range(10):
+        ps.update()
+    assert len(ps) == 0
+
+
+def test_capacity_drops_excess_and_journals_emission():
+    ps = game.ParticleSystem(capacity=20, seed=0)
+    ps.journal = []
+    ps.emit(1, 2, game.GOLD, 15, 5)
+    ps.emit(3, 4, game.WHITE, 15, 3)
+    assert len(ps) == 20 and ps.dropped == 10
+    assert ps.journal == [('explosion', 1, 2, tuple(game.GOLD), 15, 5), ('explosion', 3, 4, tuple(game.WHITE), 15, 3)]
+
+
+def test_same_seed_same_particles():
+    a, b = game.ParticleSystem(seed=7), game.ParticleSystem(seed=7)
+    for ps in (a, b):
+        for i in range(5):
+            ps.emit(i * 50, 100, game.GOLD, 20, 6)
+            ps.update()
+    assert np.array_equal(a.pos[:len(a)], b.pos[:len(b)])
+    assert np.array_equal(a.style[:len(a)], b.style[:len(b)])
+
+
+def test_draw_uses_one_blits_call_and_stride():
+    ps = game.ParticleSystem(seed=0)
+    ps.emit(100, 100, game.GOLD, 25, 5)
+    surface = RecordingSurface()
+    ps.draw(surface)
+    ps.draw(surface, stride=3)
+    assert [len(call) for call in surface.blits_calls] == [25, 9]
+    assert len(ps.dirty_rects()) >= 1
+
+
+def test_snapshot_is_independent():
+    ps = game.ParticleSystem(seed=0)
+    ps.emit(100, 100, game.GOLD, 10, 5)
+    snap = ps.snapshot()
+    pos = snap.pos.copy()
+    ps.update()
+    assert len(snap) == 10
+    assert np.array_equal(snap.pos, pos)
+    assert not np.array_equal(ps.pos[:10], pos)
@@ -0,0 +1,22 @@
+import game
+
+
+class RecordingField:
+    def __init__(self):
+        self.volleys = []
+
+    def emit(self, pattern, x, y, target=None, volley=0):
+        self.volleys.append((pattern, volley))
+
+
+def test_each_pattern_counts_its_own_volleys():
+    boss = game.Enemy(is_boss=True, now=0)
+    boss.hp = 1  # 最后阶段：旋转环形弹幕与瞄准扇形弹幕交替发射
+    _, patterns = boss.schedule()
+    field = RecordingField()
+    for now in range(0, 5000, 10):
+        boss.shoot(None, None, now, field, (0, 0))
+    for _, pattern in patterns:
+        volleys = [v for p, v in field.volleys if p is pattern]
+        assert len(volleys) > 3
+        assert volleys == list(range(len(volleys)))
@@ -0,0 +1,64 @@
+import pygame
+import pytest
+
+import game
+
+
+def test_acquire_reuses_released_sprites():
+    pool = game.SpritePool(game.Bullet, 2)
+    assert pool.stats() == {'in_use': 0, 'free': 2, 'high_water': 0, 'created': 2}
+    bullets = [pool.acquire(100, 100) for _ in range(3)]
+    assert pool.stats() == {'in_use': 3, 'free': 0, 'high_water': 3, 'created': 3}
+
+    group = pygame.sprite.Group(bullets)
+    first = bullets[0]
+    generation = first.generation
+    first.kill()
+    first.kill()  # 同一帧内被 kill 多次只归还一次
+    assert not first.alive() and len(group) == 2
+    assert pool.stats() == {'in_use': 2, 'free': 1, 'high_water': 3, 'created': 3}
+
+    # 取回同一对象，reset 重新初始化全部状态
+    laser = pool.acquire(10, 20, True)
+    assert laser is first
+    assert laser.generation == generation + 1
+    assert laser.is_laser and laser.damage == 60
+    assert laser.rect.center == (10, 20)
+    assert pool.stats()['created'] == 3
+
+
+def test_explosion_sprites_return_to_pool(monkeypatch):
+    pool = game.SpritePool(game.Particle, 16)
+    monkeypatch.setattr(game, 'particle_pool', pool)
+    group = pygame.sprite.Group()
+    for _ in range(5):
+        game.create_explosion(100, 100, game.GOLD, group, 10, 5)
+        while group:
+            group.update()
+    assert pool.stats() == {'in_use': 0, 'free': 16, 'high_water': 10, 'created': 16}
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_game_session_does_not_leak_pooled_sprites(monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(game, 'np', None)  # 粒子与敌弹都是池中的精灵
+    pools = {}
+    for name in ('bullet', 'enemy_bullet', 'particle', 'enemy'):
+        old = getattr(game, f'{name}_pool')
+        pools[name] = game.SpritePool(old.sprite_class, old.capacity)
+        monkeypatch.setattr(game, f'{name}_pool', pools[name])
+    state = game.GameState(seed=8)
+    for frame in range(1800):
+        state.step(game.FrameInput(1 if (frame // 60) % 2 else -1, 0, True, 1), game.STEP_MS)
+        state.player.hp = state.player.max_hp
+    for pool in pools.values():
+        live = sum(1 for s in state.all_sprites if getattr(s, 'pool', None) is pool)
+        if pool is pools['particle'] and not isinstance(state.particles, game.ParticleSystem):
+            live += len(state.particles)
+        stats = pool.stats()
+        assert stats['in_use'] == live
+        # 对象循环使用：新建数只取决于同时在用的峰值
+        assert stats['created'] == max(pool.capacity, stats['high_water'])
+    assert pools['bullet'].high_water > 0 and pools['enemy'].high_water > 0
+    if not numpy:
+        assert pools['enemy_bullet'].high_water > 0 and pools['particle'].high_water > 0
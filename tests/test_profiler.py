@@ -0,0 +1,24 @@
+import csv
+
+import game
+
+
+def test_csv_columns_are_unique(tmp_path):
+    path = tmp_path / 'frames.csv'
+    state = game.GameState(seed=0)
+    profiler = game.FrameProfiler(csv_path=str(path))
+    state.profiler = profiler
+    for _ in range(5):
+        state.step(game.FrameInput(0, 0, True), game.STEP_MS)
+        profiler.end_frame(state)
+    profiler.close()
+
+    with open(path, newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f))
+        assert len(header) == len(set(header)) == 1 + len(game.PROFILE_PHASES) + len(game.PROFILE_COUNTS)
+        f.seek(0)
+        rows = list(csv.DictReader(f))
+    assert [int(row['frame']) for row in rows] == [1, 2, 3, 4, 5]
+    assert int(rows[-1]['n_player_bullets']) == len(state.player_bullets)
+    assert int(rows[-1]['n_particles']) == len(state.particles)
+    assert all(float(row['ms_fire']) >= 0 for row in rows)
@@ -0,0 +1,60 @@
+import itertools
+import random
+
+import pytest
+
+import game
+import replay
+
+
+def test_every_input_packs_and_unpacks():
+    for move_x, move_y, fire, upgrade in itertools.product((-1, 0, 1), (-1, 0, 1), (False, True), range(4)):
+        inputs = game.FrameInput(move_x, move_y, fire, upgrade)
+        byte = replay.pack_input(inputs)
+        assert 0 <= byte < 128
+        assert replay.unpack_input(byte) == inputs
+
+
+def record_session(path, seed, frames):
+    """边玩边录制，返回实时运行的最终校验和"""
+    rng = random.Random(seed)
+    state = game.GameState(seed)
+    with replay.ReplayWriter(str(path), seed) as writer:
+        for _ in range(frames):
+            dt = rng.choice((16, 17, 17, 33))
+            inputs = game.FrameInput(rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)), rng.random() < 0.8,
+                                     rng.randint(1, 3) if state.pending_upgrades else 0)
+            writer.write(dt, inputs)
+            state.step(inputs, dt)
+    return state, writer.frames
+
+
+def test_replay_reproduces_live_run(tmp_path):
+    path = tmp_path / 'session.rec'
+    live, frames = record_session(path, seed=9, frames=replay.CHUNK_RECORDS + 500)
+    reader = replay.ReplayReader(str(path))
+    assert reader.seed == 9
+    assert sum(1 for _ in reader) == frames
+    state, stats = replay.replay(str(path))
+    assert stats['frames'] == frames
+    assert state.frame == live.frame
+    assert state.checksum() == live.checksum()
+
+
+def test_truncated_tail_is_ignored(tmp_path):
+    path = tmp_path / 'session.rec'
+    _, frames = record_session(path, seed=2, frames=replay.CHUNK_RECORDS + 10)
+    records = list(replay.ReplayReader(str(path)))
+    data = path.read_bytes()
+    for cut in (1, replay.RECORD.size + 1):
+        path.write_bytes(data[:-cut])
+        truncated = list(replay.ReplayReader(str(path)))
+        # 写到一半的最后一条记录被丢弃，其余记录不变
+        assert truncated == records[:frames - (cut + replay.RECORD.size - 1) // replay.RECORD.size]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.rec'
+    path.write_bytes(b'\0' * replay.HEADER.size)
+    with pytest.raises(ValueError):
+        replay.ReplayReader(str(path))
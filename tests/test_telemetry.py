@@ -0,0 +1,89 @@
+import random
+import threading
+
+import game
+import telemetry
+
+
+def random_events(count, seed=0):
+    rng = random.Random(seed)
+    return [(frame, rng.randrange(len(game.TELEMETRY_EVENTS)), rng.randrange(256), rng.randint(-2**31, 2**31 - 1))
+            for frame in range(count)]
+
+
+def test_events_round_trip(tmp_path):
+    path = str(tmp_path / 'session.tel')
+    events = random_events(1000)
+    with telemetry.TelemetryWriter(path, seed=42, chunk_events=64, chunks=len(events) // 64 + 2) as writer:
+        for event in events:
+            writer.record(*event)
+    assert writer.dropped == 0
+    assert writer.events == len(events)
+
+    reader = telemetry.TelemetryReader(path)
+    assert reader.seed == 42
+    chunks = list(reader)
+    assert all(len(chunk) <= 64 for chunk in chunks)
+    assert [e for chunk in chunks for e in chunk] == events
+
+
+class BlockingFile:
+    """写盘被阻塞的文件：用来耗尽空闲块"""
+    def __init__(self, f):
+        self.f = f
+        self.unblocked = threading.Event()
+
+    def write(self, data):
+        self.unblocked.wait()
+        return self.f.write(data)
+
+    def close(self):
+        self.f.close()
+
+
+def test_full_ring_drops_events_without_blocking(tmp_path):
+    path = str(tmp_path / 'session.tel')
+    writer = telemetry.TelemetryWriter(path, seed=1, chunk_events=8, chunks=3)
+    blocking = writer._file = BlockingFile(writer._file)
+    events = random_events(100)
+    for event in events:
+        writer.record(*event)
+    assert writer.dropped > 0
+    assert writer.events + writer.dropped == len(events)
+    blocking.unblocked.set()
+    writer.close()
+    read = [e for chunk in telemetry.TelemetryReader(path) for e in chunk]
+    assert len(read) == writer.events
+    assert set(read) <= set(events)
+
+
+def test_truncated_chunk_is_ignored(tmp_path):
+    path = tmp_path / 'session.tel'
+    events = random_events(100)
+    with telemetry.TelemetryWriter(str(path), seed=1, chunk_events=40) as writer:
+        for event in events:
+            writer.record(*event)
+    path.write_bytes(path.read_bytes()[:-5])
+    read = [e for chunk in telemetry.TelemetryReader(str(path)) for e in chunk]
+    assert read == events[:80]
+
+
+def test_analysis_matches_live_session(tmp_path):
+    path = str(tmp_path / 'session.tel')
+    state = game.GameState(seed=4)
+    state.telemetry = telemetry.TelemetryWriter(path, state.seed)
+    for frame in range(1800):
+        state.step(game.FrameInput(1 if (frame // 60) % 2 else -1, 0, True, 1), game.STEP_MS)
+        state.player.hp = state.player.max_hp
+    state.telemetry.close(state.frame)
+
+    analysis = telemetry.TelemetryAnalysis()
+    analysis.feed_file(path)
+    report = analysis.report()
+    assert report['sessions'] == 1
+    assert report['events'] == state.telemetry.events
+    kills = sum(row['kills'] for row in report['levels'])
+    assert kills > 0
+    assert kills * 10 + report['bosses']['defeated'] * 2000 == state.score
+    assert report['seconds'] == round(state.frame / game.FPS, 1)
+    assert [row['level'] for row in report['levels']] == list(range(1, state.player.level + 1))